@@ -1,9 +1,7 @@
 import os
 import collections
 
-from sklearn.lda import LDA
-from sklearn.preprocessing import StandardScaler
-from sklearn.pipeline import Pipeline
+import numpy as np
 
 from pygesture import util
 from pygesture import pipeline
@@ -61,6 +59,10 @@ inter_trial_timeout = 2
 data_path = os.path.expanduser(
     os.path.join('~', 'pygesture-data', 'tactest2'))
 
+# float type used for data acquisition and processing -- np.float32 halves the
+# memory bandwidth of the data path with negligible effect on the features
+dtype = np.float64
+
 # sensor mappings
 sensors = [
     util.Sensor(0, "ECR/TA"),
@@ -90,7 +92,8 @@ try:
     daq = daq.TrignoDaq(
         channel_range=(min(channels), max(channels)),
         samples_per_read=daq_st['m']*(
-            daq_st['window_length']-daq_st['window_overlap'])
+            daq_st['window_length']-daq_st['window_overlap']),
+        dtype=dtype
     )
 except:
     try:
@@ -100,7 +103,8 @@ except:
             input_range=daq_st['input_range'],
             channel_range=(min(channels), max(channels)),
             samples_per_read=daq_st['m']*(
-                daq_st['window_length']-daq_st['window_overlap'])
+                daq_st['window_length']-daq_st['window_overlap']),
+            dtype=dtype
         )
     except:
         daq_st = trigno_daq
@@ -109,7 +113,8 @@ except:
             input_range=daq_st['input_range'],
             channel_range=(min(channels), max(channels)),
             samples_per_read=daq_st['m']*(
-                daq_st['window_length']-daq_st['window_overlap'])
+                daq_st['window_length']-daq_st['window_overlap']),
+            dtype=dtype
         )
 
 probe_channel = daq_st['probe_channel']
@@ -141,11 +146,8 @@ feature_extractor = features.FeatureExtractor(
     len(channels)
 )
 
-learner = pipeline.Classifier(
-    Pipeline([
-        ('preproc', StandardScaler()),
-        ('clf', LDA())])
-)
+# LDA which can be updated with new training sessions without refitting
+learner = pipeline.LDAClassifier()
 
 post_processor = processing.Processor(
     conditioner=conditioner,
@@ -154,7 +156,8 @@ post_processor = processing.Processor(
     rest_bounds=None,
     gesture_bounds=(
         int((prompt_times[0]+0.5)*daq_st['f_proc']),
-        int((prompt_times[1]-0.5)*daq_st['f_proc']))
+        int((prompt_times[1]-0.5)*daq_st['f_proc'])),
+    dtype=dtype
 )
 
 controller = control.DBVRController(
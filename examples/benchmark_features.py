@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+"""
+Compares the time it takes to compute features with the NumPy and compiled
+(numba) backends, printing a table with the time per window for each.
+Without numba installed, both columns use NumPy.
+
+Run with `--help` to see usage information.
+"""
+
+import sys
+import argparse
+import timeit
+
+import numpy as np
+
+try:
+    from pygesture import features
+except ImportError:
+    sys.path.insert(0, '..')
+    from pygesture import features
+
+from pygesture import kernels
+
+
+def make_features(backend):
+    return [
+        ('ZC', features.ZC(thresh=0.003, backend=backend)),
+        ('SSC', features.SSC(thresh=0.003, backend=backend)),
+        ('SampEn', features.SampEn(2, 0.02, backend=backend))
+    ]
+
+
+def time_feature(feature, x, number):
+    # first call outside the timing (numba compiles on first use)
+    feature.compute(x)
+    t = timeit.timeit(lambda: feature.compute(x), number=number)
+    n_windows = int(np.prod(x.shape[:-2]))
+    return t / number / n_windows
+
+
+def main(parser):
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    dtype = np.float32 if args.float32 else np.float64
+    x = (0.1*rng.randn(args.batch, args.length, args.channels)).astype(dtype)
+    if args.batch == 1:
+        x = x[0]
+
+    print("numba available: %s" % kernels.available)
+    print("window: %d samples x %d channels, batch of %d, %s" % (
+        args.length, args.channels, args.batch, np.dtype(dtype).name))
+    print("")
+    print("%-10s %12s %12s %8s" % ('feature', 'numpy (us)', 'numba (us)',
+                                   'speedup'))
+
+    for (name, f_np), (_, f_nb) in zip(make_features('numpy'),
+                                       make_features('numba')):
+        t_np = time_feature(f_np, x, args.number)
+        t_nb = time_feature(f_nb, x, args.number)
+        print("%-10s %12.1f %12.1f %7.1fx" % (name, 1e6*t_np, 1e6*t_nb,
+                                              t_np / t_nb))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Benchmark the feature backends.")
+    parser.add_argument(
+        '-l', '--length', dest='length', type=int, default=432,
+        help="Window length in samples.")
+    parser.add_argument(
+        '-c', '--channels', dest='channels', type=int, default=6,
+        help="Number of channels.")
+    parser.add_argument(
+        '-b', '--batch', dest='batch', type=int, default=1,
+        help="Number of windows computed per call.")
+    parser.add_argument(
+        '-n', '--number', dest='number', type=int, default=20,
+        help="Number of calls to time.")
+    parser.add_argument(
+        '--float32', dest='float32', action='store_true',
+        help="Use single precision data.")
+
+    main(parser)
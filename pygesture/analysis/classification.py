@@ -18,10 +18,17 @@ clf_dict:
 
 """
 
+import os
+from multiprocessing import Pool
+
 import numpy as np
 
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    shared_memory = None
+
 from sklearn.lda import LDA
-from sklearn.metrics import confusion_matrix
 from sklearn.cross_validation import LeavePOut
 from sklearn.preprocessing import StandardScaler
 
@@ -76,27 +83,14 @@ def run_single(rootdir, pids, clf_dict, clf=None, label_dict=None):
             rootdir, pid, clf_dict['sid_list_test'])
 
         if label_dict is not None:
-            (X_train, y_train) = select_data(data_train, label_dict.keys())
-            (X_test, y_test) = select_data(data_test, label_dict.keys())
-        else:
-            (X_train, y_train) = data_train
-            (X_test, y_test) = data_test
-
-        lid = np.unique(y_train.astype(int))
-        if label_dict is None:
-            labels = [str(l) for l in lid]
-        else:
-            labels = [label_dict[l][0] for l in lid]
-
-        (X_train, X_test) = condition_data(X_train, X_test)
-
-        if clf is None:
-            clf = LDA()
+            data_train = select_data(data_train, label_dict.keys())
+            data_test = select_data(data_test, label_dict.keys())
 
-        y_pred = clf.fit(X_train, y_train).predict(X_test)
-        mat = confusion_matrix(y_test, y_pred)
+        lid = np.unique(data_train[1].astype(int))
+        mat = evaluate(data_train, data_test, lid, clf=clf)
 
-        cm_list.append(ConfusionMatrix(mat, labels, name=clf_dict['name']))
+        cm_list.append(ConfusionMatrix(
+            mat, label_names(lid, label_dict), name=clf_dict['name']))
 
     return average_confusion_matrix(cm_list)
 
@@ -152,7 +146,7 @@ def run_avg(rootdir, pids, avg_group, **kwargs):
     return average_confusion_matrix(cm_list)
 
 
-def run_cv(rootdir, pids, cv_group, **kwargs):
+def run_cv(rootdir, pids, cv_group, clf=None, label_dict=None, pool=1):
     """Runs a group of sessions through leave-p-out cross validation.
 
     The data is specified as a list of session IDs which is split into groups
@@ -170,6 +164,13 @@ def run_cv(rootdir, pids, cv_group, **kwargs):
         The participant IDs to run the test for
     cv_group : dict
         The cv_group dict specifying the session IDs and n_train
+    clf : sklearn classifier (default=None)
+        Classifier to use (see `run_single`).
+    label_dict : dict (default=None)
+        Class label mapping (see `run_single`).
+    pool : int (default=1)
+        The number of processes to distribute the folds over. Default is 1,
+        which means the folds are run in this process.
 
     Returns
     -------
@@ -187,23 +188,408 @@ def run_cv(rootdir, pids, cv_group, **kwargs):
     >>> print(cm.get_avg_accuracy())
     0.92847295
     """
-    cm_list = []
+    sid_list = cv_group['sid_list']
+    folds = cv_folds(sid_list, cv_group['n_train'])
+
+    labels = None if label_dict is None else list(label_dict.keys())
+    datasets = dict((pid, SessionData.load(rootdir, pid, sid_list, labels))
+                    for pid in pids)
+
+    # participants may not all have data for every class, so the confusion
+    # matrices are all laid out over the classes of all participants
+    classes = np.unique(np.concatenate(
+        [data.classes for data in datasets.values()]))
+    for data in datasets.values():
+        data.classes = classes
+
+    accumulators = dict(
+        (pid, ConfusionAccumulator(
+            classes, label_names(classes, label_dict),
+            name=cv_group['name']))
+        for pid in pids)
+
+    tasks = [(pid, train, test) for pid in pids for train, test in folds]
+    for task, mat in zip(tasks, iter_folds(datasets, tasks, clf, pool)):
+        accumulators[task[0]].add_matrix(mat)
+
+    total = None
     for pid in pids:
-        sid_list = cv_group['sid_list']
-        n = len(sid_list)
-        p = n - cv_group['n_train']
-        lpo = LeavePOut(n, p=p)
-        cm_sub = []
-        for idx_train, idx_test in lpo:
-            clf_dict = {
-                'name': cv_group['name'],
-                'sid_list_train': [sid_list[i] for i in idx_train],
-                'sid_list_test': [sid_list[i] for i in idx_test]}
-            cm_sub.append(run_single(rootdir, [pid], clf_dict, **kwargs))
+        acc = accumulators[pid]
+        if total is None:
+            total = ConfusionAccumulator(acc.classes, acc.labels, acc.name)
+        total.add_matrix(acc.data)
 
-        cm_list.append(average_confusion_matrix(cm_sub))
+    return total.confusion_matrix()
 
-    return average_confusion_matrix(cm_list)
+
+def cv_folds(sid_list, n_train):
+    """Gives the leave-p-out train/test splits of a list of sessions.
+
+    Parameters
+    ----------
+    sid_list : list of str
+        The session IDs.
+    n_train : int
+        The number of sessions to train with in each split.
+
+    Returns
+    -------
+    folds : list of 2-tuples
+        Every (sid_list_train, sid_list_test) split, with the sessions in
+        the order of `sid_list`.
+    """
+    n = len(sid_list)
+    return [([sid_list[i] for i in idx_train],
+             [sid_list[i] for i in idx_test])
+            for idx_train, idx_test in LeavePOut(n, p=n-n_train)]
+
+
+def iter_folds(datasets, tasks, clf=None, pool=1):
+    """Trains and tests a classifier for each of a list of train/test splits.
+
+    The confusion matrices are generated in the order of the tasks as they
+    become available, so they can be accumulated without holding all of them.
+
+    When more than one process is used, the feature data is placed in shared
+    memory (if available) so the processes don't each need a copy of it. To
+    run several task lists or classifiers on the same data, use a
+    `FoldRunner` directly so the data is only shared once.
+
+    Parameters
+    ----------
+    datasets : dict
+        Mapping from participant ID to the `SessionData` for that participant.
+    tasks : list of 3-tuples
+        Train/test splits in the form (pid, sid_list_train, sid_list_test).
+    clf : sklearn classifier (default=None)
+        Classifier to use (see `run_single`).
+    pool : int or multiprocessing.Pool (default=1)
+        The number of processes to distribute the tasks over, or an existing
+        pool to use (see `FoldRunner`). Default is 1, which means the tasks
+        are run in this process.
+
+    Yields
+    ------
+    mat : array
+        Confusion matrix for each task, with rows/columns ordered by the
+        `classes` of the corresponding `SessionData`.
+    """
+    runner = FoldRunner(datasets, pool)
+    try:
+        for mat in runner.run(tasks, clf):
+            yield mat
+    finally:
+        runner.close()
+
+
+def start_pool(processes):
+    """Starts a process pool that can be given to `FoldRunner`.
+
+    Parameters
+    ----------
+    processes : int
+        The number of processes to start.
+
+    Returns
+    -------
+    pool : multiprocessing.Pool
+        The pool, to be closed by the caller.
+    """
+    if shared_memory is not None and os.name == 'posix':
+        # processes started before the resource tracker would each start
+        # their own when attaching to the shared data, which then reports
+        # the blocks as leaked (or removes them) when the process exits
+        resource_tracker.ensure_running()
+    return Pool(processes=processes)
+
+
+class FoldRunner(object):
+    """
+    Runs train/test splits on a set of datasets, in this process or in a
+    process pool.
+
+    With a pool, the feature data is placed in shared memory (if available)
+    when the runner is created, and the processes attach to it with the first
+    task they get. Any number of task lists and classifiers can then be run
+    without copying the data again. Without shared memory, each task is sent
+    along with the data of its participant.
+
+    Parameters
+    ----------
+    datasets : dict
+        Mapping from participant ID to the `SessionData` for that participant.
+    pool : int or multiprocessing.Pool (default=1)
+        The number of processes to start, or an existing pool (from
+        `start_pool`) to use. An existing pool is left open by `close`, so it
+        can be shared with other work. Default is 1, which means the tasks
+        are run in this process.
+
+    Examples
+    --------
+    >>> workers = start_pool(4)
+    >>> runner = FoldRunner(datasets, workers)
+    >>> try:
+    ...     for clf in classifiers:
+    ...         mats = list(runner.run(tasks, clf))
+    ... finally:
+    ...     runner.close()
+    ...     workers.close()
+    """
+
+    def __init__(self, datasets, pool=1):
+        self.datasets = datasets
+        self._blocks = []
+        self._spec = None
+        self._workers = None
+        self._own_workers = False
+
+        if hasattr(pool, 'imap'):
+            self._workers = pool
+        elif pool > 1:
+            self._workers = start_pool(pool)
+            self._own_workers = True
+
+        if self._workers is not None:
+            self._blocks, self._spec = _share(datasets)
+
+    def run(self, tasks, clf=None):
+        """
+        Yields the confusion matrix of each task (see `iter_folds`).
+        """
+        if self._workers is None:
+            for task in tasks:
+                yield _run_fold(self.datasets, task, clf)
+            return
+
+        args = ((self._task_spec(task), task, clf) for task in tasks)
+        for mat in self._workers.imap(_pool_fold, args):
+            yield mat
+
+    def close(self):
+        """
+        Releases the shared memory and any pool started by the runner.
+        """
+        if self._own_workers:
+            self._workers.close()
+            self._workers.join()
+        self._workers = None
+
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def _task_spec(self, task):
+        if self._spec is None:
+            pid = task[0]
+            return ('copy', None, {pid: self.datasets[pid]})
+        return self._spec
+
+
+def evaluate(data_train, data_test, lid, clf=None):
+    """Trains a classifier and tests it.
+
+    Parameters
+    ----------
+    data_train : 2-tuple
+        Training data in the form (X, y).
+    data_test : 2-tuple
+        Testing data in the form (X, y).
+    lid : array
+        The class labels, determining the order of the confusion matrix rows
+        and columns.
+    clf : sklearn classifier (default=None)
+        Classifier to use (see `run_single`).
+
+    Returns
+    -------
+    mat : array, shape (n_classes, n_classes)
+        The confusion matrix of the test data.
+    """
+    (X_train, y_train) = data_train
+    (X_test, y_test) = data_test
+
+    (X_train, X_test) = condition_data(X_train, X_test)
+
+    if clf is None:
+        clf = LDA()
+
+    y_pred = clf.fit(X_train, y_train).predict(X_test)
+    return confusion_counts(y_test, y_pred, lid)
+
+
+def label_names(lid, label_dict=None):
+    """Gives the names of the given class labels for a ConfusionMatrix."""
+    if label_dict is None:
+        return [str(label) for label in lid]
+    else:
+        return [label_dict[label][0] for label in lid]
+
+
+class SessionData(object):
+    """
+    Feature data of a participant's sessions, loaded once and indexed by
+    session so the data for any subset of sessions can be selected in memory.
+
+    Parameters
+    ----------
+    X : array, shape (n_samples, n_features)
+        Feature vectors of all sessions, grouped by session.
+    y : array, shape (n_samples,)
+        Labels of all sessions.
+    sid_list : list of str
+        Session IDs, in the order the sessions appear in the data.
+    offsets : array, shape (n_sessions+1,)
+        Row index where each session's data starts, followed by the total
+        number of rows.
+    classes : array (default=None)
+        Sorted class labels, determining the layout of the confusion
+        matrices. Default is `None`, meaning the labels found in `y` are used.
+    """
+
+    def __init__(self, X, y, sid_list, offsets, classes=None):
+        self.X = X
+        self.y = y
+        self.sid_list = list(sid_list)
+        self.offsets = offsets
+        if classes is None:
+            classes = np.unique(y.astype(int))
+        self.classes = classes
+
+    @classmethod
+    def load(cls, rootdir, pid, sid_list, labels=None):
+        """
+        Reads the feature data of the given sessions.
+
+        Parameters
+        ----------
+        rootdir : str
+            The root directory of the data.
+        pid : str
+            The participant ID.
+        sid_list : list of str
+            Session IDs to load.
+        labels : list of int (default=None)
+            Class labels to keep. Default is `None`, meaning all data is kept.
+        """
+        Xs, ys = [], []
+        for sid in sid_list:
+            data = processing.get_session_data(rootdir, pid, [sid])
+            if labels is not None:
+                data = select_data(data, labels)
+            Xs.append(data[0])
+            ys.append(data[1])
+
+        offsets = np.cumsum([0] + [len(y) for y in ys])
+        return cls(np.concatenate(Xs), np.concatenate(ys), sid_list, offsets)
+
+    def select(self, sid_list):
+        """
+        Gives the (X, y) data of the given sessions.
+        """
+        idx = [self.sid_list.index(sid) for sid in sid_list]
+        rows = np.concatenate(
+            [np.arange(self.offsets[i], self.offsets[i+1]) for i in idx])
+        return (self.X[rows], self.y[rows])
+
+
+# data shared with the pool processes of FoldRunner
+_worker_key = None
+_worker_datasets = None
+_worker_blocks = []
+
+
+def _run_fold(datasets, task, clf):
+    pid, sid_list_train, sid_list_test = task
+    data = datasets[pid]
+    return evaluate(data.select(sid_list_train), data.select(sid_list_test),
+                    data.classes, clf=clf)
+
+
+def _pool_fold(args):
+    spec, task, clf = args
+    _load_worker(spec)
+    return _run_fold(_worker_datasets, task, clf)
+
+
+def _share(datasets):
+    """
+    Copies the feature arrays to shared memory blocks. Returns the blocks
+    (to be released by the caller) and a spec passed to `_load_worker` with
+    each task. If shared memory isn't available, there are no blocks and the
+    spec is `None`.
+    """
+    if shared_memory is None:
+        return [], None
+
+    blocks = []
+    spec = {}
+    for pid, data in datasets.items():
+        arrays = {}
+        for key in ('X', 'y'):
+            arr = getattr(data, key)
+            block = shared_memory.SharedMemory(
+                create=True, size=max(arr.nbytes, 1))
+            blocks.append(block)
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=block.buf)[:] = arr
+            arrays[key] = (block.name, arr.shape, arr.dtype.str)
+        spec[pid] = (arrays, data.sid_list, data.offsets, data.classes)
+
+    key = tuple(block.name for block in blocks)
+    return blocks, ('shm', key, spec)
+
+
+def _load_worker(spec):
+    """
+    Sets up the datasets of a pool process from the spec sent with a task.
+    Shared memory blocks are attached once and kept until a task with a
+    different spec arrives.
+    """
+    global _worker_key, _worker_datasets, _worker_blocks
+
+    kind, key, content = spec
+    if kind == 'copy':
+        _worker_datasets = content
+        return
+    if key == _worker_key:
+        return
+
+    # drop the views before detaching from the previous blocks
+    _worker_datasets = None
+    for block in _worker_blocks:
+        block.close()
+
+    _worker_key = key
+    _worker_datasets = {}
+    _worker_blocks = []
+    for pid, (arrays, sid_list, offsets, classes) in content.items():
+        views = {}
+        for field, (name, shape, dtype) in arrays.items():
+            block = _attach(name)
+            _worker_blocks.append(block)
+            views[field] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+            views[field].flags.writeable = False
+        _worker_datasets[pid] = SessionData(
+            views['X'], views['y'], sid_list, offsets, classes)
+
+
+def _attach(name):
+    """
+    Opens a shared memory block created by the parent process without
+    registering it with the resource tracker again, since the parent is the
+    one releasing it.
+    """
+    try:
+        # Python 3.13+
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+
+    # Earlier versions always register the block. Pool workers report to
+    # the parent's tracker, which keeps a set of names, so the registration
+    # is merged with the parent's and cleared by its unlink. Unregistering
+    # here would remove the parent's entry instead.
+    return shared_memory.SharedMemory(name=name)
 
 
 def select_data(data, labels):
@@ -231,15 +617,147 @@ def select_data(data, labels):
 
 
 def average_confusion_matrix(cm_list):
-    mat = np.sum(cm.data for cm in cm_list)
+    mat = cm_list[0].data.copy()
+    for cm in cm_list[1:]:
+        mat += cm.data
     cm = ConfusionMatrix(mat, cm_list[0].labels, cm_list[0].name)
     return cm
 
 
 def accuracy_std(cm_list):
-    diags = np.array([cm.data_norm.diagonal(0) for cm in cm_list])
-    std = np.std(diags, axis=0)
-    return std
+    acc = ConfusionAccumulator(np.arange(len(cm_list[0].labels)))
+    for cm in cm_list:
+        acc.add_matrix(cm.data)
+    return acc.class_accuracy_std
+
+
+def confusion_counts(y_true, y_pred, classes):
+    """Counts the (true, predicted) label pairs.
+
+    Parameters
+    ----------
+    y_true : array
+        True labels.
+    y_pred : array
+        Predicted labels.
+    classes : array
+        Sorted class labels, determining the order of the confusion matrix
+        rows and columns. Pairs including any other label are not counted.
+
+    Returns
+    -------
+    mat : array, shape (n_classes, n_classes)
+        Confusion matrix, with true labels along the rows.
+    """
+    classes = np.asarray(classes)
+    n = len(classes)
+    i = np.searchsorted(classes, y_true)
+    j = np.searchsorted(classes, y_pred)
+    i[i == n] = 0
+    j[j == n] = 0
+    valid = (classes[i] == y_true) & (classes[j] == y_pred)
+    return np.bincount(
+        i[valid]*n + j[valid], minlength=n*n).reshape(n, n)
+
+
+class ConfusionAccumulator(object):
+    """
+    Accumulates confusion matrices over a set of folds without keeping the
+    results of each fold.
+
+    The total counts are summed in place, and the mean and standard deviation
+    of the accuracy (overall and per class) across folds are kept up to date
+    with Welford's method.
+
+    Parameters
+    ----------
+    classes : array
+        Sorted class labels, as given to `confusion_counts`.
+    labels : list of str (default=None)
+        Names of the classes for the resulting ConfusionMatrix. Default is
+        `None`, meaning the class labels are used.
+    name : str (default="confusion matrix")
+        Name for the resulting ConfusionMatrix.
+
+    Attributes
+    ----------
+    data : array, shape (n_classes, n_classes)
+        Confusion matrix summed over all folds.
+    n_folds : int
+        Number of folds accumulated.
+
+    Examples
+    --------
+    >>> acc = ConfusionAccumulator([0, 1])
+    >>> acc.update([0, 0, 1, 1], [0, 1, 1, 1])
+    >>> acc.update([0, 0, 1, 1], [0, 0, 1, 0])
+    >>> acc.class_accuracy_mean
+    array([ 0.75,  0.75])
+    """
+
+    def __init__(self, classes, labels=None, name="confusion matrix"):
+        self.classes = np.asarray(classes)
+        if labels is None:
+            labels = [str(c) for c in self.classes]
+        self.labels = labels
+        self.name = name
+
+        n = len(self.classes)
+        self.data = np.zeros((n, n), dtype=int)
+        self.n_folds = 0
+        self._mean = np.zeros(n+1)
+        self._m2 = np.zeros(n+1)
+
+    def update(self, y_true, y_pred):
+        """
+        Adds the results of a fold given its true and predicted labels.
+        """
+        self.add_matrix(confusion_counts(y_true, y_pred, self.classes))
+
+    def add_matrix(self, mat):
+        """
+        Adds the results of a fold given its confusion matrix.
+        """
+        self.data += mat
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            acc = np.append(
+                mat.diagonal() / mat.sum(axis=1).astype(float),
+                mat.trace() / float(mat.sum()))
+
+        self.n_folds += 1
+        delta = acc - self._mean
+        self._mean += delta / self.n_folds
+        self._m2 += delta * (acc - self._mean)
+
+    @property
+    def accuracy_mean(self):
+        """Mean of the overall accuracy of each fold."""
+        return self._mean[-1]
+
+    @property
+    def accuracy_std(self):
+        """Standard deviation of the overall accuracy of each fold."""
+        return self._std()[-1]
+
+    @property
+    def class_accuracy_mean(self):
+        """Mean of the per-class accuracy of each fold."""
+        return self._mean[:-1].copy()
+
+    @property
+    def class_accuracy_std(self):
+        """Standard deviation of the per-class accuracy of each fold."""
+        return self._std()[:-1]
+
+    def _std(self):
+        return np.sqrt(self._m2 / max(self.n_folds, 1))
+
+    def confusion_matrix(self):
+        """
+        Returns the accumulated results as a ConfusionMatrix.
+        """
+        return ConfusionMatrix(self.data.copy(), self.labels, self.name)
 
 
 def condition_data(X_train, X_test):
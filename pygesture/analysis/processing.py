@@ -1,6 +1,15 @@
+import collections
+import hashlib
+import json
 import os
+import threading
 from multiprocessing import Pool
 
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
 import numpy as np
 
 from pygesture import filestruct
@@ -26,18 +35,68 @@ class Processor(object):
         Specifies (start, end) sample indices for the rest class.
     gesture_bounds : 2-tuple of ints
         Specifies (start, end) smaple indices for the gesture class.
+    dtype : numpy dtype, default=np.float64
+        Float type used for reading and processing the recordings. Using
+        np.float32 halves the memory used for batch processing.
+    block_length : int, default=None
+        If given, recordings are processed in streaming mode, reading and
+        conditioning this many raw samples at a time (see
+        `Recording.iter_features`). This bounds memory use for long
+        recordings. Default is `None`, meaning recordings are processed all
+        at once.
+    cache : ConditioningCache, default=None
+        Cache of conditioned recordings, so that processing a recording again
+        with the same conditioner (e.g. with a different windower or feature
+        extractor) skips the filtering. Default is `None`, which means the
+        module-level `conditioning_cache` is used. Pass `False` to turn
+        caching off. Streaming mode doesn't use the cache.
     """
 
     def __init__(self, conditioner, windower, feature_extractor, rest_bounds,
-                 gesture_bounds):
+                 gesture_bounds, dtype=np.float64, block_length=None,
+                 cache=None):
         self.conditioner = conditioner
         self.windower = windower
         self.feature_extractor = feature_extractor
         self.rest_bounds = rest_bounds
         self.gesture_bounds = gesture_bounds
+        self.dtype = dtype
+        self.block_length = block_length
+        self.cache = cache
+
+    def condition(self, recording, conditioner=None):
+        """
+        Conditions the whole recording, going through the cache if enabled.
+
+        Parameters
+        ----------
+        recording : Recording
+            The recording to condition.
+        conditioner : pipeline.Conditioner, default=None
+            Conditioner to use instead of the processor's own.
+
+        Returns
+        -------
+        conditioned_data : array, shape (n_samples_conditioned, n_channels)
+            The conditioned data. It is shared with the cache, so it is
+            read-only if caching is enabled.
+        """
+        if conditioner is None:
+            conditioner = self.conditioner
 
+        def process():
+            conditioner.clear()
+            return conditioner.process(recording.raw_data)
 
-def batch_process(rootdir, pid, processor, sid_list='all', pool=1):
+        cache = conditioning_cache if self.cache is None else self.cache
+        if cache is False:
+            return process()
+
+        return cache.get(recording.reader, conditioner, process)
+
+
+def batch_process(rootdir, pid, processor, sid_list='all', pool=1,
+                  saveproc=True, proc_format='wav'):
     """
     Processes the given participants' sessions. If sid_list is not provided,
     all sessions are processed.
@@ -55,28 +114,65 @@ def batch_process(rootdir, pid, processor, sid_list='all', pool=1):
     pool : int, default 1
         The number of processes to start for processing. Default is 1, which
         means the function will not use the multiprocessing module.
+    saveproc : bool, default True
+        Whether or not to save the conditioned data (see `Session.process`).
+    proc_format : str, default 'wav'
+        Format of the conditioned data files (see `Session.process`).
     """
     if sid_list == 'all':
         sid_list = filestruct.get_session_list(rootdir, pid)
 
+    process_kwargs = dict(saveproc=saveproc, proc_format=proc_format)
+
     if pool > 1:
         pool = Pool(processes=pool)
         pool.map(_process_session, [
-            (rootdir, pid, sid, processor) for sid in sid_list])
+            (rootdir, pid, sid, processor, process_kwargs)
+            for sid in sid_list])
         pool.close()
     else:
         for sid in sid_list:
             _process_session((
-                rootdir, pid, sid, processor))
+                rootdir, pid, sid, processor, process_kwargs))
 
 
 def _process_session(args):
     """
     Internally used for processing a single session. The input should be a
-    tuple matching the input args of the Session constructor.
+    tuple matching the input args of the Session constructor, followed by a
+    dict of keyword arguments for `Session.process`.
     """
-    sess = Session(*args)
-    sess.process()
+    rootdir, pid, sid, processor, process_kwargs = args
+    sess = Session(rootdir, pid, sid, processor)
+    sess.process(**process_kwargs)
+
+
+FEATURE_HEADER = '# pygesture-features '
+
+
+def write_feature_header(fid, feature_extractor):
+    """
+    Writes the header line of a feature file, a comment holding the spec of
+    the feature extractor the features were computed with (see
+    `features.FeatureExtractor.to_spec`). Comment lines are skipped when the
+    data is read. `fid` is a file opened in binary mode.
+    """
+    header = {'feature_extractor': feature_extractor.to_spec()}
+    line = FEATURE_HEADER + json.dumps(header, sort_keys=True) + '\n'
+    fid.write(line.encode('utf-8'))
+
+
+def read_feature_spec(filename):
+    """
+    Reads the spec of the feature extractor from the header of a feature file.
+    Returns `None` if the file has no header (e.g. it was written before
+    headers were added).
+    """
+    with open(filename, 'r') as f:
+        line = f.readline()
+    if not line.startswith(FEATURE_HEADER):
+        return None
+    return json.loads(line[len(FEATURE_HEADER):])['feature_extractor']
 
 
 def read_feature_file_list(file_list, labels='all'):
@@ -107,16 +203,273 @@ def read_feature_file_list(file_list, labels='all'):
         return (X[mask], y[mask])
 
 
-def get_session_data(rootdir, pid, sid_list):
+def get_session_data(rootdir, pid, sid_list, labels='all', cache=None,
+                     catalog=None):
     """
     Convenience function to retrieve the data for the specified particpiant and
     session ID list in a (vector, label) tuple.
+
+    Each session's feature file is read through `cache` (the module-level
+    `feature_cache` by default), so the file is only parsed again if it
+    changes. Pass `cache=False` to always read the files. Only data with the
+    given `labels` is returned (see `read_feature_file_list`). A
+    `filestruct.Catalog` can be given to look up the feature files.
     """
-    file_list = filestruct.get_feature_file_list(rootdir, pid, sid_list)
-    (X, y) = read_feature_file_list(file_list)
+    if cache is None:
+        cache = feature_cache
+
+    file_list = filestruct.get_feature_file_list(rootdir, pid, sid_list,
+                                                 catalog=catalog)
+    if cache is False:
+        return read_feature_file_list(file_list, labels=labels)
+
+    rootdir = os.path.abspath(rootdir)
+    data = []
+    for sid, f in zip(sid_list, file_list):
+        key = (rootdir, pid, sid, os.path.getmtime(f))
+        data.append(cache.get(key, lambda: _read_feature_file(f)))
+
+    X = np.concatenate([d[0] for d in data])
+    y = np.concatenate([d[1] for d in data])
+
+    if labels == 'all':
+        return (X, y)
+
+    mask = np.zeros(y.shape, dtype=bool)
+    for label in labels:
+        mask |= (y == label)
+    return (X[mask], y[mask])
+
+
+def _read_feature_file(f):
+    X, y = read_feature_file_list([f])
+    X.flags.writeable = False
+    y.flags.writeable = False
     return (X, y)
 
 
+class ArrayCache(object):
+    """
+    Thread-safe least-recently-used cache of NumPy arrays, bounded by the
+    total number of bytes the arrays use.
+
+    Cached arrays are shared between everyone who retrieves them, so they
+    should be treated as read-only.
+
+    Parameters
+    ----------
+    max_bytes : int, default=256 MiB
+        Memory budget. When adding an entry puts the cache over budget, the
+        least recently used entries are evicted. An entry larger than the
+        budget is returned but not stored.
+
+    Attributes
+    ----------
+    hits : int
+        Number of lookups served from the cache.
+    misses : int
+        Number of lookups that had to load the value.
+    evictions : int
+        Number of entries evicted to stay within the budget.
+    nbytes : int
+        Number of bytes currently used by the cached arrays.
+
+    Examples
+    --------
+    >>> from pygesture.analysis import processing
+    >>> data = processing.get_session_data('./data', 'p0', ['arm1', 'arm2'])
+    >>> processing.feature_cache.stats()
+    {'hits': 0, 'misses': 2, 'evictions': 0, 'entries': 2, 'nbytes': 4160}
+    """
+
+    def __init__(self, max_bytes=256*2**20):
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.clear()
+
+    def get(self, key, load):
+        """
+        Returns the value stored under `key`. If it isn't cached, `load` is
+        called to produce it, and the result is cached.
+
+        Parameters
+        ----------
+        key : hashable
+            Cache key. It should change whenever the value would (e.g. include
+            the modification time of the file the value comes from).
+        load : callable
+            Function taking no arguments returning an array or a tuple of
+            arrays.
+        """
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                value, nbytes = self._entries.pop(key)
+                self._entries[key] = (value, nbytes)
+                return value
+            self.misses += 1
+
+        # load outside of the lock so other lookups aren't held up
+        value = load()
+        nbytes = _nbytes(value)
+
+        with self._lock:
+            if nbytes > self.max_bytes:
+                return value
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                old_value, old_nbytes = self._entries.popitem(last=False)[1]
+                self.nbytes -= old_nbytes
+                self.evictions += 1
+
+        return value
+
+    def clear(self):
+        """
+        Removes all entries and resets the statistics.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """
+        Returns a dictionary of the cache statistics.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions,
+                    'entries': len(self._entries), 'nbytes': self.nbytes}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __getstate__(self):
+        # the entries stay with this process, only the settings are copied
+        return {'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+class ConditioningCache(object):
+    """
+    Memoizes conditioned recordings, keyed on the raw recording's path, size
+    and modification time and the parameters of the conditioner (order,
+    f_cut, f_samp, f_down and output type). The key only takes a `stat` call,
+    so looking up a recording costs nothing compared to conditioning it.
+    Conditioned data is kept in an in-memory LRU cache (see `ArrayCache`) and
+    optionally also saved to a directory, so it can be reused by later runs.
+    Use `clear` to release the memory.
+
+    Parameters
+    ----------
+    max_bytes : int, default=256 MiB
+        Memory budget for conditioned data kept in memory.
+    directory : str, default=None
+        Directory to store conditioned data in as .npy files. Default is
+        `None`, meaning conditioned data is only kept in memory.
+
+    Examples
+    --------
+    >>> from pygesture.analysis import processing
+    >>> cache = processing.ConditioningCache(directory='/tmp/pygesture')
+    >>> processor = processing.Processor(
+    ...     conditioner, windower, feature_extractor, rest_bounds,
+    ...     gesture_bounds, cache=cache)
+    """
+
+    def __init__(self, max_bytes=256*2**20, directory=None):
+        self.directory = directory
+        self.memory = ArrayCache(max_bytes=max_bytes)
+
+    def get(self, reader, conditioner, process):
+        """
+        Returns the conditioned data of a recording.
+
+        Parameters
+        ----------
+        reader : pygesture.wav.WavReader
+            Reader of the raw recording.
+        conditioner : pipeline.Conditioner
+            The conditioner used.
+        process : callable
+            Function taking no arguments which conditions the recording, called
+            if the conditioned data isn't cached.
+        """
+        key = (self._file_key(reader),
+               conditioner.filt.order,
+               tuple(conditioner.filt.f_cut),
+               conditioner.f_samp,
+               conditioner.f_down,
+               np.result_type(reader.dtype, np.float32).str)
+
+        return self.memory.get(key, lambda: self._load(key, process))
+
+    def clear(self):
+        """
+        Empties the in-memory cache. Files in the directory are left alone.
+        """
+        self.memory.clear()
+
+    def _file_key(self, reader):
+        # a changed recording gets a new modification time (and usually size)
+        st = os.stat(reader.filename)
+        return (os.path.abspath(reader.filename), st.st_size, st.st_mtime)
+
+    def _load(self, key, process):
+        if self.directory is None:
+            data = process()
+            data.flags.writeable = False
+            return data
+
+        name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest() + '.npy'
+        path = os.path.join(self.directory, name)
+        try:
+            return np.load(path, mmap_mode='r')
+        except (IOError, OSError, ValueError):
+            pass
+
+        data = process()
+        data.flags.writeable = False
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            tmp = path + '.tmp.npy'
+            np.save(tmp, data)
+            filestruct.replace_file(tmp, path)
+        except (IOError, OSError):
+            pass
+        return data
+
+    def __getstate__(self):
+        return {'max_bytes': self.memory.max_bytes,
+                'directory': self.directory}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+def _nbytes(value):
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    return getattr(value, 'nbytes', 0)
+
+
+feature_cache = ArrayCache()
+conditioning_cache = ConditioningCache()
+
+
 class Session:
     """
     Processor of a group of recordings that were taken consecutively.
@@ -159,32 +512,156 @@ class Session:
             self.sid,
             filestruct.parse_date_string(self.sessdir))
 
-        if not os.path.exists(self.procdir):
-            os.mkdir(self.procdir)
-
-    def process(self, saveproc=True):
+    def process(self, saveproc=True, proc_format='wav'):
         """
         Iterates over all recordings in the session, processes them (see
         Recording's process method), writes the conditioned data to procdir,
         and writes the features to a CSV file.
+
+        The conditioned data is written on a background thread, so disk I/O
+        overlaps with processing the next recording.
+
+        Parameters
+        ----------
+        saveproc : bool, default=True
+            Whether or not to write the conditioned data to procdir. If only
+            the features are needed, this can be turned off to skip writing
+            the conditioned data entirely.
+        proc_format : str, default='wav'
+            Format of the conditioned data files. 'wav' writes 16-bit WAV
+            files like the raw recordings, and 'npy' writes float32 NumPy
+            files, which aren't quantized.
         """
+        if proc_format not in ('wav', 'npy'):
+            raise ValueError("proc_format must be 'wav' or 'npy'.")
+
         if os.path.isfile(self.featfile):
             os.remove(self.featfile)
 
-        with open(self.featfile, 'ab') as fid:
-            for f in filestruct.get_recording_file_list(self.rawdir):
-                try:
+        writer = None
+        if saveproc:
+            if not os.path.exists(self.procdir):
+                os.mkdir(self.procdir)
+            writer = _BackgroundWriter()
+
+        try:
+            with open(self.featfile, 'ab') as fid:
+                write_feature_header(fid, self.processor.feature_extractor)
+                for f in get_labelled_recording_list(self.rawdir):
                     rec = Recording(f, self.processor)
-                except KeyError:
-                    continue
 
-                proc_data, features = rec.process()
+                    if writer is None:
+                        proc_data, features = rec.process()
+                    else:
+                        features = self._process_recording(
+                            rec, writer, proc_format)
 
-                procfile = os.path.join(self.procdir, rec.filename)
-                fs_proc = self.processor.conditioner.f_down
-                wav.write(procfile, fs_proc, proc_data)
+                    np.savetxt(fid, features, delimiter=',', fmt='%.5e')
+        except BaseException:
+            # don't mask the original error with one from the writer
+            if writer is not None:
+                writer.close(raise_error=False)
+            raise
 
-                np.savetxt(fid, features, delimiter=',', fmt='%.5e')
+        if writer is not None:
+            writer.close()
+
+    def _process_recording(self, rec, writer, proc_format):
+        """
+        Processes a recording, submitting writes of its conditioned data to
+        the background writer.
+        """
+        name = os.path.splitext(rec.filename)[0] + '.' + proc_format
+        procfile = os.path.join(self.procdir, name)
+        fs_proc = self.processor.conditioner.f_down
+
+        if self.processor.block_length is None:
+            proc_data, features = rec.process()
+            if proc_format == 'wav':
+                writer.submit(wav.write, procfile, fs_proc, proc_data)
+            else:
+                writer.submit(
+                    np.save, procfile, proc_data.astype(np.float32))
+        else:
+            if proc_format == 'wav':
+                procwriter = wav.ContinuousWriter(procfile, fs_proc)
+            else:
+                m = self.processor.conditioner.m
+                shape = ((rec.reader.n_samples + m - 1) // m,
+                         rec.reader.n_channels)
+                procwriter = _NpyWriter(procfile, shape)
+
+            proc_data, features = rec.process(
+                sink=lambda data: writer.submit(procwriter.write, data))
+            writer.submit(procwriter.close)
+
+        return features
+
+
+class _BackgroundWriter(object):
+    """
+    Runs file writes on a separate thread. Calls are run in the order they
+    are submitted, and submitting blocks if too many are waiting so memory
+    use stays bounded. Once a call fails, the remaining ones are skipped and
+    the error is re-raised by the next `submit` or by `close`.
+    """
+
+    def __init__(self, max_queued=8):
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._error = None
+        self._error_raised = False
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, func, *args):
+        self._raise_error()
+        self._queue.put((func, args))
+
+    def close(self, raise_error=True):
+        self._queue.put(None)
+        self._thread.join()
+        if raise_error:
+            self._raise_error()
+
+    def _raise_error(self):
+        # the error is only raised once
+        if self._error is not None and not self._error_raised:
+            self._error_raised = True
+            raise self._error
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            func, args = item
+            if self._error is not None:
+                continue
+            try:
+                func(*args)
+            except Exception as e:
+                self._error = e
+
+
+class _NpyWriter(object):
+    """
+    Writes float32 data of known shape to a NumPy file block by block.
+    """
+
+    def __init__(self, filename, shape):
+        self._data = np.lib.format.open_memmap(
+            filename, mode='w+', dtype=np.float32, shape=shape)
+        self._n = 0
+
+    def write(self, data):
+        self._data[self._n:self._n+data.shape[0]] = data
+        self._n += data.shape[0]
+
+    def close(self):
+        self._data.flush()
+        self._data = None
 
 
 class Recording:
@@ -206,7 +683,10 @@ class Recording:
     filename : str
         Name of the WAV file (name only, no path).
     raw_data : array, shape (n_samples, n_channels)
-        Raw data as read from the WAV file.
+        Raw data as read from the WAV file. The file is memory-mapped, so the
+        data is only read (and converted to float) the first time this is
+        accessed. Use `read_raw` to read a segment without keeping the whole
+        recording in memory.
     trial_number : int
         Trial number of the recording (pertains to the session it was recorded
         in).
@@ -233,13 +713,50 @@ class Recording:
         self._read_file()
 
     def _read_file(self):
-        self.fs_raw, self.raw_data = wav.read(self.wavfile)
+        self.reader = wav.WavReader(self.wavfile, dtype=self.processor.dtype)
+        self._raw_data = None
+        self.fs_raw = self.reader.rate
         path, self.filename = os.path.split(self.wavfile)
 
         self.trial_number = filestruct.parse_trial_number(self.filename)
         self.label = filestruct.parse_label(self.filename)
 
-    def process(self):
+    @property
+    def raw_data(self):
+        if self._raw_data is None:
+            self._raw_data = self.reader.read()
+        return self._raw_data
+
+    def read_raw(self, bounds=None):
+        """
+        Reads raw data from the recording without loading the rest of it.
+
+        Parameters
+        ----------
+        bounds : 2-tuple of ints or str, default=None
+            The (start, end) indices of the segment to read, specified in
+            conditioned (downsampled) samples like the processor's bounds. Can
+            also be 'rest' or 'gesture' to read the segment given by the
+            processor's `rest_bounds` or `gesture_bounds`. Default is `None`,
+            which means the whole recording is read.
+
+        Returns
+        -------
+        raw_data : array, shape (n_samples, n_channels)
+            The raw data in the given segment. `None` if 'rest' or 'gesture'
+            is given and the processor doesn't specify those bounds.
+        """
+        if bounds in ('rest', 'gesture'):
+            bounds = getattr(self.processor, bounds + '_bounds')
+            if bounds is None:
+                return None
+
+        if bounds is None:
+            return self.reader.read()
+
+        return self.reader.read_bounds(bounds, m=self._conditioner.m)
+
+    def process(self, block_length=None, sink=None):
         """
         Processes the raw recording data in two steps. The first step is to
         condition the data (usually something like normalization, filtering,
@@ -250,51 +767,211 @@ class Recording:
         processor's feature extractor is applied. The conditioned data and the
         feature data are returned.
 
+        If a block length is given (here or by the processor), the recording is
+        processed in streaming mode (see `iter_features`) and the conditioned
+        data is not kept.
+
+        Parameters
+        ----------
+        block_length : int, default=None
+            Number of raw samples to process at a time. Default is `None`,
+            which means the processor's `block_length` is used.
+        sink : callable, default=None
+            Function called with each block of conditioned data in streaming
+            mode, e.g. `write` of a `pygesture.wav.ContinuousWriter`.
+
         Returns
         -------
         conditioned_data : array, shape (n_samples_conditioned, n_channels)
-            The conditioned data.
+            The conditioned data. `None` in streaming mode.
         feature_data : array, shape (n_windows, n_features+1)
             The feature data. Each row is an instance. The first column is
             the gesture label. The rest of the columns are feature types.
         """
-        self._conditioner.clear()
-        cd = self._conditioner.process(self.raw_data)
-
-        rb = self.processor.rest_bounds
-        if rb is not None:
-            rest_data = cd[rb[0]:rb[1]]
-            rest_ind = list(
-                windowind(rest_data.shape[0], self._windower.length,
-                          overlap=self._windower.overlap))
-            n_rest = len(rest_ind)
-        else:
-            rest_ind = []
-            n_rest = 0
-
-        gb = self.processor.gesture_bounds
-        gest_data = cd[gb[0]:gb[1]]
-        gest_ind = list(
-            windowind(gest_data.shape[0], self._windower.length,
-                      overlap=self._windower.overlap))
-        n_gest = len(gest_ind)
-
-        n_rows = n_rest + n_gest
-        fd = np.zeros((n_rows, self._feature_extractor.n_features+1))
-        for i, ind in enumerate(rest_ind):
-            fd[i, 0] = 0
-            fd[i, 1:] = self._feature_extractor.process(
-                rest_data[ind[0]:ind[1]])
-        for i, ind in enumerate(gest_ind):
-            fd[n_rest+i, 0] = self.label
-            fd[n_rest+i, 1:] = self._feature_extractor.process(
-                gest_data[ind[0]:ind[1]])
+        if block_length is None:
+            block_length = self.processor.block_length
+
+        if block_length is not None:
+            windows = self._window_plan()
+            fd = np.zeros(
+                (len(windows), self._feature_extractor.n_features+1),
+                dtype=self.reader.dtype)
+            for i, row in self._stream(windows, block_length, sink):
+                fd[i] = row
+
+            self.conditioned_data = None
+            self.feature_data = fd
+            return self.conditioned_data, self.feature_data
+
+        cd = self.processor.condition(self)
+        fd = extract_features(
+            cd, self.label, self._windower, self._feature_extractor,
+            self.processor.gesture_bounds, self.processor.rest_bounds)
 
         self.conditioned_data = cd
         self.feature_data = fd
 
         return self.conditioned_data, self.feature_data
 
+    def iter_features(self, block_length, sink=None):
+        """
+        Processes the recording in streaming mode, generating feature data
+        as soon as each window is available. The raw data is read, conditioned
+        and windowed in blocks, so memory use depends on the block length
+        rather than the length of the recording. The features are the same as
+        those computed by `process` (up to floating point error), but the rows
+        are generated in the order the windows end in the recording.
+
+        Parameters
+        ----------
+        block_length : int
+            Number of raw samples to process at a time. It is rounded up to a
+            multiple of the conditioner's downsampling factor.
+        sink : callable, default=None
+            Function called with each block of conditioned data.
+
+        Returns
+        -------
+        features : generator of arrays, shape (n_features+1,)
+            Feature data for each window, with the label in the first element.
+        """
+        for i, row in self._stream(self._window_plan(), block_length, sink):
+            yield row
+
+    def _window_plan(self):
+        """
+        Gets the (start, end, row, label) of each window to extract features
+        from, with start and end indices in conditioned samples and row being
+        the window's row in the output of `process`. The windows are sorted
+        by their end index.
+        """
+        m = self._conditioner.m
+        n = (self.reader.n_samples + m - 1) // m
+        length = self._windower.length
+        overlap = self._windower.overlap
+
+        windows = []
+        regions = [(self.processor.rest_bounds, 0),
+                   (self.processor.gesture_bounds, self.label)]
+        for bounds, label in regions:
+            if bounds is None:
+                continue
+            start = min(bounds[0], n)
+            n_region = min(bounds[1], n) - start
+            for f, t in windowind(n_region, length, overlap=overlap):
+                windows.append((start+f, start+t, len(windows), label))
+
+        return sorted(windows, key=lambda w: w[1])
+
+    def _stream(self, windows, block_length, sink=None):
+        if self._conditioner.filt.overlap != 0:
+            raise ValueError(
+                "Streaming requires a conditioner with no overlap.")
+
+        m = self._conditioner.m
+        block_length = m * ((block_length + m - 1) // m)
+
+        # the bias is removed over the whole recording, like batch processing
+        bias = np.zeros(self.reader.n_channels)
+        for block in self.reader.blocks(block_length):
+            bias += np.sum(block, axis=0, dtype=np.float64)
+        bias /= max(self.reader.n_samples, 1)
+        bias = bias.astype(self.reader.dtype)
+
+        self._conditioner.clear()
+
+        buf = np.zeros((0, self.reader.n_channels), dtype=self.reader.dtype)
+        buf_start = 0
+        k = 0
+        for block in self.reader.blocks(block_length):
+            if k == len(windows) and sink is None:
+                break
+
+            cd = self._conditioner.process(block, bias=bias)
+            if sink is not None:
+                sink(cd)
+
+            buf = np.concatenate((buf, cd))
+            buf_end = buf_start + buf.shape[0]
+
+            while k < len(windows) and windows[k][1] <= buf_end:
+                start, end, row, label = windows[k]
+                out = np.empty(self._feature_extractor.n_features+1,
+                               dtype=buf.dtype)
+                out[0] = label
+                out[1:] = self._feature_extractor.process(
+                    buf[start-buf_start:end-buf_start])
+                yield row, out
+                k += 1
+
+            # keep only what the remaining windows need
+            if k < len(windows):
+                drop = min(windows[k][0], buf_end) - buf_start
+            else:
+                drop = buf.shape[0]
+            buf = buf[drop:]
+            buf_start += drop
+
+
+def extract_features(data, label, windower, feature_extractor,
+                     gesture_bounds, rest_bounds=None):
+    """
+    Windows conditioned data and computes features from each window.
+
+    Parameters
+    ----------
+    data : array, shape (n_samples, n_channels)
+        Conditioned data of a recording.
+    label : int
+        Label of the gesture held in the recording.
+    windower : pygesture.pipeline.Windower
+        Windower giving the window length and overlap.
+    feature_extractor : pygesture.features.FeatureExtractor
+        Feature extractor to apply to each window.
+    gesture_bounds : 2-tuple of ints
+        The (start, end) indices of the gesture portion of the data.
+    rest_bounds : 2-tuple of ints, default=None
+        The (start, end) indices of the rest portion of the data, labelled 0.
+        Default is `None`, meaning there is no rest portion.
+
+    Returns
+    -------
+    feature_data : array, shape (n_windows, n_features+1)
+        Feature data with the label in the first column. Rest windows come
+        first.
+    """
+    regions = []
+    if rest_bounds is not None:
+        regions.append((data[rest_bounds[0]:rest_bounds[1]], 0))
+    regions.append((data[gesture_bounds[0]:gesture_bounds[1]], label))
+
+    # all windows of a region are computed as one batch
+    fds = []
+    for region, region_label in regions:
+        starts = [ind[0] for ind in windowind(
+            region.shape[0], windower.length, overlap=windower.overlap)]
+        fd = np.zeros((len(starts), feature_extractor.n_features+1),
+                      dtype=data.dtype)
+        if starts:
+            starts = np.asarray(starts)[:, np.newaxis]
+            rows = starts + np.arange(windower.length)
+            fd[:, 0] = region_label
+            fd[:, 1:] = feature_extractor.process(region[rows])
+        fds.append(fd)
+
+    return np.concatenate(fds)
+
+
+def get_labelled_recording_list(recording_dir):
+    """
+    Returns a sorted list of the recording files in the given directory that
+    have a label, without opening any of them.
+    """
+    files = filestruct.get_recording_file_list(recording_dir)
+    infos = filestruct.parse_names([os.path.basename(f) for f in files])
+    labelled = set(i.name for i in infos if i.label is not None)
+    return [f for f in files if os.path.basename(f) in labelled]
+
 
 def window(x, length, overlap=0, axis=0):
     """
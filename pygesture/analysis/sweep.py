@@ -0,0 +1,317 @@
+"""
+Sweeps over post-processing and classifier settings, evaluating every
+combination with leave-p-out cross validation.
+
+Each conditioner is run once per recording, with every windower/feature
+extractor combination computed from the same conditioned data. Conditioned
+data goes through the processor's conditioning cache, so later sweeps over
+the same conditioners skip the filtering as well. Feature data is
+kept in memory rather than written to feature files, so sweeping doesn't touch
+the regular processed data.
+
+grid:
+    conditioners: conditioners to try (list or dict of name: Conditioner)
+    windowers: windowers to try (list or dict of name: Windower)
+    feature_extractors: feature extractors to try (list or dict of name:
+        FeatureExtractor)
+    classifiers: classifiers to try (list or dict of name: classifier)
+
+Lists are named by the repr of each object. The processor's rest and gesture
+bounds are specified in samples at the rate of the processor's conditioner, and
+they are rescaled to the rate of each conditioner in the sweep so every
+combination uses the same segments of the recordings.
+"""
+
+import csv
+import itertools
+from multiprocessing import Pool
+
+import numpy as np
+
+from pygesture import filestruct
+from pygesture.analysis import classification
+from pygesture.analysis import processing
+
+
+COLUMNS = ['pid', 'conditioner', 'windower', 'feature_extractor',
+           'classifier', 'accuracy', 'accuracy_mean', 'accuracy_std',
+           'n_folds']
+
+
+def run_sweep(rootdir, pids, cv_group, processor, conditioners=None,
+              windowers=None, feature_extractors=None, classifiers=None,
+              label_dict=None, pool=1, outfile=None):
+    """
+    Runs leave-p-out cross validation for every combination of the given
+    processing blocks and classifiers.
+
+    Parameters
+    ----------
+    rootdir : str
+        The root directory of the data.
+    pids : list of str
+        The participant IDs to run the sweep for.
+    cv_group : dict
+        The cv_group dict specifying the session IDs and n_train (see
+        `pygesture.analysis.classification`).
+    processor : pygesture.analysis.processing.Processor
+        Base processor, giving the rest/gesture bounds and data type as well
+        as the blocks used for any part of the grid that isn't given.
+    conditioners : list or dict, default=None
+        Conditioners to sweep over. Default is the processor's conditioner.
+    windowers : list or dict, default=None
+        Windowers to sweep over. Default is the processor's windower.
+    feature_extractors : list or dict, default=None
+        Feature extractors to sweep over. Default is the processor's feature
+        extractor.
+    classifiers : list or dict, default=None
+        Classifiers (providing `fit()` and `predict()`) to sweep over.
+        Default is `None`, meaning only the default classifier of
+        `classification.evaluate` is used.
+    label_dict : dict, default=None
+        Class label mapping (see `classification.run_single`).
+    pool : int, default=1
+        The number of processes to start. Both feature generation (one
+        session per task) and cross validation (one fold per task) are
+        distributed over the processes, which are started once for the whole
+        sweep.
+    outfile : str, default=None
+        CSV file to write the results table to.
+
+    Returns
+    -------
+    results : list of dict
+        One row per participant and combination, with the keys given by
+        `COLUMNS`.
+
+    Examples
+    --------
+    >>> from pygesture import pipeline
+    >>> from pygesture.analysis import sweep
+    >>> cv_group = {'name': 'arm', 'n_train': 2,
+    ...             'sid_list': ['arm1', 'arm2', 'arm3']}
+    >>> results = sweep.run_sweep(
+    ...     './data', ['p0'], cv_group, config.post_processor,
+    ...     windowers={'100ms': pipeline.Windower(200, 100),
+    ...                '200ms': pipeline.Windower(400, 200)},
+    ...     pool=4, outfile='sweep.csv')
+    """
+    conditioners = _named(conditioners, processor.conditioner)
+    windowers = _named(windowers, processor.windower)
+    feature_extractors = _named(
+        feature_extractors, processor.feature_extractor)
+    classifiers = _named(classifiers, None)
+
+    sid_list = cv_group['sid_list']
+
+    workers = classification.start_pool(pool) if pool > 1 else None
+    try:
+        results = _run_variants(
+            rootdir, pids, sid_list, cv_group['n_train'], processor,
+            conditioners, windowers, feature_extractors, classifiers,
+            label_dict, 1 if workers is None else workers)
+    finally:
+        if workers is not None:
+            workers.close()
+            workers.join()
+
+    if outfile is not None:
+        write_results(results, outfile)
+
+    return results
+
+
+def generate_features(rootdir, pids, sid_list, processor, conditioners,
+                      windowers, feature_extractors, pool=1):
+    """
+    Computes the feature data of every session for every combination of the
+    given processing blocks.
+
+    Parameters
+    ----------
+    rootdir : str
+        The root directory of the data.
+    pids : list of str
+        The participant IDs.
+    sid_list : list of str
+        The session IDs.
+    processor : pygesture.analysis.processing.Processor
+        Processor giving the rest/gesture bounds and data type.
+    conditioners, windowers, feature_extractors : lists
+        The processing blocks to combine.
+    pool : int or multiprocessing.Pool, default=1
+        The number of processes to distribute the sessions over, or an
+        existing pool to use.
+
+    Returns
+    -------
+    features : dict
+        Nested dictionary where `features[pid][sid][(ci, wi, fi)]` is the
+        feature data (label in the first column) of the session processed
+        with `conditioners[ci]`, `windowers[wi]` and `feature_extractors[fi]`.
+    """
+    tasks = [(rootdir, pid, sid, processor, conditioners, windowers,
+              feature_extractors)
+             for pid in pids for sid in sid_list]
+
+    if hasattr(pool, 'map'):
+        session_features = pool.map(_session_features, tasks)
+    elif pool > 1:
+        workers = Pool(processes=pool)
+        try:
+            session_features = workers.map(_session_features, tasks)
+        finally:
+            workers.close()
+            workers.join()
+    else:
+        session_features = [_session_features(task) for task in tasks]
+
+    features = dict((pid, {}) for pid in pids)
+    for task, fd in zip(tasks, session_features):
+        features[task[1]][task[2]] = fd
+
+    return features
+
+
+def write_results(results, filename):
+    """
+    Writes the results of `run_sweep` to a CSV file.
+    """
+    with open(filename, 'w') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def _run_variants(rootdir, pids, sid_list, n_train, processor, conditioners,
+                  windowers, feature_extractors, classifiers, label_dict,
+                  pool):
+    """
+    Generates the features and runs cross validation for every combination,
+    with `pool` either 1 or a process pool shared by all of the steps. The
+    feature data of each combination is shared with the processes once for
+    all classifiers.
+    """
+    variants = list(itertools.product(
+        range(len(conditioners)), range(len(windowers)),
+        range(len(feature_extractors))))
+
+    features = generate_features(
+        rootdir, pids, sid_list, processor,
+        [c for _, c in conditioners],
+        [w for _, w in windowers],
+        [f for _, f in feature_extractors],
+        pool=pool)
+
+    folds = classification.cv_folds(sid_list, n_train)
+    tasks = [(pid, train, test) for pid in pids for train, test in folds]
+
+    labels = None if label_dict is None else list(label_dict.keys())
+
+    results = []
+    for variant in variants:
+        ci, wi, fi = variant
+        datasets = dict(
+            (pid, _session_data(features[pid], variant, sid_list, labels))
+            for pid in pids)
+
+        runner = classification.FoldRunner(datasets, pool)
+        try:
+            for clf_name, clf in classifiers:
+                accumulators = dict(
+                    (pid, classification.ConfusionAccumulator(
+                        datasets[pid].classes))
+                    for pid in pids)
+                mats = runner.run(tasks, clf)
+                for task, mat in zip(tasks, mats):
+                    accumulators[task[0]].add_matrix(mat)
+
+                for pid in pids:
+                    acc = accumulators[pid]
+                    results.append({
+                        'pid': pid,
+                        'conditioner': conditioners[ci][0],
+                        'windower': windowers[wi][0],
+                        'feature_extractor': feature_extractors[fi][0],
+                        'classifier': clf_name,
+                        'accuracy': acc.confusion_matrix().accuracy,
+                        'accuracy_mean': acc.accuracy_mean,
+                        'accuracy_std': acc.accuracy_std,
+                        'n_folds': acc.n_folds
+                    })
+        finally:
+            runner.close()
+
+    return results
+
+
+def _session_features(args):
+    """
+    Processes all recordings of a session with every combination of blocks.
+    Each recording is conditioned once per conditioner.
+    """
+    (rootdir, pid, sid, processor, conditioners, windowers,
+     feature_extractors) = args
+
+    session_dir = filestruct.find_session_dir(rootdir, pid, sid)
+    recording_dir = filestruct.get_recording_dir(session_dir)
+
+    fd = {}
+    for f in processing.get_labelled_recording_list(recording_dir):
+        rec = processing.Recording(f, processor)
+        for ci, conditioner in enumerate(conditioners):
+            cd = processor.condition(rec, conditioner)
+            gesture_bounds = _scale_bounds(
+                processor.gesture_bounds, conditioner.f_down,
+                processor.conditioner.f_down)
+            rest_bounds = _scale_bounds(
+                processor.rest_bounds, conditioner.f_down,
+                processor.conditioner.f_down)
+            for wi, windower in enumerate(windowers):
+                for fi, feature_extractor in enumerate(feature_extractors):
+                    fd.setdefault((ci, wi, fi), []).append(
+                        processing.extract_features(
+                            cd, rec.label, windower, feature_extractor,
+                            gesture_bounds, rest_bounds))
+
+    return dict((key, np.concatenate(value)) for key, value in fd.items())
+
+
+def _scale_bounds(bounds, f_down, f_ref):
+    """
+    Converts (start, end) bounds given at the rate `f_ref` to the rate
+    `f_down`.
+    """
+    if bounds is None:
+        return None
+    return tuple(int(round(b * f_down / float(f_ref))) for b in bounds)
+
+
+def _session_data(pid_features, variant, sid_list, labels=None):
+    """
+    Builds the SessionData of a participant for one combination of blocks.
+    """
+    Xs, ys = [], []
+    for sid in sid_list:
+        fd = pid_features[sid][variant]
+        data = (fd[:, 1:], fd[:, 0])
+        if labels is not None:
+            data = classification.select_data(data, labels)
+        Xs.append(data[0])
+        ys.append(data[1])
+
+    offsets = np.cumsum([0] + [len(y) for y in ys])
+    return classification.SessionData(
+        np.concatenate(Xs), np.concatenate(ys), sid_list, offsets)
+
+
+def _named(items, default):
+    """
+    Gives a list of (name, item) pairs from a dict, a list or `None`.
+    """
+    if items is None:
+        return [(repr(default) if default is not None else 'default',
+                 default)]
+    if isinstance(items, dict):
+        return sorted(items.items(), key=lambda item: item[0])
+    return [(repr(item), item) for item in items]
@@ -0,0 +1,169 @@
+import unittest
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+
+from pygesture import pipeline
+
+try:
+    from pygesture.analysis import classification
+except ImportError:
+    # the analysis tools use the older scikit-learn API
+    raise unittest.SkipTest("scikit-learn with sklearn.lda not available")
+
+
+def _session_data(n_sessions=4, n_per_class=20, classes=(0, 1, 2),
+                  seed=0):
+    rng = np.random.RandomState(seed)
+    Xs, ys = [], []
+    for s in range(n_sessions):
+        for c in classes:
+            Xs.append(rng.randn(n_per_class, 3) + 2*c)
+            ys.append(np.full(n_per_class, c, dtype=float))
+    X = np.concatenate(Xs)
+    y = np.concatenate(ys)
+    n = n_per_class * len(classes)
+    offsets = np.arange(n_sessions+1) * n
+    sid_list = ['s%d' % s for s in range(n_sessions)]
+    return classification.SessionData(X, y, sid_list, offsets)
+
+
+class TestFolds(object):
+
+    def test_cv_folds(self):
+        sid_list = ['a', 'b', 'c', 'd']
+        folds = classification.cv_folds(sid_list, 2)
+        assert len(folds) == 6
+        for train, test in folds:
+            assert len(train) == 2 and len(test) == 2
+            assert sorted(train + test) == sid_list
+        assert len(set(tuple(train) for train, _ in folds)) == 6
+
+    def test_select(self):
+        data = _session_data()
+        X, y = data.select(['s1', 's3'])
+        assert_array_equal(X, np.concatenate((data.X[60:120],
+                                              data.X[180:240])))
+        assert_array_equal(y, np.concatenate((data.y[60:120],
+                                              data.y[180:240])))
+
+
+class TestIterFolds(object):
+
+    def test_pool(self):
+        datasets = {'p0': _session_data(seed=0),
+                    'p1': _session_data(seed=1, classes=(0, 1))}
+        # a common layout for participants with different classes
+        datasets['p1'].classes = datasets['p0'].classes
+        folds = classification.cv_folds(datasets['p0'].sid_list, 2)
+        tasks = [(pid, train, test) for pid in sorted(datasets)
+                 for train, test in folds]
+        clf = pipeline.LDAClassifier()
+
+        serial = list(classification.iter_folds(datasets, tasks, clf, 1))
+        parallel = list(classification.iter_folds(datasets, tasks, clf, 2))
+
+        assert len(serial) == len(tasks)
+        for a, b in zip(serial, parallel):
+            assert a.shape == (3, 3)
+            assert_array_equal(a, b)
+        # no class 2 data for p1
+        assert serial[-1][2].sum() == 0
+
+    def test_runner(self):
+        # runners on different data taking turns with one pool
+        datasets = [{'p0': _session_data(seed=0)},
+                    {'p0': _session_data(seed=1)}]
+        folds = classification.cv_folds(datasets[0]['p0'].sid_list, 3)
+        tasks = [('p0', train, test) for train, test in folds]
+        clf = pipeline.LDAClassifier()
+
+        serial = [list(classification.iter_folds(d, tasks, clf))
+                  for d in datasets]
+
+        workers = classification.start_pool(2)
+        try:
+            for _ in range(2):
+                for data, expected in zip(datasets, serial):
+                    runner = classification.FoldRunner(data, workers)
+                    try:
+                        for a, b in zip(runner.run(tasks, clf), expected):
+                            assert_array_equal(a, b)
+                        for a, b in zip(runner.run(tasks), expected):
+                            assert a.sum() == b.sum()
+                    finally:
+                        runner.close()
+        finally:
+            workers.close()
+            workers.join()
+
+
+def _random_folds(n_folds, classes=(0, 1, 2), n=30, seed=0):
+    rng = np.random.RandomState(seed)
+    folds = []
+    for i in range(n_folds):
+        y_true = np.repeat(classes, n // len(classes)).astype(float)
+        y_pred = np.where(rng.rand(len(y_true)) < 0.7, y_true,
+                          rng.choice(classes, len(y_true)))
+        folds.append((y_true, y_pred))
+    return folds
+
+
+def _reference_counts(y_true, y_pred, classes):
+    mat = np.zeros((len(classes), len(classes)), dtype=int)
+    for t, p in zip(y_true, y_pred):
+        if t in classes and p in classes:
+            mat[list(classes).index(t), list(classes).index(p)] += 1
+    return mat
+
+
+class TestConfusionAccumulator(object):
+
+    def test_confusion_counts(self):
+        classes = [0, 1, 2]
+        for y_true, y_pred in _random_folds(5):
+            assert_array_equal(
+                classification.confusion_counts(y_true, y_pred, classes),
+                _reference_counts(y_true, y_pred, classes))
+
+    def test_unknown_labels(self):
+        y_true = np.array([0, 1, 3, 2, -1])
+        y_pred = np.array([0, 3, 1, 2, 2])
+        mat = classification.confusion_counts(y_true, y_pred, [0, 1, 2])
+        assert mat.sum() == 2
+        assert_array_equal(mat.diagonal(), [1, 0, 1])
+
+    def test_against_lists(self):
+        for n_folds in (1, 2, 7):
+            classes = [0, 1, 2]
+            acc = classification.ConfusionAccumulator(classes)
+            cm_list = []
+            for y_true, y_pred in _random_folds(n_folds, seed=n_folds):
+                acc.update(y_true, y_pred)
+                cm_list.append(classification.ConfusionMatrix(
+                    _reference_counts(y_true, y_pred, classes),
+                    ['0', '1', '2']))
+
+            # results as previously computed from the list of matrices
+            mat = np.sum([cm.data for cm in cm_list], axis=0)
+            diags = np.array([cm.data_norm.diagonal() for cm in cm_list])
+            fold_acc = np.array([cm.accuracy for cm in cm_list])
+
+            assert acc.n_folds == n_folds
+            assert_array_equal(acc.confusion_matrix().data, mat)
+            assert_allclose(acc.class_accuracy_mean, np.mean(diags, axis=0))
+            assert_allclose(acc.class_accuracy_std, np.std(diags, axis=0))
+            assert_allclose(acc.accuracy_mean, np.mean(fold_acc))
+            assert_allclose(acc.accuracy_std, np.std(fold_acc))
+            assert_allclose(classification.accuracy_std(cm_list),
+                            np.std(diags, axis=0))
+            assert_array_equal(
+                classification.average_confusion_matrix(cm_list).data, mat)
+
+    def test_single_fold(self):
+        # np.std uses ddof=0, so a single fold has no spread
+        y_true, y_pred = _random_folds(1)[0]
+        acc = classification.ConfusionAccumulator([0, 1, 2])
+        acc.update(y_true, y_pred)
+        assert acc.accuracy_std == 0
+        assert_array_equal(acc.class_accuracy_std, np.zeros(3))
@@ -1,5 +1,13 @@
+import os
+import shutil
+import tempfile
+
 import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
 
+from pygesture import features
+from pygesture import pipeline
+from pygesture import wav
 from pygesture.analysis import processing
 
 
@@ -39,3 +47,189 @@ class TestWindow(object):
         for i in processing.window(np.array([]), 2):
             pass
 
+
+
+class TestRecording(object):
+
+    def test_streaming(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            recfile = os.path.join(tmpdir, 'rec_2015-01-01_p0_t01_l2.wav')
+            data = 0.1 * np.random.RandomState(0).randn(6000, 3)
+            wav.write(recfile, 2000, data)
+
+            processor = processing.Processor(
+                conditioner=pipeline.Conditioner(4, (10, 450), 2000,
+                                                 f_down=1000),
+                windower=pipeline.Windower(200, 100),
+                feature_extractor=features.FeatureExtractor(
+                    [features.MAV(), features.WL()], 3),
+                rest_bounds=(0, 900),
+                gesture_bounds=(1000, 2500))
+
+            rec = processing.Recording(recfile, processor)
+            cd, fd = rec.process()
+
+            blocks = []
+            rec = processing.Recording(recfile, processor)
+            cd_stream, fd_stream = rec.process(block_length=333,
+                                               sink=blocks.append)
+
+            assert cd_stream is None
+            assert fd.shape == fd_stream.shape
+            assert_array_equal(fd[:, 0], fd_stream[:, 0])
+            assert_allclose(fd_stream, fd, rtol=1e-10)
+            assert_allclose(np.concatenate(blocks), cd, atol=1e-12)
+
+            # the whole recording is only read once
+            assert rec.raw_data is rec.raw_data
+            assert_allclose(rec.raw_data, data, atol=1e-4)
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestFeatureHeader(object):
+
+    def test_header(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            featfile = os.path.join(tmpdir, 'features.csv')
+            fe = features.FeatureExtractor(
+                [features.MAV(), features.ZC(thresh=0.003)], 2)
+            data = np.array([[1, 0.5, 0.25, 3, 4], [2, 0.1, 0.2, 1, 0]])
+            with open(featfile, 'ab') as fid:
+                processing.write_feature_header(fid, fe)
+                np.savetxt(fid, data, delimiter=',', fmt='%.5e')
+
+            spec = processing.read_feature_spec(featfile)
+            assert spec == fe.to_spec()
+            X, y = processing.read_feature_file_list([featfile])
+            assert_array_equal(X, data[:, 1:])
+            assert_array_equal(y, data[:, 0])
+
+            # files from before headers were written
+            with open(featfile, 'wb') as fid:
+                np.savetxt(fid, data, delimiter=',', fmt='%.5e')
+            assert processing.read_feature_spec(featfile) is None
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestBackgroundWriter(object):
+
+    def test_errors(self):
+        done = []
+
+        def fail():
+            raise IOError("disk full")
+
+        writer = processing._BackgroundWriter()
+        writer.submit(fail)
+        writer._thread.join(0.1)
+
+        # the error comes up at the next submit, later calls are skipped
+        try:
+            writer.submit(done.append, 1)
+            assert False
+        except IOError:
+            pass
+        writer.close()
+        assert done == []
+
+        # an error in processing isn't masked by the writer's
+        writer = processing._BackgroundWriter()
+        writer.submit(fail)
+        try:
+            try:
+                raise KeyError('processing')
+            except BaseException:
+                writer.close(raise_error=False)
+                raise
+        except KeyError:
+            pass
+
+
+class TestArrayCache(object):
+
+    def test_lru(self):
+        cache = processing.ArrayCache(max_bytes=2*80)
+        loads = []
+
+        def loader(i):
+            def load():
+                loads.append(i)
+                return np.zeros(10) + i
+            return load
+
+        for i in [0, 1, 0, 2, 0]:
+            assert cache.get(i, loader(i))[0] == i
+
+        # 1 was least recently used when 2 was added
+        assert loads == [0, 1, 2]
+        assert 1 not in cache and 0 in cache
+        assert cache.stats() == {'hits': 2, 'misses': 3, 'evictions': 1,
+                                 'entries': 2, 'nbytes': 160}
+
+        # too big to store at all
+        assert len(cache.get('big', lambda: np.zeros(100))) == 100
+        assert 'big' not in cache
+
+
+class TestConditioningCache(object):
+
+    def test_reuse(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            recfile = os.path.join(tmpdir, 'rec_2015-01-01_p0_t01_l2.wav')
+            wav.write(recfile, 2000,
+                      0.1 * np.random.RandomState(0).randn(6000, 3))
+            cachedir = os.path.join(tmpdir, 'cache')
+
+            def process(windower, cache):
+                processor = processing.Processor(
+                    conditioner=pipeline.Conditioner(4, (10, 450), 2000,
+                                                     f_down=1000),
+                    windower=windower,
+                    feature_extractor=features.FeatureExtractor(
+                        [features.MAV()], 3),
+                    rest_bounds=None,
+                    gesture_bounds=(1000, 2500),
+                    cache=cache)
+                return processing.Recording(recfile, processor).process()
+
+            cache = processing.ConditioningCache(directory=cachedir)
+            cd, fd = process(pipeline.Windower(200, 100), cache)
+            cd_cached, fd_cached = process(pipeline.Windower(300), cache)
+            assert cache.memory.stats()['hits'] == 1
+            assert cd_cached is cd
+            assert not cd.flags.writeable
+
+            # a new cache (e.g. in a later run) finds the file on disk
+            cache = processing.ConditioningCache(directory=cachedir)
+            cd_disk, _ = process(pipeline.Windower(200, 100), cache)
+            assert len(os.listdir(cachedir)) == 1
+            assert_array_equal(cd_disk, cd)
+
+            # the module-level cache is used by default
+            processing.conditioning_cache.clear()
+            process(pipeline.Windower(200, 100), None)
+            process(pipeline.Windower(300), None)
+            stats = processing.conditioning_cache.memory.stats()
+            assert stats['hits'] == 1 and stats['misses'] == 1
+            processing.conditioning_cache.clear()
+
+            # a modified recording isn't found in the cache
+            os.utime(recfile, (0, 0))
+            cache = processing.ConditioningCache()
+            process(pipeline.Windower(200, 100), cache)
+            os.utime(recfile, (1, 1))
+            process(pipeline.Windower(200, 100), cache)
+            assert cache.memory.stats()['misses'] == 2
+
+            cd_nocache, fd_nocache = process(
+                pipeline.Windower(200, 100), False)
+            assert cd_nocache.flags.writeable
+            assert_array_equal(cd_nocache, cd)
+            assert_array_equal(fd_nocache, fd)
+        finally:
+            shutil.rmtree(tmpdir)
@@ -0,0 +1,161 @@
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from pygesture import features
+from pygesture import filestruct
+from pygesture import pipeline
+from pygesture import wav
+from pygesture.analysis import processing
+
+try:
+    from pygesture.analysis import sweep
+except ImportError:
+    # the analysis tools use the older scikit-learn API
+    raise unittest.SkipTest("scikit-learn with sklearn.lda not available")
+
+
+SID_LIST = ['arm1', 'arm2', 'arm3']
+
+
+def _make_data(rootdir, pid='p0', labels=(0, 1, 2)):
+    rng = np.random.RandomState(0)
+    for sid in SID_LIST:
+        session_dir = os.path.join(
+            rootdir, pid, 'session_2015-01-01_%s_%s' % (pid, sid))
+        recording_dir = filestruct.get_recording_dir(session_dir)
+        os.makedirs(recording_dir)
+        for trial, label in enumerate(labels, 1):
+            f = filestruct.get_recording_file(
+                recording_dir, pid, sid, '2015-01-01', trial, label)
+            gain = 1 + 0.5*label*np.arange(1, 3)
+            wav.write(f, 2000, 0.05 * gain * rng.randn(4000, 2))
+
+
+def _processor(cache):
+    return processing.Processor(
+        conditioner=pipeline.Conditioner(4, (10, 450), 2000, f_down=2000),
+        windower=pipeline.Windower(200, 100),
+        feature_extractor=features.FeatureExtractor(
+            [features.MAV(), features.WL()], 2),
+        rest_bounds=None,
+        gesture_bounds=(1000, 3000),
+        cache=cache)
+
+
+class TestScaleBounds(object):
+
+    def test_scale(self):
+        assert sweep._scale_bounds((1000, 3000), 1000, 2000) == (500, 1500)
+        assert sweep._scale_bounds((1000, 3000), 2000, 2000) == (1000, 3000)
+        assert sweep._scale_bounds((100, 301), 1000, 3000) == (33, 100)
+
+    def test_none(self):
+        assert sweep._scale_bounds(None, 1000, 2000) is None
+
+
+class TestGenerateFeatures(object):
+
+    def test_cache(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            _make_data(tmpdir)
+            cache = processing.ConditioningCache()
+            processor = _processor(cache)
+            conditioners = [
+                processor.conditioner,
+                pipeline.Conditioner(4, (10, 450), 2000, f_down=1000)]
+            windowers = [pipeline.Windower(200, 100),
+                         pipeline.Windower(100, 50)]
+            extractors = [processor.feature_extractor]
+
+            fd = sweep.generate_features(
+                tmpdir, ['p0'], SID_LIST, processor, conditioners, windowers,
+                extractors)
+            # each recording is conditioned once per conditioner
+            stats = cache.memory.stats()
+            assert stats['misses'] == 2 * 3 * len(SID_LIST)
+            assert stats['hits'] == 0
+
+            fd_cached = sweep.generate_features(
+                tmpdir, ['p0'], SID_LIST, processor, conditioners, windowers,
+                extractors)
+            stats = cache.memory.stats()
+            assert stats['misses'] == 2 * 3 * len(SID_LIST)
+            assert stats['hits'] == 2 * 3 * len(SID_LIST)
+
+            for sid in SID_LIST:
+                assert sorted(fd['p0'][sid]) == [
+                    (0, 0, 0), (0, 1, 0), (1, 0, 0), (1, 1, 0)]
+                for key, data in fd['p0'][sid].items():
+                    assert_array_equal(fd_cached['p0'][sid][key], data)
+
+                # bounds are rescaled, so the half rate conditioner with half
+                # the window gives the same number of windows
+                n = len(fd['p0'][sid][(0, 0, 0)])
+                assert len(fd['p0'][sid][(1, 1, 0)]) == n
+                assert_array_equal(fd['p0'][sid][(0, 0, 0)][:, 0],
+                                   np.repeat([0, 1, 2], n // 3))
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestRunSweep(object):
+
+    def test_pool(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            _make_data(tmpdir)
+            processor = _processor(False)
+            cv_group = {'name': 'arm', 'n_train': 2, 'sid_list': SID_LIST}
+            windowers = {'a': pipeline.Windower(200, 100),
+                         'b': pipeline.Windower(400, 200)}
+            classifiers = {'lda': pipeline.LDAClassifier(), 'default': None}
+
+            results = sweep.run_sweep(
+                tmpdir, ['p0'], cv_group, processor, windowers=windowers,
+                classifiers=classifiers)
+            results_pool = sweep.run_sweep(
+                tmpdir, ['p0'], cv_group, processor, windowers=windowers,
+                classifiers=classifiers, pool=2)
+
+            assert len(results) == 4
+            assert [(r['windower'], r['classifier']) for r in results] == [
+                ('a', 'default'), ('a', 'lda'),
+                ('b', 'default'), ('b', 'lda')]
+            for r, r_pool in zip(results, results_pool):
+                assert r['n_folds'] == 3
+                assert r == r_pool
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestWriteResults(object):
+
+    def test_write(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, 'sweep.csv')
+            results = [
+                dict(pid='p0', conditioner='c', windower='w',
+                     feature_extractor='f', classifier='lda', accuracy=0.5,
+                     accuracy_mean=0.25, accuracy_std=0.125, n_folds=3),
+                dict(pid='p1', conditioner='c', windower='w',
+                     feature_extractor='f', classifier='lda', accuracy=1.0,
+                     accuracy_mean=1.0, accuracy_std=0.0, n_folds=3)]
+            sweep.write_results(results, filename)
+
+            with open(filename) as f:
+                rows = list(csv.reader(f))
+            assert rows[0] == sweep.COLUMNS
+            assert rows[1] == ['p0', 'c', 'w', 'f', 'lda', '0.5', '0.25',
+                               '0.125', '3']
+            assert rows[2][0] == 'p1'
+            assert len(rows) == 3
+        finally:
+            shutil.rmtree(tmpdir)
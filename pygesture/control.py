@@ -56,7 +56,12 @@ class LatchController(Controller):
     def __init__(self, mapping, latch_labels=[], num_required=1):
         super(LatchController, self).__init__(mapping)
         self.latch_labels = latch_labels
-        self.history = [0] * num_required
+        self.num_required = num_required
+
+        # only the length of the current run of identical labels is needed,
+        # starting as if `num_required` rest labels had been input
+        self._last_label = 0
+        self._run_length = num_required
 
     def process(self, label):
         self._update_history(label)
@@ -71,17 +76,23 @@ class LatchController(Controller):
 
         return self.mapping[out_label]
 
+    def clear(self):
+        self._last_label = 0
+        self._run_length = self.num_required
+
     def _update_history(self, label):
-        if len(self.history) > 1:
-            self.history = self.history[1:] + [label]
+        if label == self._last_label:
+            # capped so the count can't grow without bound
+            if self._run_length < self.num_required:
+                self._run_length += 1
         else:
-            self.history = [label]
+            self._last_label = label
+            self._run_length = 1
 
     def _check_latch(self, label):
-        for h in self.history:
-            if h != label:
-                return False
-        return True
+        if label != self._last_label:
+            return False
+        return self._run_length >= self.num_required
 
 
 class DBVRController(Controller):
@@ -126,46 +137,190 @@ class DBVRController(Controller):
             if val != 'no-contraction':
                 self.restless_mapping[key] = val
 
+        # the state of each (non-rest) class is kept in arrays, indexed in
+        # the order of restless_mapping
+        labels = list(self.restless_mapping)
+        self._index = dict((label, i) for i, label in enumerate(labels))
+        self._actions = [self.mapping[label] for label in labels]
+        self._boosts = np.array([self.boosts[label] for label in labels],
+                                dtype=float)
+
+        # count increments for each input label: the input class ramps up by
+        # one, all others ramp down by two
+        n = len(labels)
+        self._steps = {}
+        for label, i in self._index.items():
+            self._steps[label] = np.full(n, -2.0)
+            self._steps[label][i] = 1
+        self._rest_steps = np.full(n, -2.0)
+
+        self._counts = np.zeros(n)
+        self._gains = np.zeros(n)
+        self._vout = np.zeros(n)
+
         self._reset_values()
 
     def _reset_values(self):
-        k = self.restless_mapping.keys()
-        self._counts = dict.fromkeys(k, 0)
-        self._gains = dict.fromkeys(k, 0)
-        self._vin = dict.fromkeys(k, 0)
-        self._vout = {self.mapping[key]: 0 for key in self.restless_mapping}
+        self._counts.fill(0)
+        self._gains.fill(0)
+        self._vout.fill(0)
 
     def process(self, data):
         mav, label = data
+        return self._command(mav, label)
+
+    def clear(self):
+        self._reset_values()
 
+    def _command(self, mav, label, weight=1.0):
         if self.mapping[label] == 'no-contraction':
             self._reset_values()
             return 'no-contraction'
 
         self._update_gains(label)
 
-        mav_avg = np.mean(mav)
+        # same as np.mean, without its overhead
+        mav = np.asarray(mav)
+        mav_avg = np.add.reduce(mav, axis=None) / mav.size
 
-        for i in self._vin:
-            self._vin[i] = self.boosts[i] * mav_avg
-            v = self._gains[i] * self._vin[i]
-            if v > 1:
-                v = 1.0
-            self._vout[self.mapping[i]] = v
+        vout = self._vout
+        np.multiply(self._boosts, mav_avg * weight, out=vout)
+        np.multiply(self._gains, vout, out=vout)
+        np.minimum(vout, 1.0, out=vout)
 
-        return self._vout.copy()
+        # a new dict each time, since callers (e.g. the TAC logger) keep them
+        return dict(zip(self._actions, vout.tolist()))
 
     def _update_gains(self, label):
-        for l in self._counts:
-            if l == label:
-                self._counts[l] += 1
-            else:
-                self._counts[l] -= 2
+        counts = self._counts
+        counts += self._steps.get(label, self._rest_steps)
+        np.minimum(counts, self.ramp_length, out=counts)
+        np.maximum(counts, 0, out=counts)
+        np.divide(counts, float(self.ramp_length), out=self._gains)
+
+
+class PosteriorController(DBVRController):
+    """
+    Decision-based velocity ramp controller which also uses the confidence of
+    the classifier (see [1]).
+
+    The controller takes two inputs: the MAV of each channel and the
+    classifier output, which is a tuple (label, posteriors) as produced by
+    `pipeline.LDAClassifier` with `return_posteriors=True`. A plain label is
+    also accepted and treated as a certain prediction. Each input goes
+    through three stages:
+
+    1. Rejection: predictions with a maximum posterior below `threshold` are
+       rejected, i.e. counted as no decision.
+    2. Majority vote over the last `vote_length` decisions. If no decision
+       wins the vote, the output is 'no-contraction'.
+    3. Velocity ramp as in `DBVRController` for the winning class, with
+       velocities weighted by the posterior of that class if `weighted` is
+       True.
+
+    The vote is kept in a ring buffer with a count for each class, so each
+    input is handled in constant time without allocating new state.
+
+    Parameters
+    ----------
+    mapping : dict {int: Action}
+        Mapping from gesture class label to prosthetic action.
+    classes : array, shape (n_classes,)
+        Class labels in the order of the posteriors (e.g. the `classes_`
+        attribute of the classifier).
+    threshold : float, default=0
+        Minimum posterior of the predicted class for the prediction to be
+        accepted. The default accepts all predictions.
+    vote_length : int, default=1
+        Number of decisions in the majority vote. The default uses each
+        decision as is.
+    weighted : bool, default=True
+        Whether or not to weight the velocities by the posterior of the
+        output class.
+    ramp_length : int
+        Length of the ramp (see `DBVRController`).
+    boosts : float or dict
+        Boost value for each class (see `DBVRController`).
+
+    Attributes
+    ----------
+    label : int
+        Class label output by the vote for the latest input, or None if no
+        decision won the vote.
+
+    References
+    ----------
+    .. [1] `E. J. Scheme, B. S. Hudgins, and K. B. Englehart, "Confidence-Based
+        Rejection for Improved Pattern Recognition Myoelectric Control," IEEE
+        Transactions on Biomedical Engineering, vol. 60, no. 6, 2013.
+    """
 
-            if self._counts[l] > self.ramp_length:
-                self._counts[l] = self.ramp_length
+    def __init__(self, mapping, classes, threshold=0, vote_length=1,
+                 weighted=True, ramp_length=10, boosts=1):
+        super(PosteriorController, self).__init__(
+            mapping, ramp_length=ramp_length, boosts=boosts)
+        self.classes = np.asarray(classes).tolist()
+        self.threshold = threshold
+        self.vote_length = vote_length
+        self.weighted = weighted
+
+        n = len(self.classes)
+        self._class_index = dict((c, i) for i, c in enumerate(self.classes))
+
+        # index n in the ring buffer and vote counts means no decision
+        self._none = n
+        self._ring = np.zeros(vote_length, dtype=np.intp)
+        self._votes = np.zeros(n + 1, dtype=np.intp)
+        self._pos = 0
+
+        # posteriors used for plain label inputs
+        self._certain = np.zeros(n)
+
+        self.clear()
+
+    def clear(self):
+        super(PosteriorController, self).clear()
+        self._ring.fill(self._none)
+        self._votes.fill(0)
+        self._votes[self._none] = self.vote_length
+        self._pos = 0
+        self.label = None
 
-            if self._counts[l] < 0:
-                self._counts[l] = 0
+    def process(self, data):
+        mav, prediction = data
+
+        if isinstance(prediction, tuple):
+            posteriors = prediction[1]
+            k = int(np.argmax(posteriors))
+        else:
+            k = self._class_index[prediction]
+            posteriors = self._certain
+            posteriors.fill(0)
+            posteriors[k] = 1
+
+        if posteriors[k] < self.threshold:
+            k = self._none
+
+        k = self._vote(k)
+
+        if k == self._none:
+            self.label = None
+            self._reset_values()
+            return 'no-contraction'
 
-            self._gains[l] = self._counts[l] / float(self.ramp_length)
+        self.label = self.classes[k]
+        weight = float(posteriors[k]) if self.weighted else 1.0
+        return self._command(mav, self.label, weight)
+
+    def _vote(self, k):
+        votes = self._votes
+        pos = self._pos
+        votes[self._ring[pos]] -= 1
+        self._ring[pos] = k
+        votes[k] += 1
+        self._pos = (pos + 1) % self.vote_length
+
+        # ties go to the latest decision if it's one of them
+        if votes[k] == votes.max():
+            return k
+        return int(np.argmax(votes))
@@ -1,6 +1,5 @@
 import time
 import socket
-import struct
 import numpy as np
 
 try:
@@ -15,10 +14,12 @@ class Daq(object):
     data.
     """
 
-    def __init__(self, rate, input_range, channel_range, samples_per_read):
+    def __init__(self, rate, input_range, channel_range, samples_per_read,
+                 dtype=np.float64):
         self.rate = rate
         self.input_range = input_range
         self.samples_per_read = samples_per_read
+        self.dtype = dtype
 
         self.set_channel_range(channel_range)
 
@@ -29,7 +30,7 @@ class Daq(object):
         d = 0.2*self.input_range*(
             np.random.rand(self.num_channels, self.samples_per_read) - 0.5)
         time.sleep(float(self.samples_per_read/self.rate))
-        return d
+        return d.astype(self.dtype, copy=False)
 
     def stop(self):
         pass
@@ -56,6 +57,8 @@ class MccDaq(Daq):
         channels lowchan through highchan
     samples_per_read : int
         Number of samples per channel to read in each read operation
+    dtype : numpy dtype, default=np.float64
+        Float type of the data returned by `read`.
 
     Examples
     --------
@@ -69,11 +72,13 @@ class MccDaq(Daq):
     >>> dev.stop()
     """
 
-    def __init__(self, rate, input_range, channel_range, samples_per_read):
+    def __init__(self, rate, input_range, channel_range, samples_per_read,
+                 dtype=np.float64):
         self.rate = rate
         self.input_range = input_range
         self.channel_range = channel_range
         self.samples_per_read = samples_per_read
+        self.dtype = dtype
 
         self._initialize()
 
@@ -107,7 +112,7 @@ class MccDaq(Daq):
         data = self.device.read_scan_data(
             self.samples_per_read*self.num_channels, self.rate)
 
-        data = np.array(data, dtype=np.float)
+        data = np.array(data, dtype=self.dtype)
         data = np.reshape(data, (-1, self.num_channels)).T
         for i in range(self.num_channels):
             data[i, :] = self.device.scale_and_calibrate_data(
@@ -164,6 +169,9 @@ class TrignoDaq(object):
         Number of samples per channel to read in each read operation
     addr : str, default='localhost'
         IP address the TCU server is running on.
+    dtype : numpy dtype, default=np.float64
+        Float type of the data returned by `read`. The TCU serves 32-bit
+        floats, so np.float32 avoids any conversion.
 
     Examples
     --------
@@ -194,10 +202,12 @@ class TrignoDaq(object):
     """Scaling factor to apply to output to get a (-1, 1) range."""
     SCALE = 1 / 0.011
 
-    def __init__(self, channel_range, samples_per_read, addr='localhost'):
+    def __init__(self, channel_range, samples_per_read, addr='localhost',
+                 dtype=np.float64):
         self.channel_range = channel_range
         self.samples_per_read = samples_per_read
         self.addr = addr
+        self.dtype = dtype
 
         self.input_range = 1
         self.rate = self.RATE
@@ -232,11 +242,10 @@ class TrignoDaq(object):
                 raise DisconnectException
             l = len(packet)
 
-        data = np.asarray(
-            struct.unpack(
-                '<'+'f'*self.NUM_CHANNELS*self.samples_per_read, packet))
+        data = np.frombuffer(packet, dtype='<f4')
         data = np.transpose(data.reshape((-1, self.NUM_CHANNELS)))
         data = data[self.channel_range[0]:self.channel_range[1]+1, :]
+        data = data.astype(self.dtype)
         data *= self.SCALE
         return data
 
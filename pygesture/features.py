@@ -1,9 +1,61 @@
+import inspect
+import json
+
 import numpy as np
+from scipy import signal
 
+from pygesture import kernels
 from pygesture.pipeline import PipelineBlock
 
 
 class FeatureExtractor(PipelineBlock):
+    """
+    Computes a set of features from a window of data, concatenating the
+    outputs of the features in the order they're given.
+
+    Intermediate quantities shared by several features (absolute value,
+    differences, spectral moments, etc.) are computed once per window (see
+    `WindowData`), so adding a feature to the set only costs the work that is
+    specific to that feature.
+
+    A feature extractor can also be described by a spec, a JSON-compatible
+    dict giving the number of channels and the name and parameters of each
+    feature (see `to_spec` and `from_spec`). The spec is what gets stored
+    along with feature files, trained models and TAC logs to record how the
+    features were computed.
+
+    Parameters
+    ----------
+    features : list of Feature
+        The features to compute.
+    n_channels : int
+        Number of channels of the input data.
+
+    Attributes
+    ----------
+    offsets : array
+        Start of each feature's columns in the output, followed by the total
+        number of columns.
+    layout : list of slice
+        The columns of each feature in the output.
+
+    Examples
+    --------
+    >>> from pygesture import features
+    >>> fe = features.FeatureExtractor([features.MAV(), features.WL()], 4)
+    >>> fe.process(np.random.randn(200, 4)).shape
+    (8,)
+    >>> fe.process(np.random.randn(10, 200, 4)).shape
+    (10, 8)
+    >>> fe.get_slice('WL')
+    slice(4, 8, None)
+    >>> spec = fe.to_spec()
+    >>> spec['features'][1]
+    {'name': 'WL', 'params': {}}
+    >>> fe = features.FeatureExtractor.from_spec(spec)
+    """
+
+    SPEC_VERSION = 1
 
     def __init__(self, features, n_channels):
         super(FeatureExtractor, self).__init__()
@@ -12,26 +64,487 @@ class FeatureExtractor(PipelineBlock):
         self.n_features = n_channels*sum(
             [f.dim_per_channel for f in self.features])
 
-        self.output = np.zeros(self.n_channels*self.n_features)
+        self.offsets = np.cumsum(
+            [0] + [n_channels*f.dim_per_channel for f in self.features])
+        self.layout = [slice(int(start), int(end)) for start, end in
+                       zip(self.offsets[:-1], self.offsets[1:])]
+
+        # columns of the first feature of each type
+        self._slices = {}
+        for f, columns in zip(self.features, self.layout):
+            self._slices.setdefault(f.__class__.__name__, columns)
+
+    @classmethod
+    def from_spec(cls, spec):
+        """
+        Creates a feature extractor from a spec (see `to_spec`), given as a
+        dict or a JSON string.
+        """
+        if not isinstance(spec, dict):
+            spec = json.loads(spec)
+        if spec.get('version') != cls.SPEC_VERSION:
+            raise ValueError("Unsupported feature extractor spec version: "
+                             "%r" % spec.get('version'))
+        return cls([feature_from_spec(f) for f in spec['features']],
+                   spec['n_channels'])
+
+    def to_spec(self):
+        """
+        Returns the spec of the feature extractor, a JSON-compatible dict
+        from which `from_spec` creates an equivalent feature extractor.
+        """
+        return {
+            'version': self.SPEC_VERSION,
+            'n_channels': int(self.n_channels),
+            'features': [f.to_spec() for f in self.features]
+        }
+
+    def get_slice(self, name):
+        """
+        Returns the columns of the output holding the feature with the given
+        class name (e.g. 'MAV'). If there are several, the first one is used.
+        Raises KeyError if the feature isn't in the set.
+        """
+        return self._slices[name]
 
     def process(self, data):
-        # TODO use pre-allocated output array instead of hstack
-        return np.hstack([f.compute(data) for f in self.features])
+        """
+        Computes the features of a window, shape (n_samples, n_channels), or
+        a batch of windows, shape (n_windows, n_samples, n_channels). The
+        output has shape (n_features,) or (n_windows, n_features).
+        """
+        window = WindowData(data)
+        out = np.empty(data.shape[:-2] + (self.n_features,), dtype=data.dtype)
+        for f, start, end in zip(self.features, self.offsets[:-1],
+                                 self.offsets[1:]):
+            out[..., start:end] = f.extract(window)
+        return out
 
     def __repr__(self):
-        return "%s.%s(%s)" % (
+        return "%s.%s([%s], n_channels=%s)" % (
             self.__class__.__module__,
             self.__class__.__name__,
-            str([str(f) for f in self.features])
+            ", ".join(repr(f) for f in self.features),
+            self.n_channels
         )
 
 
+class SlidingFeatureExtractor(PipelineBlock):
+    """
+    Computes the features of a sliding window incrementally, taking the place
+    of a `pipeline.Windower` followed by a `FeatureExtractor`. Like the
+    windower, the input is the new data of each window, shape
+    (length-overlap, n_channels), and the window starts out filled with
+    zeros.
+
+    Features providing sliding terms (see `Feature.sliding_terms`), such as
+    MAV, WL, ZC, SSC and the spectral moments, are computed from partial sums
+    of their terms over each hop of new data, so only the new samples are
+    processed. The window sums are formed by adding up the partial sums of
+    the hops in the window, leaving out the terms of the oldest hop which
+    reach back past the start of the window. This gives the same result as
+    the batch computation (up to rounding of the sums, counts are exact).
+    Other features are computed from the whole window as usual, as are
+    features whose terms reach back further than the hop length. If the
+    window length isn't a multiple of the hop, all features are computed
+    from the whole window.
+
+    Parameters
+    ----------
+    feature_extractor : FeatureExtractor
+        The features to compute.
+    length : int
+        Window length in samples.
+    overlap : int, default=0
+        Number of samples of the previous window kept in the current window.
+
+    Examples
+    --------
+    >>> from pygesture import features, pipeline
+    >>> fe = features.FeatureExtractor([features.MAV(), features.WL()], 4)
+    >>> p = pipeline.Pipeline([
+    ...     pipeline.Conditioner(4, (10, 450), 2000),
+    ...     features.SlidingFeatureExtractor(fe, 432, 216)])
+    """
+
+    def __init__(self, feature_extractor, length, overlap=0):
+        super(SlidingFeatureExtractor, self).__init__()
+        self.feature_extractor = feature_extractor
+        self.length = length
+        self.overlap = overlap
+        self.hop = length - overlap
+
+        self.terms = {}
+        self._sliding = []
+        for f in feature_extractor.features:
+            terms = None
+            if length % self.hop == 0:
+                terms = f.sliding_terms()
+            if terms is not None and any(c > self.hop
+                                         for c, _ in terms.values()):
+                terms = None
+            self._sliding.append(terms is not None)
+            if terms is not None:
+                self.terms.update(terms)
+
+        self.n_hops = length // self.hop
+        self.context = max([c for c, _ in self.terms.values()] + [0])
+
+        self.clear()
+
+    def clear(self):
+        self._buffer = None
+
+    def process(self, data):
+        if self._buffer is None:
+            self._preallocate(data.shape[1], data.dtype)
+
+        hop = self.hop
+        buf = self._buffer
+        buf[:-hop, :] = buf[hop:, :]
+        buf[-hop:, :] = data
+
+        sums = {}
+        if self.terms:
+            # terms of the new samples, which may use the samples before them
+            window = WindowData(buf[-(self.context+hop):, :])
+            terms = self._terms
+            for (context, func), cols in zip(self.terms.values(),
+                                             self._columns):
+                terms[:, cols] = func(window)[-hop:, :]
+
+            # terms whose context reaches back into the previous hop are
+            # summed separately, the rest go into the hop's partial sums
+            slot = self._slot
+            if self.context > 0:
+                joint = terms[:self.context]
+                self._joints[slot] = np.add.reduce(
+                    joint * self._joint_mask, axis=0)
+                joint *= 1 - self._joint_mask
+            self._partials[slot] = np.add.reduce(terms, axis=0)
+
+            # the next slot to be overwritten holds the oldest hop, whose
+            # joint terms reach back past the start of the window
+            self._slot = (slot + 1) % self.n_hops
+            total = np.add.reduce(self._partials, axis=0)
+            if self.n_hops > 1:
+                total += np.add.reduce(
+                    self._joints[self._newer[self._slot]], axis=0)
+            for key, cols in zip(self.terms, self._columns):
+                sums[key] = total[cols]
+
+        fe = self.feature_extractor
+        out = np.empty(fe.n_features, dtype=data.dtype)
+        window = None
+        for f, sliding, start, end in zip(fe.features, self._sliding,
+                                          fe.offsets[:-1], fe.offsets[1:]):
+            if sliding:
+                out[start:end] = f.combine(sums, self.length)
+            else:
+                if window is None:
+                    window = WindowData(buf[-self.length:, :])
+                out[start:end] = f.extract(window)
+        return out
+
+    def _preallocate(self, cols, dtype=np.float64):
+        n_terms = len(self.terms)
+        self._buffer = np.zeros(
+            (max(self.length, self.context + self.hop), cols), dtype=dtype)
+        # the terms are stored side by side so they're summed all at once
+        self._columns = [slice(i*cols, (i+1)*cols) for i in range(n_terms)]
+        self._terms = np.zeros((self.hop, n_terms*cols), dtype=dtype)
+        self._partials = np.zeros((self.n_hops, n_terms*cols), dtype=dtype)
+        self._joints = np.zeros((self.n_hops, n_terms*cols), dtype=dtype)
+        self._joint_mask = np.zeros((self.context, n_terms*cols), dtype=dtype)
+        for (context, _), c in zip(self.terms.values(), self._columns):
+            self._joint_mask[:context, c] = 1
+        # slots of all but the oldest hop, by the oldest hop's slot
+        self._newer = [[i for i in range(self.n_hops) if i != slot]
+                       for slot in range(self.n_hops)]
+        self._slot = 0
+
+    def __repr__(self):
+        return "%s.%s(%s, length=%s, overlap=%s)" % (
+            self.__class__.__module__,
+            self.__class__.__name__,
+            self.feature_extractor,
+            self.length,
+            self.overlap
+        )
+
+
+class WindowData(object):
+    """
+    A window of data along with intermediate quantities computed from it,
+    which are computed the first time they're requested and reused
+    afterwards. Samples are along axis -2, so the window can also be a batch
+    of windows with shape (..., n_samples, n_channels).
+
+    Parameters
+    ----------
+    x : array, shape (..., n_samples, n_channels)
+        The window data.
+    """
+
+    def __init__(self, x):
+        self.x = x
+        self._cache = {}
+
+    def get(self, key, func):
+        """
+        Returns the quantity stored under `key`, calling `func` (no
+        arguments) to compute it the first time.
+        """
+        try:
+            return self._cache[key]
+        except KeyError:
+            value = func()
+            self._cache[key] = value
+            return value
+
+    @property
+    def abs(self):
+        """Absolute value of the data."""
+        return self.get('abs', lambda: np.absolute(self.x))
+
+    @property
+    def square(self):
+        """Square of the data."""
+        return self.get('square', lambda: np.multiply(self.x, self.x))
+
+    def diff(self, n=1):
+        """nth order difference of the data along the samples."""
+        if n == 0:
+            return self.x
+        return self.get(('diff', n),
+                        lambda: np.diff(self.diff(n-1), axis=-2))
+
+    def abs_diff(self, n=1):
+        """Absolute value of the nth order difference."""
+        return self.get(('abs_diff', n),
+                        lambda: np.absolute(self.diff(n)))
+
+    def square_diff(self, n=1):
+        """Square of the nth order difference."""
+        if n == 0:
+            return self.square
+        d = self.diff(n)
+        return self.get(('square_diff', n), lambda: np.multiply(d, d))
+
+    def moment(self, n):
+        """
+        nth order spectral moment, estimated in the time domain as the power
+        of the (n/2)th order difference. Odd orders are zero.
+        """
+        def compute():
+            if n % 2 != 0:
+                return np.zeros(self.x.shape[:-2] + self.x.shape[-1:],
+                                dtype=self.x.dtype)
+            return np.sum(self.square_diff(n//2), axis=-2)
+
+        return self.get(('moment', n), compute)
+
+    def spectrum(self, f_samp, segment_length=None, taper='hann'):
+        """
+        One-sided power spectral density along the samples, computed with a
+        real FFT of the whole window (periodogram) or, if a segment length is
+        given, averaged over half-overlapping segments (Welch's method). All
+        channels (and windows, for a batch) are transformed at once.
+
+        Returns
+        -------
+        freqs : array, shape (n_freqs,)
+            Frequency of each bin (Hz).
+        psd : array, shape (..., n_freqs, n_channels)
+            Power spectral density.
+        """
+        n = self.x.shape[-2]
+        if segment_length is None or segment_length >= n:
+            segment_length = n
+
+        def compute():
+            plan = spectrum_plan(segment_length, f_samp, taper)
+            if segment_length == n:
+                segments = self.x
+            else:
+                hop = max(segment_length // 2, 1)
+                starts = np.arange(0, n - segment_length + 1, hop)
+                rows = starts[:, np.newaxis] + np.arange(segment_length)
+                # shape (..., n_segments, segment_length, n_channels)
+                segments = self.x[..., rows, :]
+
+            w = plan.taper.astype(self.x.dtype, copy=False)
+            X = np.fft.rfft(segments * w[:, np.newaxis], axis=-2)
+            psd = (X.real**2 + X.imag**2) * plan.scale[:, np.newaxis]
+            if segment_length != n:
+                psd = np.mean(psd, axis=-3)
+            return plan.freqs, psd.astype(self.x.dtype, copy=False)
+
+        return self.get(('spectrum', f_samp, segment_length, taper), compute)
+
+    def autocorr(self, max_lag):
+        """
+        Autocorrelation (biased, not normalized) for lags 0 to `max_lag`,
+        shape (..., max_lag+1, n_channels). Lag 0 is the 0th order spectral
+        moment.
+        """
+        def compute():
+            x = self.x
+            n = x.shape[-2]
+            r = np.zeros(x.shape[:-2] + (max_lag+1,) + x.shape[-1:],
+                         dtype=x.dtype)
+            r[..., 0, :] = self.moment(0)
+            for k in range(1, min(max_lag, n-1) + 1):
+                r[..., k, :] = np.einsum('...ij,...ij->...j',
+                                         x[..., k:, :], x[..., :n-k, :])
+            return r
+
+        return self.get(('autocorr', max_lag), compute)
+
+    def lpc(self, order):
+        """
+        Coefficients a_1..a_p of the AR model x[n] = -sum(a_k x[n-k]) + e[n],
+        found from the autocorrelation with the Levinson-Durbin recursion
+        (all channels and windows at once). Shape (..., order, n_channels).
+        Channels with no power give zeros.
+        """
+        def compute():
+            r = self.autocorr(order)
+            a = np.zeros(r.shape[:-2] + (order,) + r.shape[-1:],
+                         dtype=r.dtype)
+            err = r[..., 0, :].copy()
+            for i in range(order):
+                acc = r[..., i+1, :].copy()
+                for j in range(i):
+                    acc += a[..., j, :] * r[..., i-j, :]
+                k = np.divide(-acc, err, out=np.zeros_like(acc),
+                              where=err > 0)
+                if i > 0:
+                    update = k[..., np.newaxis, :] * a[..., i-1::-1, :]
+                    a[..., :i, :] = a[..., :i, :] + update
+                a[..., i, :] = k
+                err *= 1 - k*k
+            return a
+
+        return self.get(('lpc', order), compute)
+
+
+class SpectrumPlan(object):
+    """
+    Precomputed quantities for computing power spectra of a given length:
+    the taper, the frequency of each bin and the scaling of each bin to a
+    one-sided power spectral density. Plans are cached by `spectrum_plan`.
+    """
+
+    def __init__(self, length, f_samp, taper='hann'):
+        self.length = length
+        self.f_samp = f_samp
+        self.taper = signal.get_window(taper, length)
+        self.freqs = np.fft.rfftfreq(length, 1.0/f_samp)
+
+        scale = np.full(len(self.freqs),
+                        2.0 / (f_samp * np.sum(self.taper**2)))
+        # DC and Nyquist bins aren't mirrored
+        scale[0] /= 2
+        if length % 2 == 0:
+            scale[-1] /= 2
+        self.scale = scale
+
+
+_spectrum_plans = {}
+
+
+def spectrum_plan(length, f_samp, taper='hann'):
+    """
+    Returns the (cached) SpectrumPlan for the given window length, sampling
+    rate and taper.
+    """
+    key = (length, f_samp, taper)
+    plan = _spectrum_plans.get(key)
+    if plan is None:
+        plan = SpectrumPlan(length, f_samp, taper)
+        _spectrum_plans[key] = plan
+    return plan
+
+
 class Feature(object):
+    """
+    Base class for features. Implementations provide `extract`, which takes a
+    `WindowData` so intermediate quantities can be shared with other
+    features, and return an array of shape (..., n_channels*dim_per_channel).
+
+    Features which are a function of sums over the samples can also be
+    computed incrementally on a sliding window (see
+    `SlidingFeatureExtractor`) by providing `sliding_terms` and `combine`.
+
+    Features store their constructor arguments as attributes of the same
+    name, which gives their parameters (see `get_params`) for the repr and
+    the spec. Features defined outside this module need to be added with
+    `register` to be created from a spec.
+    """
+
+    def compute(self, x):
+        """
+        Computes the feature from a window (or batch of windows) of data with
+        samples along axis -2.
+        """
+        return self.extract(WindowData(x))
+
+    def extract(self, window):
+        return self.compute(window.x)
+
+    def sliding_terms(self):
+        """
+        Returns the terms the feature is computed from as a dict of
+        name: (context, func), or `None` if it can't be computed
+        incrementally. `func` takes a `WindowData` and returns the terms,
+        shape (..., n_samples-context, n_channels), where each term depends
+        on a sample and the `context` samples before it. Features using the
+        same terms should use the same name so they're only computed once.
+        """
+        return None
+
+    def combine(self, sums, n):
+        """
+        Computes the feature from the sums of the terms (see `sliding_terms`)
+        over a window of `n` samples. `sums` is a dict with the same keys as
+        the terms.
+        """
+        raise NotImplementedError
+
+    def get_params(self):
+        """
+        Returns the parameters of the feature, a dict of constructor argument
+        names and values. Arguments which aren't stored as an attribute of
+        the same name are left out.
+        """
+        params = {}
+        for name in _init_args(self.__class__):
+            if hasattr(self, name):
+                params[name] = getattr(self, name)
+        return params
+
+    def to_spec(self):
+        """
+        Returns the spec of the feature, a JSON-compatible dict (see
+        `feature_from_spec`). Raises a ValueError if a constructor argument
+        isn't stored as an attribute, since the feature couldn't be created
+        from the spec.
+        """
+        params = self.get_params()
+        missing = [n for n in _init_args(self.__class__) if n not in params]
+        if missing:
+            raise ValueError(
+                "%s doesn't store the constructor arguments %s" %
+                (self.__class__.__name__, ", ".join(missing)))
+        return {'name': self.__class__.__name__,
+                'params': _jsonable(params)}
 
     def __repr__(self):
-        return "%s.%s()" % (
+        return "%s.%s(%s)" % (
             self.__class__.__module__,
-            self.__class__.__name__
+            self.__class__.__name__,
+            ", ".join("%s=%r" % item for item in self.get_params().items())
         )
 
 
@@ -43,9 +556,14 @@ class MAV(Feature):
     def __init__(self):
         self.dim_per_channel = 1
 
-    def compute(self, x):
-        y = np.mean(np.absolute(x), axis=0)
-        return y
+    def extract(self, window):
+        return np.mean(window.abs, axis=-2)
+
+    def sliding_terms(self):
+        return {'abs': (0, lambda window: window.abs)}
+
+    def combine(self, sums, n):
+        return sums['abs'] / n
 
 
 class WL(Feature):
@@ -58,9 +576,14 @@ class WL(Feature):
     def __init__(self):
         self.dim_per_channel = 1
 
-    def compute(self, x):
-        y = np.sum(np.absolute(np.diff(x, axis=0)), axis=0)
-        return y
+    def extract(self, window):
+        return np.sum(window.abs_diff(1), axis=-2)
+
+    def sliding_terms(self):
+        return {'abs_diff': (1, lambda window: window.abs_diff(1))}
+
+    def combine(self, sums, n):
+        return sums['abs_diff']
 
 
 class ZC(Feature):
@@ -77,29 +600,51 @@ class ZC(Feature):
         Specifies if spectral moments should be used for the computation. This
         is much faster, but the threshold is not taken into account, making it
         potentially affected by noise.
+    backend : {'numpy', 'numba'}, default='numpy'
+        Implementation of the thresholded count. 'numba' uses a compiled
+        kernel (see `pygesture.kernels`) if numba is installed, falling back
+        to NumPy otherwise.
     """
 
-    def __init__(self, thresh=0.0, use_sm=False):
+    def __init__(self, thresh=0.0, use_sm=False, backend='numpy'):
         self.dim_per_channel = 1
         self.thresh = thresh
         self.use_sm = use_sm
+        self.backend = backend
+        kernels.use_compiled(backend)
 
-    def compute(self, x):
+    def extract(self, window):
+        if self.use_sm:
+            return np.sqrt(window.moment(2) / window.moment(0))
+
+        x = window.x
+        if kernels.use_compiled(self.backend):
+            counts = kernels.zero_crossings(kernels.as_batch(x),
+                                            x.dtype.type(self.thresh))
+            return counts.reshape(x.shape[:-2] + x.shape[-1:]).astype(x.dtype)
+
+        crossing = self._crossings(window)
+        return np.count_nonzero(crossing, axis=-2).astype(window.x.dtype)
+
+    def sliding_terms(self):
         if self.use_sm:
-            y = np.sqrt(
-                SpectralMoment(2).compute(x) / SpectralMoment(0).compute(x))
+            return {('moment', 0): _moment_terms(0),
+                    ('moment', 2): _moment_terms(2)}
+        return {('zc', self.thresh): (1, self._crossings)}
 
-        else:
-            xrows, xcols = x.shape
-            y = np.zeros(xcols)
-            for i in range(xcols):
-                for j in range(1, xrows):
-                    if ((x[j, i] > 0 and x[j-1, i] < 0) or
-                            (x[j, i] < 0 and x[j-1, i] > 0)):
-                        if np.absolute(x[j, i] - x[j-1, i]) > self.thresh:
-                            y[i] += 1
+    def combine(self, sums, n):
+        if self.use_sm:
+            return np.sqrt(sums[('moment', 2)] / sums[('moment', 0)])
+        return sums[('zc', self.thresh)]
 
-        return y
+    def _crossings(self, window):
+        x = window.x
+        pos = window.get('pos', lambda: x > 0)
+        neg = window.get('neg', lambda: x < 0)
+        crossing = pos[..., 1:, :] & neg[..., :-1, :]
+        crossing |= neg[..., 1:, :] & pos[..., :-1, :]
+        crossing &= window.abs_diff(1) > self.thresh
+        return crossing
 
 
 class SSC(Feature):
@@ -116,29 +661,52 @@ class SSC(Feature):
         Specifies if spectral moments should be used for the computation. This
         is much faster, but the threshold is not taken into account, making it
         potentially affected by noise.
+    backend : {'numpy', 'numba'}, default='numpy'
+        Implementation of the thresholded count (see `ZC`).
     """
 
-    def __init__(self, thresh=0.0, use_sm=False):
+    def __init__(self, thresh=0.0, use_sm=False, backend='numpy'):
         self.dim_per_channel = 1
         self.thresh = thresh
         self.use_sm = use_sm
+        self.backend = backend
+        kernels.use_compiled(backend)
 
-    def compute(self, x):
+    def extract(self, window):
         if self.use_sm:
-            y = np.sqrt(
-                SpectralMoment(4).compute(x) / SpectralMoment(2).compute(x))
-
-        else:
-            xrows, xcols = x.shape
-            y = np.zeros(xcols)
-            for i in range(xcols):
-                for j in range(1, xrows-1):
-                    if ((x[j, i] > x[j-1, i] and x[j, i] > x[j+1, i]) or
-                            (x[j, i] < x[j-1, i] and x[j, i] < x[j+1, i])):
-                        if (np.absolute(x[j, i]-x[j-1, i]) > self.thresh or
-                                np.absolute(x[j, i]-x[j+1, i]) > self.thresh):
-                            y[i] += 1
-        return y
+            return np.sqrt(window.moment(4) / window.moment(2))
+
+        x = window.x
+        if kernels.use_compiled(self.backend):
+            counts = kernels.slope_sign_changes(kernels.as_batch(x),
+                                                x.dtype.type(self.thresh))
+            return counts.reshape(x.shape[:-2] + x.shape[-1:]).astype(x.dtype)
+
+        change = self._changes(window)
+        return np.count_nonzero(change, axis=-2).astype(window.x.dtype)
+
+    def sliding_terms(self):
+        if self.use_sm:
+            return {('moment', 2): _moment_terms(2),
+                    ('moment', 4): _moment_terms(4)}
+        return {('ssc', self.thresh): (2, self._changes)}
+
+    def combine(self, sums, n):
+        if self.use_sm:
+            return np.sqrt(sums[('moment', 4)] / sums[('moment', 2)])
+        return sums[('ssc', self.thresh)]
+
+    def _changes(self, window):
+        # with d the first difference, x[j]-x[j-1] = d[j-1] and
+        # x[j]-x[j+1] = -d[j]
+        d = window.diff(1)
+        rising = window.get('diff_pos', lambda: d > 0)
+        falling = window.get('diff_neg', lambda: d < 0)
+        change = rising[..., :-1, :] & falling[..., 1:, :]
+        change |= falling[..., :-1, :] & rising[..., 1:, :]
+        big = window.abs_diff(1) > self.thresh
+        change &= big[..., :-1, :] | big[..., 1:, :]
+        return change
 
 
 class SpectralMoment(Feature):
@@ -156,21 +724,23 @@ class SpectralMoment(Feature):
         self.dim_per_channel = 1
         self.n = n
 
-    def compute(self, x):
-        xrows, xcols = x.shape
-        y = np.zeros(xcols)
+    def extract(self, window):
+        return window.moment(self.n)
 
-        if self.n % 2 != 0:
-            return y
+    def sliding_terms(self):
+        return {('moment', self.n): _moment_terms(self.n)}
 
-        # special case, zeroth order moment is just the power
-        if self.n == 0:
-            y = np.sum(np.multiply(x, x), axis=0)
+    def combine(self, sums, n):
+        return sums[('moment', self.n)]
 
-        else:
-            y = SpectralMoment(0).compute(np.diff(x, int(self.n/2), axis=0))
 
-        return y
+def _moment_terms(n):
+    """
+    Sliding terms (context, func) of the nth order spectral moment.
+    """
+    if n % 2 != 0:
+        return 0, lambda window: np.zeros_like(window.x)
+    return n//2, lambda window: window.square_diff(n//2)
 
 
 class KhushabaSet(Feature):
@@ -200,23 +770,31 @@ class KhushabaSet(Feature):
         self.dim_per_channel = 5
         self.u = u
 
-    def compute(self, x):
-        xrows, xcols = x.shape
-        # TODO fill this instead of using hstack
-        # y = np.zeros(self.dim_per_channel*xcols)
+    def extract(self, window):
+        return self._combine(window.moment(0), window.moment(2),
+                             window.moment(4),
+                             np.sum(window.abs_diff(1), axis=-2))
+
+    def sliding_terms(self):
+        return {('moment', 0): _moment_terms(0),
+                ('moment', 2): _moment_terms(2),
+                ('moment', 4): _moment_terms(4),
+                'abs_diff': (1, lambda window: window.abs_diff(1))}
+
+    def combine(self, sums, n):
+        return self._combine(sums[('moment', 0)], sums[('moment', 2)],
+                             sums[('moment', 4)], sums['abs_diff'])
 
-        m0 = SpectralMoment(0).compute(x)
-        m2 = SpectralMoment(2).compute(x)
-        m4 = SpectralMoment(4).compute(x)
+    def _combine(self, m0, m2, m4, wl):
         S = m0 / np.sqrt(np.abs((m0-m2)*(m0-m4)))
         IF = np.sqrt(m2**2 / (m0*m4))
 
-        return np.hstack((
+        return np.concatenate((
             np.log(m0),
             np.log(m2 / m0**2),
             np.log(m4 / m0**4),
             np.log(S),
-            np.log(IF / WL().compute(x))))
+            np.log(IF / wl)), axis=-1)
 
 
 class SampEn(Feature):
@@ -234,12 +812,23 @@ class SampEn(Feature):
     subsequence length m is too high. A typical value for r is apparently
     0.2*std(x).
 
+    The matches are counted for all channels at once by comparing blocks of
+    templates against all later templates, with the block size chosen so the
+    temporary distance arrays stay within a memory limit.
+
     Parameters
     ----------
     m : int
         Length of sequences to compare (>1)
     r : float
         Tolerance for counting matches.
+    max_bytes : int, default=32 MiB
+        Approximate limit on the memory used for the pairwise distances.
+    backend : {'numpy', 'numba'}, default='numpy'
+        Implementation of the match counting. 'numba' uses a compiled kernel
+        (see `pygesture.kernels`) which needs no temporaries and stops
+        comparing templates at the first mismatch, if numba is installed.
+        Otherwise the NumPy implementation is used.
 
     References
     ----------
@@ -249,38 +838,312 @@ class SampEn(Feature):
         no. 6, 2000.`
     """
 
-    def __init__(self, m, r):
+    def __init__(self, m, r, max_bytes=2**25, backend='numpy'):
         self.dim_per_channel = 1
         self.m = m
         self.r = r
+        self.max_bytes = max_bytes
+        self.backend = backend
+        kernels.use_compiled(backend)
 
-    def compute(self, x):
+    def extract(self, window):
+        x = window.x
+        if kernels.use_compiled(self.backend):
+            batch = kernels.as_batch(x)
+            sentinel = _sampen_sentinel(batch, axis=1)
+            counts = kernels.sampen_counts(batch, self.m, x.dtype.type(self.r),
+                                           sentinel)
+            y = self._entropy(counts, axis=1).astype(x.dtype)
+            return y.reshape(x.shape[:-2] + x.shape[-1:])
+
+        if x.ndim > 2:
+            out = np.empty(x.shape[:-2] + x.shape[-1:], dtype=x.dtype)
+            for i in np.ndindex(*x.shape[:-2]):
+                out[i] = self._compute(x[i])
+            return out
+        return self._compute(x)
+
+    def _compute(self, x):
         xrows, xcols = x.shape
-        y = np.zeros(xcols)
         m = self.m
         N = xrows
+        M = N - m + 1
+
+        # templates[k, i] holds element k of the template starting at i
+        templates = np.zeros((m+1, M, xcols), dtype=x.dtype)
+        for k in range(m):
+            templates[k] = x[k:N-m+k+1]
+        templates[m, :-1] = x[m:N]
+        templates[m, -1] = _sampen_sentinel(x, axis=0)
+
+        # templates compared for lengths m and m+1
+        n_m = max(N-m-1, 0)
+        n_m1 = max(N-m-2, 0)
+
+        counts = np.zeros((2, xcols))
+        block = max(1, self.max_bytes // (2*M*xcols*x.dtype.itemsize))
+        for i0 in range(0, n_m, block):
+            i1 = min(i0+block, n_m)
+            i = np.arange(i0, i1)[:, np.newaxis, np.newaxis]
+            j = np.arange(i0+1, M)[np.newaxis, :, np.newaxis]
+            later = j > i
+
+            # Chebyshev distance of templates i0..i1 to all later templates
+            dist = np.abs(templates[0, i0+1:] - templates[0, i0:i1, None])
+            for k in range(1, m):
+                diff = templates[k, i0+1:] - templates[k, i0:i1, None]
+                np.maximum(dist, np.abs(diff), out=dist)
+            counts[0] += np.sum((dist <= self.r) & later, axis=(0, 1))
+
+            diff = templates[m, i0+1:] - templates[m, i0:i1, None]
+            np.maximum(dist, np.abs(diff), out=dist)
+            counts[1] += np.sum((dist <= self.r) & later & (i < n_m1),
+                                axis=(0, 1))
+
+        return self._entropy(counts).astype(x.dtype)
+
+    def _entropy(self, counts, axis=0):
+        correl = counts + np.finfo(float).eps
+        matches_m = np.take(correl, 0, axis=axis)
+        matches_m1 = np.take(correl, 1, axis=axis)
+        return np.log(matches_m / matches_m1)
+
+
+def _sampen_sentinel(x, axis):
+    # something that won't get matched, used to fill out the last template
+    return 10*np.maximum(np.max(x, axis=axis), 0)
+
+
+class SpectralFeature(Feature):
+    """
+    Base class for features computed from the power spectral density of the
+    window (see `WindowData.spectrum`).
+
+    Parameters
+    ----------
+    f_samp : float
+        Sampling rate of the data (Hz).
+    segment_length : int, default=None
+        Length of the segments averaged with Welch's method. Default is
+        `None`, meaning the periodogram of the whole window is used.
+    taper : str, default='hann'
+        Window function applied before the FFT (see
+        `scipy.signal.get_window`).
+    """
+
+    def __init__(self, f_samp, segment_length=None, taper='hann'):
+        self.dim_per_channel = 1
+        self.f_samp = f_samp
+        self.segment_length = segment_length
+        self.taper = taper
+
+    def spectrum(self, window):
+        return window.spectrum(self.f_samp, self.segment_length, self.taper)
+
+
+class MNF(SpectralFeature):
+    """
+    Calculates the mean frequency, the power-weighted average frequency of
+    the spectrum. See `SpectralFeature` for the parameters.
+    """
+
+    def extract(self, window):
+        freqs, psd = self.spectrum(window)
+        freqs = freqs.astype(psd.dtype)
+        weighted = np.sum(freqs[:, np.newaxis] * psd, axis=-2)
+        return weighted / np.sum(psd, axis=-2)
+
+
+class MDF(SpectralFeature):
+    """
+    Calculates the median frequency, the frequency which splits the spectrum
+    into two parts of equal power (taken as the first bin at which the
+    cumulative power reaches half of the total). See `SpectralFeature` for the
+    parameters.
+    """
+
+    def extract(self, window):
+        freqs, psd = self.spectrum(window)
+        cumulative = np.cumsum(psd, axis=-2)
+        half = cumulative[..., -1:, :] / 2
+        ind = np.argmax(cumulative >= half, axis=-2)
+        return freqs[ind].astype(psd.dtype)
+
+
+class BandPower(SpectralFeature):
+    """
+    Calculates the power in each of a set of frequency bands.
+
+    Parameters
+    ----------
+    f_samp : float
+        Sampling rate of the data (Hz).
+    bands : list of 2-tuples
+        The (low, high) edges of each band (Hz). Bins with low <= f < high are
+        included.
+    relative : bool, default=False
+        If True, the power in each band is divided by the total power.
+    segment_length : int, default=None
+        See `SpectralFeature`.
+    taper : str, default='hann'
+        See `SpectralFeature`.
+    """
+
+    def __init__(self, f_samp, bands, relative=False, segment_length=None,
+                 taper='hann'):
+        super(BandPower, self).__init__(f_samp, segment_length, taper)
+        self.bands = bands
+        self.relative = relative
+        self.dim_per_channel = len(bands)
+
+    def extract(self, window):
+        freqs, psd = self.spectrum(window)
+        # bin width f_samp/n of the segments the spectrum was taken over
+        df = freqs[1] - freqs[0] if len(freqs) > 1 else self.f_samp
+        out = []
+        for low, high in self.bands:
+            mask = (freqs >= low) & (freqs < high)
+            out.append(np.sum(psd[..., mask, :], axis=-2) * df)
+        out = np.concatenate(out, axis=-1)
+
+        if self.relative:
+            total = np.sum(psd, axis=-2) * df
+            out /= np.concatenate([total]*len(self.bands), axis=-1)
+        return out
+
 
-        for c in range(xcols):
-            correl = np.zeros(2) + np.finfo(np.float).eps
+class SpectralEntropy(SpectralFeature):
+    """
+    Calculates the Shannon entropy of the normalized power spectrum, divided
+    by the log of the number of bins so it lies between 0 (a pure tone) and 1
+    (white noise). See `SpectralFeature` for the parameters.
+    """
 
-            xmat = np.zeros((m+1, N-m+1))
-            for i in range(m):
-                xmat[i, :] = x[i:N-m+i+1, c]
-            # handle last row separately
-            xmat[m, :-1] = x[m:N, c]
-            xmat[-1, -1] = 10*np.max(xmat)  # something that won't get matched
+    def extract(self, window):
+        freqs, psd = self.spectrum(window)
+        p = psd / np.sum(psd, axis=-2, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            plogp = np.where(p > 0, p*np.log(p), 0)
+        return -np.sum(plogp, axis=-2) / np.log(len(freqs))
 
-            for mc in [m, m+1]:
-                count = 0
-                for i in range(N-mc-1):
-                    dist = np.max(
-                        np.abs(xmat[:mc, i+1:] - xmat[:mc, i][:, np.newaxis]),
-                        axis=0)
 
-                    count += np.sum(dist <= self.r)
+class AR(Feature):
+    """
+    Calculates the coefficients of an autoregressive model of the signal,
+    x[n] = -sum(a_k x[n-k]) + e[n] for k = 1..order, using the
+    autocorrelation method (Levinson-Durbin recursion). The output holds
+    a_1 for every channel, then a_2, etc.
+
+    Parameters
+    ----------
+    order : int (default=4)
+        Order of the AR model (number of coefficients per channel).
+    """
+
+    def __init__(self, order=4):
+        self.dim_per_channel = order
+        self.order = order
+
+    def extract(self, window):
+        a = window.lpc(self.order)
+        return a.reshape(a.shape[:-2] + (-1,))
+
+
+class Cepstrum(Feature):
+    """
+    Calculates cepstral coefficients of the signal from its AR model (see
+    `AR`) with the recursion
+
+        c_1 = -a_1
+        c_n = -a_n - sum((1 - k/n) a_k c_{n-k}) for k = 1..n-1
 
-                correl[mc-m] = count
+    where a_n = 0 for n > order. The output holds c_1 for every channel, then
+    c_2, etc.
+
+    Parameters
+    ----------
+    order : int (default=4)
+        Number of cepstral coefficients per channel.
+    ar_order : int, default=None
+        Order of the AR model. Default is `None`, meaning the same as `order`,
+        in which case the model is shared with an `AR` feature of that order.
+    """
+
+    def __init__(self, order=4, ar_order=None):
+        self.dim_per_channel = order
+        self.order = order
+        self.ar_order = ar_order
+
+    def extract(self, window):
+        p = self.order if self.ar_order is None else self.ar_order
+        a = window.lpc(p)
+        c = np.zeros(a.shape[:-2] + (self.order,) + a.shape[-1:],
+                     dtype=a.dtype)
+        for n in range(1, self.order+1):
+            cn = c[..., n-1, :]
+            if n <= p:
+                cn -= a[..., n-1, :]
+            for k in range(1, min(n, p+1)):
+                cn -= (1 - k/float(n)) * a[..., k-1, :] * c[..., n-k-1, :]
+        return c.reshape(c.shape[:-2] + (-1,))
+
+
+def _init_args(cls):
+    """
+    Names of the constructor arguments of a class, other than `self`.
+    """
+    try:
+        getargspec = inspect.getfullargspec
+    except AttributeError:
+        # Python 2
+        getargspec = inspect.getargspec
+
+    try:
+        args = getargspec(cls.__init__).args
+    except TypeError:
+        # no Python __init__ (e.g. object's)
+        return []
+    return args[1:]
+
+
+def _jsonable(value):
+    """
+    Converts tuples and NumPy scalars in a parameter value to the types JSON
+    uses, so a spec compares equal to its JSON round trip.
+    """
+    if isinstance(value, dict):
+        return dict((k, _jsonable(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+registry = {}
+
+
+def register(cls):
+    """
+    Adds a Feature class to the registry used to create features from specs
+    (see `feature_from_spec`), under its class name.
+    """
+    registry[cls.__name__] = cls
+    return cls
+
+
+def feature_from_spec(spec):
+    """
+    Creates a feature from its spec, a dict with the registered name of the
+    feature class and its parameters (see `Feature.to_spec`).
+    """
+    try:
+        cls = registry[spec['name']]
+    except KeyError:
+        raise ValueError("Unknown feature: %r" % spec.get('name'))
+    return cls(**spec.get('params', {}))
 
-            y[c] = np.log(correl[0] / correl[1])
 
-        return y
+for _cls in [MAV, WL, ZC, SSC, SpectralMoment, KhushabaSet, SampEn, MNF, MDF,
+             BandPower, SpectralEntropy, AR, Cepstrum]:
+    register(_cls)
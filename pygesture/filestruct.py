@@ -1,9 +1,36 @@
+import collections
 import datetime
 import os
 import glob
+import json
 import re
 
 
+_date_re = re.compile(r'\d\d\d\d-\d\d-\d\d')
+_trial_re = re.compile(r't(\d+)')
+_label_re = re.compile(r'l(\d+)')
+
+# matches any of the file/folder names generated by this module, one per line
+_name_re = re.compile(
+    r'^(?P<kind>rec|log|session|features)_'
+    r'(?P<date>\d\d\d\d-\d\d-\d\d)_'
+    r'(?P<pid>[^_\n]+)_'
+    r'(?P<rest>[^.\n]+)'
+    r'(?:\.[^\n]*)?$',
+    re.MULTILINE)
+_trial_label_re = re.compile(r'^t(?P<trial>\d+)(?:_l(?P<label>\d+))?$')
+
+
+FileInfo = collections.namedtuple(
+    'FileInfo', ['name', 'kind', 'date', 'pid', 'sid', 'trial', 'label'])
+FileInfo.__doc__ = """
+Information contained in the name of a file or folder created by
+pygesture. `kind` is one of 'rec', 'log', 'session' or 'features'. Session
+folders and feature files have a `sid`, recordings and logs have a `trial`
+and labelled recordings have a `label`. Missing fields are `None`.
+"""
+
+
 def new_session_dir(rootdir, pid, sid):
     """
     Creates a path to a new session directory.
@@ -48,6 +75,17 @@ def get_log_dir(session_dir):
     return log_dir
 
 
+def get_model_dir(rootdir, pid):
+    """
+    Returns the path to the directory trained models of the given participant
+    are stored in (see `pygesture.modelstore`).
+    Example:
+        <ROOTDIR>/<PID>/models
+    """
+    model_dir = os.path.join(rootdir, pid, 'models')
+    return model_dir
+
+
 def get_recording_file(recording_dir, pid, sid, date_str, trial_num,
                        label=None):
     """
@@ -80,11 +118,15 @@ def get_log_file(log_dir, pid, sid, date_str, trial_num):
     return log_file
 
 
-def find_session_dir(rootdir, pid, sid):
+def find_session_dir(rootdir, pid, sid, catalog=None):
     """
     Attempts to locate the path to the session data for the given participant
-    and session IDs.
+    and session IDs. If a `Catalog` is given, it is used instead of searching
+    the file system.
     """
+    if catalog is not None:
+        return catalog.find_session_dir(pid, sid)
+
     search = os.path.join(
         rootdir,
         pid,
@@ -105,11 +147,15 @@ def new_feature_file(session_dir, pid, sid, date_string):
     return feature_file
 
 
-def find_feature_file(rootdir, pid, sid):
+def find_feature_file(rootdir, pid, sid, catalog=None):
     """
     Attempts to locate the path to a feature file for the given participant and
-    session IDs.
+    session IDs. If a `Catalog` is given, it is used instead of searching the
+    file system.
     """
+    if catalog is not None:
+        return catalog.find_feature_file(pid, sid)
+
     session_dir = find_session_dir(rootdir, pid, sid)
     search = os.path.join(
         session_dir,
@@ -118,29 +164,37 @@ def find_feature_file(rootdir, pid, sid):
     return feature_file
 
 
-def get_participant_list(rootdir):
+def get_participant_list(rootdir, catalog=None):
     """
     Obtains a list of the IDs of participants who have data stored.
     """
+    if catalog is not None:
+        return catalog.get_participant_list()
+
     l = os.listdir(rootdir)
     return sorted([d for d in l if os.path.isdir(os.path.join(rootdir, d))])
 
 
-def get_session_list(rootdir, pid, search=""):
+def get_session_list(rootdir, pid, search="", catalog=None):
     """
     Obtains a list of the session IDs the given participant has produced.
     """
-    dirs = sorted(os.listdir(os.path.join(rootdir, pid)))
+    if catalog is not None:
+        return catalog.get_session_list(pid, search=search)
+
+    dirs = sorted(d for d in os.listdir(os.path.join(rootdir, pid))
+                  if d.startswith('session_'))
     sessions = [d.split('_')[-1] for d in dirs]
     return [s for s in sessions if search in s]
 
 
-def get_feature_file_list(rootdir, pid, sid_list):
+def get_feature_file_list(rootdir, pid, sid_list, catalog=None):
     """
     Convenience function for obtaining a list of file paths to the sessions
     specified by the participant ID and list of session IDs.
     """
-    file_list = [find_feature_file(rootdir, pid, sid) for sid in sid_list]
+    file_list = [find_feature_file(rootdir, pid, sid, catalog=catalog)
+                 for sid in sid_list]
     return file_list
 
 
@@ -163,23 +217,447 @@ def get_log_file_list(log_dir):
 def parse_date_string(name):
     """
     Returns the date string from the given file/folder. The name can be the
-    session directory name, the recording file name, etc.
+    session directory name, the recording file name, etc. Raises a
+    `ValueError` if the name has no date.
     """
-    datestr = re.search('\d\d\d\d-\d\d\-\d\d', name).group(0)
-    return datestr
+    return _search(_date_re, name, 'date').group(0)
 
 
 def parse_trial_number(name):
     """
     Returns the trial number from the given recording file name (raw or proc).
+    Raises a `ValueError` if the name has no trial number.
     """
-    trial_number = int(re.search('t\d+', name).group(0)[1:])
-    return trial_number
+    return int(_search(_trial_re, name, 'trial number').group(1))
 
 
 def parse_label(name):
     """
     Returns the label from the given recording file name (raw or proc).
+    Raises a `ValueError` if the name has no label.
+    """
+    return int(_search(_label_re, name, 'label').group(1))
+
+
+def _search(regex, name, field):
+    match = regex.search(name)
+    if match is None:
+        raise ValueError("No {} in name '{}'.".format(field, name))
+    return match
+
+
+def parse_name(name):
     """
-    label = int(re.search('l\d+', name).group(0)[1:])
-    return label
+    Extracts all of the information from the name of a file or folder created
+    by pygesture at once.
+
+    Parameters
+    ----------
+    name : str
+        The file/folder name. It can also be a path.
+
+    Returns
+    -------
+    info : FileInfo
+        The information in the name, or `None` if the name wasn't created by
+        pygesture.
+    """
+    infos = parse_names([os.path.basename(name)])
+    return infos[0] if infos else None
+
+
+def parse_names(names):
+    """
+    Extracts the information from a whole list of file/folder names (e.g. a
+    directory listing) at once. All of the names are matched in a single pass
+    of a compiled regular expression.
+
+    Parameters
+    ----------
+    names : iterable of str
+        File/folder names (not paths).
+
+    Returns
+    -------
+    infos : list of FileInfo
+        The information in each name. Names not created by pygesture are left
+        out.
+
+    Examples
+    --------
+    >>> from pygesture import filestruct
+    >>> infos = filestruct.parse_names(os.listdir(recording_dir))
+    >>> infos = filestruct.filter_recordings(infos, labels=[1, 2])
+    """
+    infos = []
+    for match in _name_re.finditer('\n'.join(names)):
+        kind, date, pid, rest = match.group('kind', 'date', 'pid', 'rest')
+        sid = trial = label = None
+
+        if kind in ('rec', 'log'):
+            tl = _trial_label_re.match(rest)
+            if tl is None:
+                continue
+            trial = int(tl.group('trial'))
+            if tl.group('label') is not None:
+                label = int(tl.group('label'))
+        else:
+            sid = rest
+
+        infos.append(
+            FileInfo(match.group(0), kind, date, pid, sid, trial, label))
+
+    return infos
+
+
+def filter_recordings(infos, labels=None, trials=None):
+    """
+    Selects recordings by label and/or trial number from a list of FileInfo
+    (see `parse_names`), so recordings can be filtered before they're opened.
+
+    Parameters
+    ----------
+    infos : list of FileInfo
+        The file information to filter. Anything that isn't a recording is
+        dropped.
+    labels : list of int, default=None
+        Labels to keep. Default is `None`, meaning recordings with any label
+        (or no label) are kept.
+    trials : list of int, default=None
+        Trial numbers to keep. Default is `None`, meaning all trials are kept.
+
+    Returns
+    -------
+    infos : list of FileInfo
+        The selected recordings.
+    """
+    if labels is not None:
+        labels = set(labels)
+    if trials is not None:
+        trials = set(trials)
+
+    recordings = [i for i in infos if i.kind == 'rec']
+    if labels is not None:
+        recordings = [i for i in recordings if i.label in labels]
+    if trials is not None:
+        recordings = [i for i in recordings if i.trial in trials]
+    return recordings
+
+
+class Catalog(object):
+    """
+    An index of the participants, sessions, recordings, logs and feature files
+    stored under a data root directory. The index is kept in a JSON file in
+    the root directory, so it persists between runs.
+
+    The catalog is refreshed lazily: creating it only checks the root
+    directory for new or removed participants, and a participant or session
+    is checked the first time it is looked up after a refresh. Directories
+    are only parsed again if their modification time or number of entries
+    has changed, so a lookup costs a `stat` and a listing of the directories
+    involved, however large the rest of the data tree is.
+
+    Parameters
+    ----------
+    rootdir : str
+        The root directory of the data.
+    filename : str, default=None
+        Path to the catalog file. Default is `None`, which means `CATALOG_FILE`
+        in the root directory is used.
+    refresh : bool, default=True
+        Whether or not to check the file system for changes. If False, the
+        saved catalog is used as is until `refresh` is called.
+
+    Examples
+    --------
+    >>> from pygesture import filestruct
+    >>> catalog = filestruct.Catalog('./data')
+    >>> catalog.get_session_list('p0', search='train')
+    ['train1', 'train2']
+    >>> filestruct.find_feature_file('./data', 'p0', 'train1', catalog=catalog)
+    './data/p0/session_2014-08-12_p0_train1/features_2014-08-12_p0_train1.csv'
+    """
+
+    CATALOG_FILE = '.catalog.json'
+    VERSION = 3
+
+    def __init__(self, rootdir, filename=None, refresh=True):
+        self.rootdir = rootdir
+        if filename is None:
+            filename = os.path.join(rootdir, self.CATALOG_FILE)
+        self.filename = filename
+
+        self.state = None
+        self.participants = {}
+        self._load()
+
+        # participants (pid) and sessions ((pid, sid)) checked since the last
+        # refresh, only used if checking lazily
+        self._lazy = False
+        self._checked = set()
+
+        if refresh:
+            self.refresh()
+
+    def refresh(self, pid=None, sid=None):
+        """
+        Updates the catalog with any changes in the file system and saves it
+        if anything changed.
+
+        Parameters
+        ----------
+        pid : str, default=None
+            Participant to refresh right away, which is added to the catalog
+            if it is new. Default is `None`, which means only the participant
+            list is refreshed, and participants and sessions are checked again
+            the next time they are looked up.
+        sid : str, default=None
+            Session of `pid` to refresh. Default is `None`, which means all
+            sessions of the participant are refreshed.
+        """
+        changed = self._refresh_root()
+
+        if pid is None:
+            self._lazy = True
+            self._checked.clear()
+        elif pid in self.participants or self._add_participant(pid):
+            entry = self.participants[pid]
+            changed |= self._refresh_participant(pid, entry)
+            self._checked.add(pid)
+            for s in list(entry['sessions']):
+                if sid is None or s == sid:
+                    changed |= self._refresh_session(pid, s)
+                    self._checked.add((pid, s))
+
+        if changed:
+            self.save()
+
+    def save(self):
+        """
+        Writes the catalog file. Failing to write it (e.g. on a read-only data
+        directory) is not an error, the catalog just won't persist.
+        """
+        data = {'version': self.VERSION, 'state': self.state,
+                'participants': self.participants}
+        tmpfile = self.filename + '.tmp'
+        try:
+            with open(tmpfile, 'w') as f:
+                json.dump(data, f)
+            replace_file(tmpfile, self.filename)
+        except (IOError, OSError):
+            pass
+
+    def get_participant_list(self):
+        return sorted(self.participants)
+
+    def get_session_list(self, pid, search=""):
+        self._check(pid)
+        sessions = self.participants[pid]['sessions']
+        sids = sorted(sessions, key=lambda sid: sessions[sid]['dir'])
+        return [sid for sid in sids if search in sid]
+
+    def get_session(self, pid, sid):
+        """
+        Gets the catalog entry of a session, a dict with keys 'dir' (session
+        directory name), 'date', 'state' (modification time and number of
+        entries of the directory), 'feature_file' (file name or `None`),
+        'feature_mtime', 'recordings' and 'logs'. The file entries are dicts
+        with 'file', 'trial', 'label' and 'mtime' keys.
+        """
+        try:
+            self._check(pid, sid)
+            return self.participants[pid]['sessions'][sid]
+        except KeyError:
+            raise IndexError(
+                "Session {} not found for {}.".format(sid, pid))
+
+    def find_session_dir(self, pid, sid):
+        session = self.get_session(pid, sid)
+        return os.path.join(self.rootdir, pid, session['dir'])
+
+    def find_feature_file(self, pid, sid):
+        session = self.get_session(pid, sid)
+        if session['feature_file'] is None:
+            raise IndexError(
+                "No feature file for session {} of {}.".format(sid, pid))
+        return os.path.join(
+            self.rootdir, pid, session['dir'], session['feature_file'])
+
+    def get_feature_mtime(self, pid, sid):
+        return self.get_session(pid, sid)['feature_mtime']
+
+    def get_recording_file_list(self, pid, sid):
+        return self._file_list(pid, sid, 'recordings', get_recording_dir)
+
+    def get_log_file_list(self, pid, sid):
+        return self._file_list(pid, sid, 'logs', get_log_dir)
+
+    def _file_list(self, pid, sid, key, get_dir):
+        session_dir = self.find_session_dir(pid, sid)
+        files = self.get_session(pid, sid)[key]['files']
+        return [os.path.join(get_dir(session_dir), f['file']) for f in files]
+
+    def _load(self):
+        try:
+            with open(self.filename, 'r') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+
+        if data.get('version') == self.VERSION:
+            self.state = data['state']
+            self.participants = data['participants']
+
+    def _check(self, pid, sid=None):
+        # refreshes a participant (and session) on the first lookup after a
+        # refresh
+        if not self._lazy or pid not in self.participants:
+            return
+
+        changed = False
+        if pid not in self._checked:
+            changed |= self._refresh_participant(pid, self.participants[pid])
+            self._checked.add(pid)
+
+        sessions = self.participants[pid]['sessions']
+        if sid in sessions and (pid, sid) not in self._checked:
+            changed |= self._refresh_session(pid, sid)
+            self._checked.add((pid, sid))
+
+        if changed:
+            self.save()
+
+    def _refresh_root(self):
+        state, names = _dir_state(self.rootdir)
+        if state == self.state:
+            return False
+
+        pids = sorted(d for d in names
+                      if os.path.isdir(os.path.join(self.rootdir, d)))
+        for pid in list(self.participants):
+            if pid not in pids:
+                del self.participants[pid]
+        for pid in pids:
+            self.participants.setdefault(pid, {'state': None, 'sessions': {}})
+
+        self.state = state
+        return True
+
+    def _add_participant(self, pid):
+        # indexes a participant directory not yet seen by _refresh_root
+        if not os.path.isdir(os.path.join(self.rootdir, pid)):
+            return False
+        self.participants[pid] = {'state': None, 'sessions': {}}
+        return True
+
+    def _refresh_participant(self, pid, entry):
+        # updates the list of sessions of a participant
+        pid_dir = os.path.join(self.rootdir, pid)
+        sessions = entry['sessions']
+
+        state, names = _dir_state(pid_dir)
+        if state == entry['state']:
+            return False
+
+        dirs = [d for d in names if d.startswith('session_')]
+        found = {d.split('_')[-1]: d for d in dirs}
+        for sid in list(sessions):
+            if found.get(sid) != sessions[sid]['dir']:
+                del sessions[sid]
+        for sid, d in found.items():
+            if sid not in sessions:
+                sessions[sid] = {
+                    'dir': d,
+                    'date': parse_date_string(d),
+                    'state': None,
+                    'feature_file': None,
+                    'feature_mtime': None,
+                    'recordings': {'state': None, 'files': []},
+                    'logs': {'state': None, 'files': []}
+                }
+        entry['state'] = state
+        return True
+
+    def _refresh_session(self, pid, sid):
+        changed = False
+        session = self.participants[pid]['sessions'][sid]
+        session_dir = os.path.join(self.rootdir, pid, session['dir'])
+
+        state, names = _dir_state(session_dir)
+        if state != session['state']:
+            files = sorted(
+                f for f in names
+                if f.startswith('features_') and f.endswith('.csv'))
+            session['feature_file'] = files[0] if files else None
+            session['state'] = state
+            changed = True
+
+        if session['feature_file'] is not None:
+            feature_mtime = _getmtime(
+                os.path.join(session_dir, session['feature_file']))
+            if feature_mtime != session['feature_mtime']:
+                session['feature_mtime'] = feature_mtime
+                changed = True
+
+        changed |= self._refresh_files(
+            get_recording_dir(session_dir), session['recordings'], '.wav')
+        changed |= self._refresh_files(
+            get_log_dir(session_dir), session['logs'], '.json')
+
+        return changed
+
+    def _refresh_files(self, directory, entry, ext):
+        state, names = _dir_state(directory)
+        if state == entry['state']:
+            return False
+
+        files = []
+        if state is not None:
+            names = sorted(f for f in names if f.endswith(ext))
+            infos = {i.name: i for i in parse_names(names)}
+            for f in names:
+                info = infos.get(f)
+                files.append({
+                    'file': f,
+                    'trial': info.trial if info else None,
+                    'label': info.label if info else None,
+                    'mtime': os.path.getmtime(os.path.join(directory, f))
+                })
+
+        entry['state'] = state
+        entry['files'] = files
+        return True
+
+
+def replace_file(src, dst):
+    """
+    Renames `src` to `dst`, replacing `dst` if it exists. The replacement is
+    atomic where the platform supports it.
+    """
+    try:
+        os.replace(src, dst)
+    except AttributeError:
+        # Python 2, where rename only replaces files on POSIX
+        if os.name == 'nt' and os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
+def _dir_state(path):
+    """
+    Lists a directory, giving its state as [mtime, number of entries] (or
+    `None` if it doesn't exist) along with the entry names. The count catches
+    changes within the resolution of the modification time.
+    """
+    try:
+        names = os.listdir(path)
+        return [os.path.getmtime(path), len(names)], names
+    except OSError:
+        return None, []
+
+
+def _getmtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
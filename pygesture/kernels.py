@@ -0,0 +1,135 @@
+"""
+Compiled loop kernels for features which don't vectorize well in NumPy (they
+need large temporaries or many passes over the data). The kernels are compiled
+with numba if it's installed. Otherwise they're left as plain Python, which is
+correct but slow, and `available` is False so features select their NumPy
+implementation instead (see the `backend` parameter of the features).
+
+All kernels take a batch of windows, shape (n_windows, n_samples,
+n_channels), and return one value per window and channel. Thresholds and
+tolerances should be given in the data type so comparisons are done the same
+way NumPy does them.
+"""
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+available = numba is not None
+
+BACKENDS = ('numpy', 'numba')
+
+
+def use_compiled(backend):
+    """
+    Determines whether a feature with the given backend should use the
+    compiled kernels, which is the case if the backend is 'numba' and numba
+    is installed.
+    """
+    if backend not in BACKENDS:
+        raise ValueError("backend must be one of %s, got %r" %
+                         (BACKENDS, backend))
+    return backend == 'numba' and available
+
+
+def zero_crossings(x, thresh):
+    """
+    Counts the sign changes between adjacent samples whose absolute
+    difference is greater than `thresh`.
+    """
+    n_windows, n_samples, n_channels = x.shape
+    out = np.zeros((n_windows, n_channels), dtype=np.int64)
+    for w in range(n_windows):
+        for c in range(n_channels):
+            count = 0
+            for i in range(1, n_samples):
+                a = x[w, i-1, c]
+                b = x[w, i, c]
+                if (a > 0 and b < 0) or (a < 0 and b > 0):
+                    if abs(b - a) > thresh:
+                        count += 1
+            out[w, c] = count
+    return out
+
+
+def slope_sign_changes(x, thresh):
+    """
+    Counts the samples at which the slope changes sign, where at least one of
+    the adjacent differences has absolute value greater than `thresh`.
+    """
+    n_windows, n_samples, n_channels = x.shape
+    out = np.zeros((n_windows, n_channels), dtype=np.int64)
+    for w in range(n_windows):
+        for c in range(n_channels):
+            count = 0
+            for i in range(1, n_samples-1):
+                before = x[w, i, c] - x[w, i-1, c]
+                after = x[w, i+1, c] - x[w, i, c]
+                change = before > 0 and after < 0
+                change = change or (before < 0 and after > 0)
+                if change and (abs(before) > thresh or abs(after) > thresh):
+                    count += 1
+            out[w, c] = count
+    return out
+
+
+def sampen_counts(x, m, r, sentinel):
+    """
+    Counts the template matches for sample entropy (see `features.SampEn`),
+    returning an array of shape (n_windows, 2, n_channels) with the number of
+    m-length and (m+1)-length matches. `sentinel` (n_windows, n_channels) is
+    the value used for the missing last element of the last (m+1)-length
+    template.
+
+    Unlike the NumPy implementation, the distance computation stops at the
+    first element exceeding the tolerance and no temporaries are allocated.
+    """
+    n_windows, N, n_channels = x.shape
+    M = N - m + 1
+    n_m = max(N-m-1, 0)
+    n_m1 = max(N-m-2, 0)
+    out = np.zeros((n_windows, 2, n_channels), dtype=np.int64)
+    for w in range(n_windows):
+        for c in range(n_channels):
+            count_m = 0
+            count_m1 = 0
+            for i in range(n_m):
+                for j in range(i+1, M):
+                    match = True
+                    for k in range(m):
+                        if abs(x[w, j+k, c] - x[w, i+k, c]) > r:
+                            match = False
+                            break
+                    if not match:
+                        continue
+                    count_m += 1
+
+                    if i < n_m1:
+                        if j < M-1:
+                            last = x[w, j+m, c]
+                        else:
+                            last = sentinel[w, c]
+                        if abs(last - x[w, i+m, c]) <= r:
+                            count_m1 += 1
+            out[w, 0, c] = count_m
+            out[w, 1, c] = count_m1
+    return out
+
+
+if numba is not None:
+    zero_crossings = numba.njit(cache=True, nogil=True)(zero_crossings)
+    slope_sign_changes = numba.njit(cache=True, nogil=True)(
+        slope_sign_changes)
+    sampen_counts = numba.njit(cache=True, nogil=True)(sampen_counts)
+
+
+def as_batch(x):
+    """
+    Reshapes a window or batch of windows to the (n_windows, n_samples,
+    n_channels) layout the kernels take.
+    """
+    return np.ascontiguousarray(x.reshape((-1,) + x.shape[-2:]))
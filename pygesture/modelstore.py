@@ -0,0 +1,241 @@
+"""
+Storage of trained models, so a classifier trained on a given set of sessions
+doesn't need to be retrained (e.g. after restarting the GUI).
+
+Models are stored per participant:
+
+    <ROOTDIR>/<PID>/models/model_<KEY>.pkl
+
+where the key is a hash of everything the trained model depends on: the
+learner configuration, the feature extractor spec, the training sessions, the
+class labels and the modification times of the sessions' feature files.
+Reprocessing a session or changing the config therefore results in a new key
+rather than loading a stale model.
+
+Each file starts with a one-line JSON header (format version, key and learner
+class), which is checked before the rest of the file is unpickled.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import pickle
+import time
+
+from pygesture import filestruct
+
+
+class ModelStore(object):
+    """
+    Saves and loads trained models for a participant.
+
+    Parameters
+    ----------
+    rootdir : str
+        Root directory of the data.
+    pid : str
+        Participant ID.
+
+    Examples
+    --------
+    >>> from pygesture import modelstore
+    >>> store = modelstore.ModelStore('./data', 'p0')
+    >>> key = store.key(cfg.learner, cfg.feature_extractor, ['train1'],
+    ...                 [0, 1, 2], feature_files)
+    >>> model = store.load(key)
+    >>> if model is None:
+    ...     cfg.learner.fit(X, y)
+    ...     store.save(key, cfg.learner, boosts, ['train1'], [0, 1, 2],
+    ...                cfg.feature_extractor)
+    """
+
+    HEADER = b'# pygesture-model '
+    VERSION = 3
+
+    def __init__(self, rootdir, pid):
+        self.rootdir = rootdir
+        self.pid = pid
+        self.directory = filestruct.get_model_dir(rootdir, pid)
+
+    def key(self, learner, feature_extractor, sid_list, labels,
+            feature_files):
+        """
+        Computes the key of a model from its inputs.
+
+        Parameters
+        ----------
+        learner : object
+            The (untrained) learner, identified by its repr. Options which
+            only change the output format (`return_posteriors`) are left
+            out.
+        feature_extractor : features.FeatureExtractor
+            The feature extractor the training data was generated with,
+            identified by its spec.
+        sid_list : list of str
+            Training session IDs. The order doesn't matter.
+        labels : list of int
+            Class labels used for training.
+        feature_files : list of str
+            The training sessions' feature files.
+
+        Returns
+        -------
+        key : str
+            Hex digest identifying the model.
+        """
+        spec = {
+            'version': self.VERSION,
+            'learner': _learner_spec(learner),
+            'feature_extractor': _feature_spec(feature_extractor),
+            'sessions': sorted(sid_list),
+            'labels': sorted(int(label) for label in labels),
+            'mtimes': sorted(
+                [os.path.basename(f), os.path.getmtime(f)]
+                for f in feature_files)
+        }
+        spec = json.dumps(spec, sort_keys=True)
+        return hashlib.sha1(spec.encode('utf-8')).hexdigest()
+
+    def get_file(self, key):
+        """
+        Returns the path of the file a model is stored in.
+        """
+        return os.path.join(self.directory, 'model_' + key + '.pkl')
+
+    def save(self, key, learner, boosts, sid_list, labels,
+             feature_extractor):
+        """
+        Stores a trained model. Failing to write the file (e.g. on a
+        read-only data directory) is not an error, the model just won't be
+        found later.
+
+        Parameters
+        ----------
+        key : str
+            Key of the model (see `key`).
+        learner : object
+            The trained learner. Must be picklable.
+        boosts : dict
+            Controller boosts computed from the training data.
+        sid_list : list of str
+            Training session IDs.
+        labels : list of int
+            Class labels used for training.
+        feature_extractor : features.FeatureExtractor
+            The feature extractor the training data was generated with.
+        """
+        model = {
+            'version': self.VERSION,
+            'key': key,
+            'learner': learner,
+            'boosts': boosts,
+            'training_sessions': list(sid_list),
+            'labels': list(labels),
+            'feature_extractor': _feature_spec(feature_extractor),
+            'created': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+        header = {
+            'version': self.VERSION,
+            'key': key,
+            'learner': _class_name(learner)
+        }
+
+        filename = self.get_file(key)
+        tmpfile = filename + '.tmp'
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            with open(tmpfile, 'wb') as f:
+                f.write(self.HEADER)
+                f.write(json.dumps(header, sort_keys=True).encode('utf-8'))
+                f.write(b'\n')
+                pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+            filestruct.replace_file(tmpfile, filename)
+        except (IOError, OSError, pickle.PicklingError):
+            pass
+
+    def load(self, key, learner=None):
+        """
+        Loads a stored model. The file's header is checked before the model
+        is unpickled, so files from other versions or of other learners are
+        skipped without running their contents.
+
+        Parameters
+        ----------
+        key : str
+            Key of the model (see `key`).
+        learner : object, default=None
+            Learner the model is expected to hold an instance of the class
+            of. Default is `None`, meaning the learner class isn't checked.
+
+        Returns
+        -------
+        model : dict
+            The model, with keys 'learner', 'boosts', 'training_sessions',
+            'labels', 'feature_extractor' (the spec) and 'created'. `None` if
+            no model is stored with the given key, it can't be read or it
+            doesn't match.
+        """
+        expected = {'version': self.VERSION, 'key': key}
+        if learner is not None:
+            expected['learner'] = _class_name(learner)
+
+        try:
+            with open(self.get_file(key), 'rb') as f:
+                line = f.readline()
+                if not line.startswith(self.HEADER):
+                    return None
+                header = json.loads(line[len(self.HEADER):].decode('utf-8'))
+                for k, v in expected.items():
+                    if header.get(k) != v:
+                        return None
+                model = pickle.load(f)
+        except Exception:
+            return None
+
+        if not isinstance(model, dict):
+            return None
+        if model.get('version') != self.VERSION or model.get('key') != key:
+            return None
+        if learner is not None:
+            if not isinstance(model.get('learner'), type(learner)):
+                return None
+        return model
+
+    def get_model_list(self):
+        """
+        Returns the keys of all stored models.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted(os.listdir(self.directory))
+        return [n[len('model_'):-len('.pkl')] for n in names
+                if n.startswith('model_') and n.endswith('.pkl')]
+
+
+def _feature_spec(feature_extractor):
+    """
+    Gives the spec of a feature extractor, falling back to its repr for
+    objects without one.
+    """
+    if hasattr(feature_extractor, 'to_spec'):
+        return feature_extractor.to_spec()
+    return repr(feature_extractor)
+
+
+def _learner_spec(learner):
+    """
+    Gives the repr of a learner, with `return_posteriors` reset since the
+    trained model doesn't depend on it.
+    """
+    if getattr(learner, 'return_posteriors', False):
+        learner = copy.copy(learner)
+        learner.return_posteriors = False
+    return repr(learner)
+
+
+def _class_name(obj):
+    cls = type(obj)
+    return cls.__module__ + '.' + cls.__name__
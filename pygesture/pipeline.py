@@ -128,7 +128,7 @@ class Windower(PipelineBlock):
 
     def process(self, data):
         if self._out is None:
-            self._preallocate(data.shape[1])
+            self._preallocate(data.shape[1], data.dtype)
 
         if self.overlap == 0:
             return data
@@ -138,8 +138,8 @@ class Windower(PipelineBlock):
 
         return self._out.copy()
 
-    def _preallocate(self, cols):
-        self._out = np.zeros((self.length, cols))
+    def _preallocate(self, cols, dtype=np.float64):
+        self._out = np.zeros((self.length, cols), dtype=dtype)
 
     def __repr__(self):
         return "%s.%s(length=%s, overlap=%s)" % (
@@ -162,6 +162,10 @@ class Conditioner(PipelineBlock):
     implemented as a Butterworth filter with order and cutoff frequencies
     specified, and the downsampling
 
+    The output has the same float type as the input (e.g. np.float32 input
+    gives np.float32 output). Filtering itself is done in double precision
+    since the filter coefficients aren't accurate enough in single precision.
+
     Parameters
     ----------
     order : int
@@ -190,22 +194,33 @@ class Conditioner(PipelineBlock):
         self.f_down = f_down
         self.m = int(f_samp/f_down)
 
-    def process(self, data):
-        data_centered = data - np.mean(data, axis=0)
+    def process(self, data, bias=None):
+        """
+        Conditions the data. The DC bias to remove can be given, e.g. when the
+        data is a block of a longer signal. By default, the mean of the input
+        is removed.
+        """
+        dtype = np.result_type(data, np.float32)
+        if bias is None:
+            bias = np.mean(data, axis=0)
+        data_centered = data - bias
         data_filtered = self.filt.process(data_centered)
-        data_downsampled = data_filtered[::self.m, :]
+        data_downsampled = data_filtered[::self.m, :].astype(dtype, copy=False)
         return data_downsampled
 
     def clear(self):
         self.filt.clear()
 
     def __repr__(self):
-        return "%s.%s(n=%s, fc=%s, fs=%s)" % (
+        return ("%s.%s(order=%s, f_cut=%s, f_samp=%s, f_down=%s, "
+                "overlap=%s)") % (
             self.__class__.__module__,
             self.__class__.__name__,
-            self.n,
-            self.fc,
-            self.fs
+            self.filt.order,
+            self.filt.f_cut,
+            self.f_samp,
+            self.f_down,
+            self.filt.overlap
         )
 
 
@@ -223,7 +238,10 @@ class BandpassFilter(PipelineBlock):
         Sampling rate specified in the same units as the frequencies in f_cut.
     overlap : int (default=0)
         Number of samples overlapping in consecutive inputs. Needed for
-        correct filter initial conditions in each filtering operation.
+        correct filter initial conditions in each filtering operation. With no
+        overlap, the filter state is carried over from one input to the next,
+        so filtering consecutive blocks gives the same output as filtering all
+        of the data at once.
     """
 
     def __init__(self, order, f_cut, f_samp, overlap=0):
@@ -243,9 +261,16 @@ class BandpassFilter(PipelineBlock):
     def clear(self):
         self.x_prev = None
         self.y_prev = None
+        self.zf = None
 
     def process(self, data):
-        if self.x_prev is None:
+        if self.overlap == 0:
+            if self.zf is None:
+                K = max(len(self.a)-1, len(self.b)-1)
+                self.zf = np.zeros((K, data.shape[1]))
+            out, self.zf = signal.lfilter(
+                self.b, self.a, data, axis=0, zi=self.zf)
+        elif self.x_prev is None:
             # first pass has no initial conditions
             out = signal.lfilter(
                 self.b, self.a, data, axis=0)
@@ -271,7 +296,7 @@ class BandpassFilter(PipelineBlock):
 
     def __repr__(self):
         return "%s.%s(order=%s, f_cut=%s, f_samp=%s, overlap=%d)" % (
-            self.__class__.__module___,
+            self.__class__.__module__,
             self.__class__.__name__,
             self.order,
             self.f_cut,
@@ -281,6 +306,18 @@ class BandpassFilter(PipelineBlock):
 
 
 class Classifier(PipelineBlock):
+    """
+    Wraps a classifier providing `fit()` and `predict()` (e.g. from
+    scikit-learn) so it can be placed in a pipeline. The input to `process`
+    is a single feature vector and the output is the predicted label.
+
+    Parameters
+    ----------
+    clf : classifier
+        The classifier. If it provides `partial_fit()` (like
+        `IncrementalLDA`), the classifier block can be updated with new data
+        without refitting.
+    """
 
     def __init__(self, clf):
         super(Classifier, self).__init__()
@@ -289,8 +326,337 @@ class Classifier(PipelineBlock):
     def fit(self, X, y):
         self.clf.fit(X, y)
 
+    def partial_fit(self, X, y):
+        """
+        Updates the classifier with additional training data. Raises an
+        `AttributeError` if the classifier doesn't support it.
+        """
+        self.clf.partial_fit(X, y)
+
+    @property
+    def incremental(self):
+        """
+        Whether or not the classifier supports `partial_fit`.
+        """
+        return hasattr(self.clf, 'partial_fit')
+
+    def __repr__(self):
+        return "%s.%s(%r)" % (
+            self.__class__.__module__,
+            self.__class__.__name__,
+            self.clf
+        )
+
     def process(self, data):
         # passing a 1-D array is deprecated in scikit-learn
         if data.ndim == 1:
             data = data.reshape(1, -1)
         return self.clf.predict(data)[0]
+
+
+class LDAClassifier(PipelineBlock):
+    """
+    Linear discriminant analysis classifier block for the real-time path.
+
+    Training accumulates the LDA sufficient statistics of the standardized
+    features (see `IncrementalLDA`). After each fit, the standardization and
+    the discriminant functions are folded into a single weight matrix and
+    bias, so classifying a feature vector is one matrix-vector product and an
+    argmax, with no per-call validation or reshaping.
+
+    Parameters
+    ----------
+    standardize : bool, default=True
+        Whether or not to standardize the features (zero mean, unit variance)
+        before computing the LDA statistics. This doesn't change the
+        predictions, but improves the conditioning of the pooled covariance.
+        The scaling is computed from the data given to `fit` and kept for
+        subsequent calls to `partial_fit`.
+    priors : array, default=None
+        Class prior probabilities (see `IncrementalLDA`).
+    return_posteriors : bool, default=False
+        If True, `process` returns a tuple (label, posteriors), where the
+        posteriors are the probabilities of each class in `classes_`.
+
+    Attributes
+    ----------
+    classes_ : array, shape (n_classes,)
+        Class labels.
+    weights : array, shape (n_classes, n_features)
+        Weights of the discriminant functions, applied to raw features.
+    bias : array, shape (n_classes,)
+        Biases of the discriminant functions.
+
+    Examples
+    --------
+    >>> from pygesture import pipeline
+    >>> clf = pipeline.LDAClassifier(return_posteriors=True)
+    >>> clf.fit(X, y)
+    >>> label, posteriors = clf.process(X[0])
+    """
+
+    def __init__(self, standardize=True, priors=None,
+                 return_posteriors=False):
+        super(LDAClassifier, self).__init__()
+        self.standardize = standardize
+        self.priors = priors
+        self.return_posteriors = return_posteriors
+
+        self.lda = IncrementalLDA(priors=priors)
+        self.mean_ = None
+        self.scale_ = None
+        self.classes_ = None
+        self.weights = None
+        self.bias = None
+
+    @property
+    def incremental(self):
+        return True
+
+    def fit(self, X, y):
+        """
+        Fits the classifier to the training data, discarding any previous
+        data.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        n_features = X.shape[1]
+        self.mean_ = np.zeros(n_features)
+        self.scale_ = np.ones(n_features)
+        if self.standardize:
+            self.mean_ = np.mean(X, axis=0)
+            std = np.std(X, axis=0)
+            self.scale_[std > 0] = std[std > 0]
+
+        self.lda = IncrementalLDA(priors=self.priors)
+        return self.partial_fit(X, y)
+
+    def partial_fit(self, X, y):
+        """
+        Updates the classifier with additional training data.
+        """
+        if self.mean_ is None:
+            return self.fit(X, y)
+
+        X = (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+        self.lda.partial_fit(X, y)
+
+        # fold the standardization into the discriminant functions
+        self.classes_ = self.lda.classes_
+        self.weights = np.ascontiguousarray(self.lda.coef_ / self.scale_)
+        self.bias = self.lda.intercept_ - np.dot(self.weights, self.mean_)
+        return self
+
+    def process(self, data):
+        """
+        Classifies a single feature vector.
+        """
+        d = np.dot(self.weights, data.ravel())
+        d += self.bias
+        k = np.argmax(d)
+        if self.return_posteriors:
+            return self.classes_[k], _softmax(d)
+        return self.classes_[k]
+
+    def decision_function(self, X):
+        return np.dot(X, self.weights.T) + self.bias
+
+    def predict(self, X):
+        """
+        Predicts the class label of each sample.
+        """
+        return self.classes_[np.argmax(self.decision_function(X), axis=1)]
+
+    def predict_proba(self, X):
+        """
+        Computes the posterior probability of each class for each sample.
+        """
+        return _softmax(self.decision_function(X))
+
+    def __repr__(self):
+        return "%s.%s(standardize=%s, priors=%s, return_posteriors=%s)" % (
+            self.__class__.__module__,
+            self.__class__.__name__,
+            self.standardize,
+            self.priors,
+            self.return_posteriors
+        )
+
+
+def _softmax(d):
+    e = np.exp(d - np.max(d, axis=-1, keepdims=True))
+    return e / np.sum(e, axis=-1, keepdims=True)
+
+
+class IncrementalLDA(object):
+    """
+    Linear discriminant analysis classifier which can be updated with new
+    training data without refitting.
+
+    Only the sufficient statistics of each class (number of samples, mean and
+    scatter matrix) are kept. New data is merged into them, and the pooled
+    covariance and discriminant functions are recomputed, which only depends
+    on the number of features and classes rather than the amount of training
+    data. Fitting the same data all at once or in batches gives the same
+    model (up to floating point error).
+
+    The interface matches scikit-learn classifiers (`fit`, `predict`,
+    `predict_proba`), so it can be used in a `Classifier` block. Since LDA is
+    invariant to scaling the features, no standardization is needed.
+
+    Parameters
+    ----------
+    priors : array, default=None
+        Class prior probabilities, in the order of the sorted class labels.
+        Default is `None`, meaning the class proportions of the training data
+        are used.
+
+    Attributes
+    ----------
+    classes_ : array, shape (n_classes,)
+        Class labels.
+    counts_ : array, shape (n_classes,)
+        Number of training samples of each class.
+    means_ : array, shape (n_classes, n_features)
+        Class means.
+    scatter_ : array, shape (n_classes, n_features, n_features)
+        Class scatter matrices (sum of outer products of deviations from the
+        class mean).
+    coef_ : array, shape (n_classes, n_features)
+        Weights of the linear discriminant functions.
+    intercept_ : array, shape (n_classes,)
+        Biases of the linear discriminant functions.
+
+    Examples
+    --------
+    >>> from pygesture import pipeline
+    >>> lda = pipeline.IncrementalLDA()
+    >>> lda.fit(X_session1, y_session1)
+    >>> lda.partial_fit(X_session2, y_session2)
+    >>> lda.save('model.npz')
+    >>> lda = pipeline.IncrementalLDA.load('model.npz')
+    """
+
+    def __init__(self, priors=None):
+        self.priors = priors
+        self._reset()
+
+    def _reset(self):
+        self.classes_ = np.zeros(0)
+        self.counts_ = np.zeros(0)
+        self.means_ = None
+        self.scatter_ = None
+        self.coef_ = None
+        self.intercept_ = None
+
+    def fit(self, X, y):
+        """
+        Fits the model to the training data, discarding any previous data.
+        """
+        self._reset()
+        return self.partial_fit(X, y)
+
+    def partial_fit(self, X, y):
+        """
+        Updates the model with additional training data. New classes can be
+        introduced.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y)
+        n_features = X.shape[1]
+
+        if self.means_ is None:
+            self.means_ = np.zeros((0, n_features))
+            self.scatter_ = np.zeros((0, n_features, n_features))
+        elif self.means_.shape[1] != n_features:
+            raise ValueError(
+                "Expected {} features, got {}.".format(
+                    self.means_.shape[1], n_features))
+
+        for label in np.unique(y):
+            Xc = X[y == label]
+            n_b = Xc.shape[0]
+            mean_b = np.mean(Xc, axis=0)
+            dev = Xc - mean_b
+            scatter_b = np.dot(dev.T, dev)
+
+            k = np.searchsorted(self.classes_, label)
+            if k == len(self.classes_) or self.classes_[k] != label:
+                self.classes_ = np.insert(self.classes_, k, label)
+                self.counts_ = np.insert(self.counts_, k, 0)
+                self.means_ = np.insert(self.means_, k, 0, axis=0)
+                self.scatter_ = np.insert(self.scatter_, k, 0, axis=0)
+
+            # merge the statistics of the batch with those of the class
+            n_a = self.counts_[k]
+            n = n_a + n_b
+            delta = mean_b - self.means_[k]
+            self.means_[k] += delta * n_b / n
+            self.scatter_[k] += scatter_b + np.outer(delta, delta)*n_a*n_b/n
+            self.counts_[k] = n
+
+        self._update_model()
+        return self
+
+    def _update_model(self):
+        n_classes = len(self.classes_)
+        dof = max(np.sum(self.counts_) - n_classes, 1)
+        cov = np.sum(self.scatter_, axis=0) / dof
+        cov_inv = np.linalg.pinv(cov)
+
+        if self.priors is None:
+            priors = self.counts_ / np.sum(self.counts_)
+        else:
+            priors = np.asarray(self.priors, dtype=np.float64)
+
+        self.coef_ = np.dot(self.means_, cov_inv)
+        self.intercept_ = -0.5*np.sum(self.coef_*self.means_, axis=1)
+        self.intercept_ += np.log(priors)
+
+    def decision_function(self, X):
+        """
+        Computes the discriminant function of each class for each sample.
+        """
+        return np.dot(X, self.coef_.T) + self.intercept_
+
+    def predict(self, X):
+        """
+        Predicts the class label of each sample.
+        """
+        return self.classes_[np.argmax(self.decision_function(X), axis=1)]
+
+    def predict_proba(self, X):
+        """
+        Computes the posterior probability of each class for each sample.
+        """
+        return _softmax(self.decision_function(X))
+
+    def save(self, filename):
+        """
+        Saves the model's sufficient statistics to a .npz file.
+        """
+        stats = dict(classes=self.classes_, counts=self.counts_,
+                     means=self.means_, scatter=self.scatter_)
+        if self.priors is not None:
+            stats['priors'] = np.asarray(self.priors)
+        np.savez(filename, **stats)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Loads a model saved with `save`. It can be updated further.
+        """
+        with np.load(filename) as stats:
+            lda = cls(priors=stats['priors'] if 'priors' in stats else None)
+            lda.classes_ = stats['classes']
+            lda.counts_ = stats['counts']
+            lda.means_ = stats['means']
+            lda.scatter_ = stats['scatter']
+        lda._update_model()
+        return lda
+
+    def __repr__(self):
+        return "%s.%s(priors=%s)" % (
+            self.__class__.__module__,
+            self.__class__.__name__,
+            self.priors
+        )
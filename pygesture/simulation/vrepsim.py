@@ -196,6 +196,9 @@ class IRB140Arm(object):
     IRB140 industrial arm with optional Barrett Hand attachment. If multiple
     copies are in the scene, a suffix should be supplied. If the Barrett Hand
     attachment is used, it should have the same suffix as the parent IRB140.
+
+    With `batched` set, the joint targets of each command are sent to v-rep
+    together (see `IRB140Arm.command`) rather than one remote call per joint.
     """
 
     joint_map = {
@@ -212,12 +215,13 @@ class IRB140Arm(object):
     }
 
     def __init__(self, clientId, suffix='', position_controlled=False,
-                 lefty=False):
+                 lefty=False, batched=True):
         self.clientId = clientId
         self.joints = None
         self.suffix = suffix
         self.position_controlled = position_controlled
         self.lefty = lefty
+        self.batched = batched
 
         self._initialize_joints()
 
@@ -304,6 +308,11 @@ class IRB140Arm(object):
         keys and velocity multipliers as values. If contradictory actions (e.g.
         elbow flcodeexion and elbow extension) are specified, the velocities
         will be summed.
+
+        If the arm is `batched`, communication with v-rep is paused while the
+        joint targets are set, so they're all sent in a single message and
+        take effect in the same simulation step. The joint positions are then
+        read from the streamed values, which doesn't need a remote call.
         """
         if type(action) is str:
             action = {action: 1}
@@ -333,11 +342,7 @@ class IRB140Arm(object):
             else:
                 joint.velocity += param*math.radians(v_norm)
 
-        # TODO: investigate if wrapping this loop in simxPauseCommunication
-        # calls would be useful here
-        for name in self.joints.keys():
-            self.joints[name].update()
-            self.pose[name] = self.joints[name].position
+        _update_joints(self.clientId, self.joints, self.pose, self.batched)
 
     def stop(self):
         """
@@ -366,6 +371,14 @@ class Joint(object):
         self._get_position(opmode=vrep.simx_opmode_streaming)
 
     def update(self, opmode=None):
+        self.send(opmode=opmode)
+        self.read()
+
+    def send(self, opmode=None):
+        """
+        Sends the joint target (position or velocity, depending on the control
+        mode) to v-rep.
+        """
         if opmode is None:
             opmode = vrep.simx_opmode_oneshot
 
@@ -379,6 +392,11 @@ class Joint(object):
         if opmode == vrep.simx_opmode_oneshot_wait:
             _validate(res)
 
+    def read(self):
+        """
+        Updates the position of a velocity controlled joint from the latest
+        streamed value.
+        """
         if not self.position_controlled:
             self.position = self._get_position(
                 opmode=vrep.simx_opmode_buffer)
@@ -408,6 +426,9 @@ class Joint(object):
 class MPL(object):
     """
     Modular Prosthetic Limb from Johns Hopkins Applied Physics Lab.
+
+    With `batched` set, the joint targets of each command are sent to v-rep
+    together (see `IRB140Arm.command`) rather than one remote call per joint.
     """
 
     joint_map = {
@@ -425,11 +446,13 @@ class MPL(object):
         'open-hand': ('mpl_index1_joint', -100)
     }
 
-    def __init__(self, clientId, suffix='', position_controlled=True):
+    def __init__(self, clientId, suffix='', position_controlled=True,
+                 batched=True):
         self.clientId = clientId
         self.joints = None
         self.suffix = suffix
         self._position_controlled = position_controlled
+        self.batched = batched
 
         self._initialize_joints()
 
@@ -532,11 +555,7 @@ class MPL(object):
             else:
                 joint.velocity += param*math.radians(v_norm)
 
-        # TODO: investigate if wrapping this loop in simxPauseCommunication
-        # calls would be useful here
-        for name in self.joints.keys():
-            self.joints[name].update()
-            self.pose[name] = self.joints[name].position
+        _update_joints(self.clientId, self.joints, self.pose, self.batched)
 
     def stop(self):
         """
@@ -568,6 +587,10 @@ class BarrettHand(object):
         self.signal_name = 'BarrettHand' + self.suffix + append
 
     def update(self, opmode=None):
+        self.send(opmode=opmode)
+        self.read()
+
+    def send(self, opmode=None):
         if opmode is None:
             opmode = vrep.simx_opmode_oneshot
 
@@ -582,6 +605,7 @@ class BarrettHand(object):
         if opmode == vrep.simx_opmode_oneshot_wait:
             _validate(res)
 
+    def read(self):
         if not self.position_controlled:
             self.position = self._get_position(
                 opmode=vrep.simx_opmode_buffer)
@@ -599,6 +623,29 @@ class BarrettHand(object):
         return pos
 
 
+def _update_joints(clientId, joints, pose, batched):
+    """
+    Sends the targets of all joints and updates `pose` with their positions.
+    If `batched`, communication is paused while the targets are queued so
+    they go out together once it's resumed.
+    """
+    if batched:
+        vrep.simxPauseCommunication(clientId, True)
+        try:
+            for joint in joints.values():
+                joint.send()
+        finally:
+            vrep.simxPauseCommunication(clientId, False)
+
+        for name, joint in joints.items():
+            joint.read()
+            pose[name] = joint.position
+    else:
+        for name, joint in joints.items():
+            joint.update()
+            pose[name] = joint.position
+
+
 def _validate(res):
     if res != vrep.simx_return_ok:
         err = ""
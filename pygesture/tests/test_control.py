@@ -1,3 +1,5 @@
+import numpy as np
+
 from pygesture import control
 
 
@@ -102,3 +104,132 @@ def _run_controller(controller, data):
     for d in data:
         out.append(controller.process(d))
     return out
+
+
+class _ReferenceDBVR(object):
+    # straightforward dict implementation the controller is checked against
+
+    def __init__(self, mapping, ramp_length, boosts):
+        self.mapping = mapping
+        self.ramp_length = ramp_length
+        self.boosts = boosts
+        self.labels = [k for k, v in mapping.items() if v != 'no-contraction']
+        self.counts = dict.fromkeys(self.labels, 0)
+
+    def process(self, data):
+        mav, label = data
+        if self.mapping[label] == 'no-contraction':
+            self.counts = dict.fromkeys(self.labels, 0)
+            return 'no-contraction'
+
+        out = {}
+        for l in self.labels:
+            c = self.counts[l] + (1 if l == label else -2)
+            self.counts[l] = min(max(c, 0), self.ramp_length)
+            gain = self.counts[l] / float(self.ramp_length)
+            out[self.mapping[l]] = min(
+                gain * (self.boosts[l] * np.mean(mav)), 1.0)
+        return out
+
+
+class TestDBVRReference(object):
+
+    def test_matches(self):
+        mapping = {0: 'no-contraction', 1: 'a', 2: 'b', 3: 'c'}
+        boosts = {0: 1.0, 1: 3.0, 2: 0.5, 3: 1.7}
+        rng = np.random.RandomState(0)
+        labels = rng.choice(4, size=500, p=[0.1, 0.4, 0.3, 0.2])
+        mavs = 0.5 * rng.rand(500, 6)
+
+        controller = control.DBVRController(mapping, ramp_length=4,
+                                            boosts=boosts)
+        reference = _ReferenceDBVR(mapping, 4, boosts)
+        outputs = []
+        for mav, label in zip(mavs, labels):
+            out = controller.process((mav, label))
+            assert out == reference.process((mav, label))
+            outputs.append(out)
+
+        # outputs aren't shared between calls
+        commands = [o for o in outputs if isinstance(o, dict)]
+        assert len(set(id(c) for c in commands)) == len(commands)
+
+
+class TestLatchHistory(object):
+
+    def test_matches_list_history(self):
+        mapping = {0: 0, 1: 1, 2: 2, 3: 3}
+        rng = np.random.RandomState(0)
+        # long runs so latching actually happens
+        labels = np.repeat(rng.choice(4, size=100), rng.randint(1, 6, 100))
+
+        for num_required in [0, 1, 3]:
+            controller = control.LatchController(
+                mapping, latch_labels=[1, 2], num_required=num_required)
+            history = [0] * num_required
+            for label in labels:
+                history = (history + [label])[-max(num_required, 1):]
+                latched = all(h == label for h in history)
+                expected = label if label not in [1, 2] or latched else 0
+                assert controller.process(label) == expected
+
+
+_mapping = {0: 'no-contraction', 1: 'a', 2: 'b'}
+_classes = np.array([0., 1., 2.])
+
+
+class TestPosteriorController(object):
+
+    def test_dbvr(self):
+        # without rejection, voting and weighting it's a DBVR controller
+        rng = np.random.RandomState(0)
+        labels = rng.choice(3, size=200)
+        mavs = rng.rand(200, 4)
+
+        controller = control.PosteriorController(
+            _mapping, _classes, ramp_length=4, weighted=False)
+        reference = control.DBVRController(_mapping, ramp_length=4)
+        for mav, label in zip(mavs, labels):
+            posteriors = np.full(3, 0.1)
+            posteriors[label] = 0.8
+            out = controller.process((mav, (label, posteriors)))
+            assert out == reference.process((mav, label))
+
+    def test_rejection(self):
+        controller = control.PosteriorController(
+            _mapping, _classes, threshold=0.6, ramp_length=1,
+            weighted=False)
+
+        out = controller.process((1, (1, np.array([0.1, 0.7, 0.2]))))
+        assert out == {'a': 1, 'b': 0}
+        assert controller.label == 1
+
+        out = controller.process((1, (1, np.array([0.1, 0.5, 0.4]))))
+        assert out == 'no-contraction'
+        assert controller.label is None
+
+    def test_vote(self):
+        controller = control.PosteriorController(
+            _mapping, _classes, vote_length=3, ramp_length=1,
+            weighted=False)
+
+        outputs = [controller.process((1, label))
+                   for label in [1, 1, 2, 1, 2]]
+        # the empty buffer counts as no decision at first
+        assert outputs[0] == 'no-contraction'
+        assert outputs[1] == {'a': 1, 'b': 0}
+        # a single stray decision is voted out
+        assert outputs[2] == {'a': 1, 'b': 0}
+        assert outputs[3] == {'a': 1, 'b': 0}
+        assert outputs[4] == {'a': 0, 'b': 1}
+
+        controller.clear()
+        assert controller.process((1, 2)) == 'no-contraction'
+
+    def test_weighted(self):
+        controller = control.PosteriorController(
+            _mapping, _classes, ramp_length=1)
+
+        out = controller.process((0.5, (2, np.array([0.1, 0.1, 0.8]))))
+        assert out['a'] == 0
+        assert np.isclose(out['b'], 0.4)
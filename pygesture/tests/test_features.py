@@ -0,0 +1,396 @@
+import json
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal, assert_raises
+from scipy.linalg import solve_toeplitz
+from scipy.signal import periodogram, welch
+
+from pygesture import features
+from pygesture import kernels
+from pygesture import pipeline
+
+np.random.seed(12345)
+
+rand_data_2d = 0.1 * np.random.randn(432, 4)
+rand_stream = 0.1 * np.random.randn(4320, 4)
+
+
+def _extractor(n_channels):
+    return features.FeatureExtractor(
+        [
+            features.MAV(),
+            features.WL(),
+            features.ZC(thresh=0.003),
+            features.SSC(thresh=0.003),
+            features.SpectralMoment(2),
+            features.KhushabaSet()
+        ],
+        n_channels)
+
+
+class TestFloat32(object):
+
+    def test_features(self):
+        fe = _extractor(rand_data_2d.shape[1])
+        out64 = fe.process(rand_data_2d)
+        out32 = fe.process(rand_data_2d.astype(np.float32))
+
+        assert out32.dtype == np.float32
+        assert_allclose(out32, out64, rtol=1e-4)
+
+    def test_conditioner(self):
+        conditioner = pipeline.Conditioner(4, (10, 450), 2000, f_down=1000)
+        out64 = conditioner.process(rand_stream)
+        conditioner.clear()
+        out32 = conditioner.process(rand_stream.astype(np.float32))
+
+        assert out32.dtype == np.float32
+        assert_allclose(out32, out64, rtol=1e-4, atol=1e-6)
+
+    def test_windower(self):
+        windower = pipeline.Windower(10, 5)
+        out = windower.process(rand_stream[:5].astype(np.float32))
+        assert out.dtype == np.float32
+
+    def test_pipeline(self):
+        n_channels = rand_stream.shape[1]
+        outputs = []
+        for dtype in [np.float64, np.float32]:
+            p = pipeline.Pipeline([
+                pipeline.Conditioner(4, (10, 450), 2000),
+                pipeline.Windower(432, 216),
+                _extractor(n_channels)
+            ])
+            data = rand_stream.astype(dtype)
+            outputs.append(np.array(
+                [p.process(data[i:i+216]) for i in range(0, 4320, 216)]))
+
+        out64, out32 = outputs
+        assert out32.dtype == np.float32
+        # skip the first window, which is mostly zero-padding
+        assert_allclose(out32[1:], out64[1:], rtol=1e-3)
+
+    def test_counts_exact(self):
+        n_channels = rand_data_2d.shape[1]
+        zc = features.ZC(thresh=0.003)
+        ssc = features.SSC(thresh=0.003)
+        x32 = rand_data_2d.astype(np.float32)
+
+        assert_array_equal(zc.compute(x32), zc.compute(rand_data_2d))
+        assert_array_equal(ssc.compute(x32), ssc.compute(rand_data_2d))
+        assert zc.compute(x32).shape == (n_channels,)
+
+
+def _sampen_reference(x, m, r):
+    # straightforward loop implementation SampEn is checked against
+    xrows, xcols = x.shape
+    y = np.zeros(xcols, dtype=x.dtype)
+    N = xrows
+
+    for c in range(xcols):
+        correl = np.zeros(2) + np.finfo(float).eps
+
+        xmat = np.zeros((m+1, N-m+1), dtype=x.dtype)
+        for i in range(m):
+            xmat[i, :] = x[i:N-m+i+1, c]
+        xmat[m, :-1] = x[m:N, c]
+        xmat[-1, -1] = 10*np.max(xmat)
+
+        for mc in [m, m+1]:
+            count = 0
+            for i in range(N-mc-1):
+                dist = np.max(
+                    np.abs(xmat[:mc, i+1:] - xmat[:mc, i][:, np.newaxis]),
+                    axis=0)
+                count += np.sum(dist <= r)
+            correl[mc-m] = count
+
+        y[c] = np.log(correl[0] / correl[1])
+
+    return y
+
+
+class TestSampEn(object):
+
+    def test_reference(self):
+        x = rand_data_2d[:150]
+        for m in [2, 3]:
+            r = 0.2*np.std(x)
+            expected = _sampen_reference(x, m, r)
+            # counts must match exactly, log may differ in the last bit
+            assert_allclose(features.SampEn(m, r).compute(x), expected,
+                            rtol=1e-12)
+            # tiny blocks exercise the blocking
+            assert_allclose(
+                features.SampEn(m, r, max_bytes=1).compute(x), expected,
+                rtol=1e-12)
+
+    def test_float32(self):
+        x = rand_data_2d[:100].astype(np.float32)
+        out = features.SampEn(2, 0.02).compute(x)
+        assert out.dtype == np.float32
+        assert_allclose(out, _sampen_reference(x, 2, 0.02), rtol=1e-6)
+
+    def test_negative(self):
+        # all-negative data makes the sentinel template value zero
+        x = -np.abs(rand_data_2d[:80])
+        assert_allclose(features.SampEn(2, 0.05).compute(x),
+                        _sampen_reference(x, 2, 0.05), rtol=1e-12)
+
+
+class TestWindowData(object):
+
+    def test_shared_intermediates(self):
+        fe = features.FeatureExtractor(
+            [features.WL(), features.SSC(thresh=0.003),
+             features.KhushabaSet(), features.ZC(use_sm=True)],
+            rand_data_2d.shape[1])
+        window = features.WindowData(rand_data_2d)
+        expected = np.hstack([f.extract(window) for f in fe.features])
+
+        # the first difference is computed once and reused
+        assert window.diff(1) is window.diff(1)
+        assert_array_equal(window.diff(2),
+                           np.diff(rand_data_2d, 2, axis=0))
+        assert_array_equal(fe.process(rand_data_2d), expected)
+
+    def test_batch(self):
+        fe = _extractor(rand_data_2d.shape[1])
+        batch = rand_stream[:4320].reshape(10, 432, 4)
+        out = fe.process(batch)
+
+        assert out.shape == (10, fe.n_features)
+        for i in range(10):
+            assert_allclose(out[i], fe.process(batch[i]), rtol=1e-12)
+
+
+def _tones(f_samp):
+    t = np.arange(512) / float(f_samp)
+    return np.column_stack((
+        np.sin(2*np.pi*100*t),
+        np.sin(2*np.pi*250*t),
+        np.random.RandomState(0).randn(512)))
+
+
+class TestSpectral(object):
+
+    f_samp = 1000
+    x = _tones(f_samp)
+
+    def test_tones(self):
+        mnf = features.MNF(self.f_samp).compute(self.x)
+        assert_allclose(mnf[:2], [100, 250], rtol=1e-6)
+
+        mdf = features.MDF(self.f_samp).compute(self.x)
+        assert_allclose(mdf[:2], [100, 250], atol=self.f_samp/512.)
+
+        entropy = features.SpectralEntropy(self.f_samp).compute(self.x)
+        assert entropy[0] < 0.5 and entropy[2] > 0.8
+
+    def test_band_power(self):
+        bp = features.BandPower(self.f_samp, [(0, 200), (200, 500)])
+        out = bp.compute(self.x)
+        assert out.shape == (6,)
+        # band powers of the tones add up to the power of a unit sine
+        assert_allclose(out[:2] + out[3:5], [0.5, 0.5], rtol=1e-3)
+        assert out[3] < 1e-6 and out[1] < 1e-6
+
+    def test_odd_length(self):
+        x = self.x[:431]
+        bands = [(0, 200), (200, 500)]
+        for seg in [None, 131]:
+            if seg is None:
+                freqs, psd = periodogram(x, self.f_samp, window='hann',
+                                         detrend=False, axis=0)
+            else:
+                freqs, psd = welch(x, self.f_samp, window='hann',
+                                   nperseg=seg, noverlap=seg - seg//2,
+                                   detrend=False, axis=0)
+            df = freqs[1] - freqs[0]
+            expected = np.concatenate(
+                [np.sum(psd[(freqs >= low) & (freqs < high)], axis=0) * df
+                 for low, high in bands])
+
+            bp = features.BandPower(self.f_samp, bands, segment_length=seg)
+            assert_allclose(bp.compute(x), expected, rtol=1e-10)
+
+    def test_batch(self):
+        fe = features.FeatureExtractor(
+            [features.MNF(self.f_samp),
+             features.MDF(self.f_samp, segment_length=128),
+             features.BandPower(self.f_samp, [(0, 200), (200, 500)]),
+             features.SpectralEntropy(self.f_samp, segment_length=128)],
+            3)
+        batch = np.stack((self.x, 2*self.x, self.x[::-1]))
+        out = fe.process(batch)
+        for i in range(3):
+            assert_allclose(out[i], fe.process(batch[i]), rtol=1e-10)
+
+        out32 = fe.process(batch.astype(np.float32))
+        assert out32.dtype == np.float32
+        assert_allclose(out32, out, rtol=1e-3, atol=1e-6)
+
+    def test_plan_cache(self):
+        plan = features.spectrum_plan(256, 2000)
+        assert features.spectrum_plan(256, 2000) is plan
+        assert features.spectrum_plan(128, 2000) is not plan
+
+
+class TestAR(object):
+
+    def test_reference(self):
+        x = rand_data_2d
+        n = x.shape[0]
+        a = features.AR(4).compute(x).reshape(4, -1)
+        for c in range(x.shape[1]):
+            r = np.array([np.dot(x[k:, c], x[:n-k, c]) for k in range(5)])
+            assert_allclose(a[:, c], -solve_toeplitz(r[:4], r[1:]),
+                            rtol=1e-10)
+
+    def test_cepstrum(self):
+        a = features.AR(3).compute(rand_data_2d).reshape(3, -1)
+        c = features.Cepstrum(5, ar_order=3).compute(
+            rand_data_2d).reshape(5, -1)
+
+        # cepstrum of the minimum phase model 1/A(z) from its log spectrum
+        nfft = 4096
+        A = np.fft.fft(np.vstack((np.ones(a.shape[1]), a)), nfft, axis=0)
+        expected = np.fft.ifft(-np.log(A), axis=0).real[1:6]
+        assert_allclose(c, expected, atol=1e-10)
+
+    def test_batch(self):
+        fe = features.FeatureExtractor(
+            [features.AR(4), features.Cepstrum(4)], 4)
+        batch = rand_stream[:4320].reshape(10, 432, 4)
+        out = fe.process(batch)
+        for i in range(10):
+            assert_allclose(out[i], fe.process(batch[i]), rtol=1e-12)
+
+        # silent channels give zeros rather than nan
+        assert_array_equal(fe.process(np.zeros((100, 4))), 0)
+
+
+class TestSliding(object):
+
+    def test_equivalent(self):
+        fe = features.FeatureExtractor(
+            [features.MAV(), features.WL(), features.ZC(thresh=0.003),
+             features.SSC(thresh=0.003), features.SpectralMoment(2),
+             features.KhushabaSet(), features.AR(2)],
+            rand_stream.shape[1])
+        for length, overlap in [(432, 216), (432, 324), (432, 0), (400, 150)]:
+            sliding = features.SlidingFeatureExtractor(fe, length, overlap)
+            windower = pipeline.Windower(length, overlap)
+            hop = length - overlap
+            for i in range(0, 2160, hop):
+                data = rand_stream[i:i+hop]
+                out = sliding.process(data)
+                expected = fe.process(windower.process(data))
+                if i == 0:
+                    # first window is zero-padded, so its logs are -inf
+                    continue
+                assert_allclose(out, expected, rtol=1e-10)
+                # counts are exact
+                assert_array_equal(out[8:16], expected[8:16])
+
+    def test_clear(self):
+        fe = _extractor(rand_stream.shape[1])
+        sliding = features.SlidingFeatureExtractor(fe, 432, 216)
+        first = sliding.process(rand_stream[:216])
+        sliding.process(rand_stream[216:432])
+        sliding.clear()
+        assert_array_equal(sliding.process(rand_stream[:216]), first)
+
+
+def _py_kernel(kernel):
+    # the plain Python version of a kernel, whether or not numba compiled it
+    return getattr(kernel, 'py_func', kernel)
+
+
+class TestKernels(object):
+
+    def test_counts(self):
+        batch = rand_stream[:1000].reshape(5, 200, 4)
+        for dtype in [np.float64, np.float32]:
+            x = batch.astype(dtype)
+            thresh = x.dtype.type(0.003)
+            zc = _py_kernel(kernels.zero_crossings)(x, thresh)
+            ssc = _py_kernel(kernels.slope_sign_changes)(x, thresh)
+            assert_array_equal(zc, features.ZC(thresh=0.003).compute(x))
+            assert_array_equal(ssc, features.SSC(thresh=0.003).compute(x))
+
+    def test_sampen_counts(self):
+        for x in [rand_data_2d[:120], -np.abs(rand_data_2d[:80])]:
+            m, r = 2, 0.2*np.std(x)
+            sentinel = 10*np.maximum(np.max(x, axis=0), 0)
+            counts = _py_kernel(kernels.sampen_counts)(
+                x[np.newaxis], m, r, sentinel[np.newaxis])[0]
+            assert_allclose(np.log(counts[0] / counts[1]),
+                            _sampen_reference(x, m, r), rtol=1e-12)
+
+    def test_backends(self):
+        # the compiled backend is used if numba is available, NumPy otherwise
+        batch = rand_stream[:1200].reshape(4, 300, 4)
+        for dtype in [np.float64, np.float32]:
+            x = batch.astype(dtype)
+            for make in [lambda b: features.ZC(thresh=0.003, backend=b),
+                         lambda b: features.SSC(thresh=0.003, backend=b),
+                         lambda b: features.SampEn(2, 0.02, backend=b)]:
+                expected = make('numpy').compute(x)
+                out = make('numba').compute(x)
+                assert out.dtype == dtype
+                assert_array_equal(out, expected)
+                assert_array_equal(make('numba').compute(x[1]), expected[1])
+
+    def test_unknown_backend(self):
+        assert_raises(ValueError, features.ZC, backend='cython')
+
+
+class TestSpec(object):
+
+    def test_round_trip(self):
+        fe = features.FeatureExtractor(
+            [features.MAV(), features.WL(), features.ZC(thresh=0.003),
+             features.SSC(0.003, use_sm=True), features.SpectralMoment(2),
+             features.KhushabaSet(u=1), features.SampEn(2, 0.02),
+             features.BandPower(1000, [(0, 100), (100, 500)]),
+             features.SpectralEntropy(1000, segment_length=128),
+             features.AR(3), features.Cepstrum(4, ar_order=3)],
+            4)
+        spec = fe.to_spec()
+        assert json.loads(json.dumps(spec)) == spec
+
+        fe2 = features.FeatureExtractor.from_spec(json.dumps(spec))
+        assert fe2.to_spec() == spec
+        assert repr(fe2.features[5]) == \
+            'pygesture.features.KhushabaSet(u=1)'
+        x = rand_data_2d
+        assert_array_equal(fe2.process(x), fe.process(x))
+
+    def test_layout(self):
+        fe = features.FeatureExtractor(
+            [features.WL(), features.KhushabaSet(), features.MAV(),
+             features.MAV()], 4)
+        assert fe.get_slice('MAV') == slice(24, 28)
+        assert fe.layout[1] == slice(4, 24)
+        assert_array_equal(fe.process(rand_data_2d)[fe.get_slice('MAV')],
+                           np.mean(np.abs(rand_data_2d), axis=0))
+        assert_raises(KeyError, fe.get_slice, 'ZC')
+
+    def test_unknown(self):
+        spec = {'version': 1, 'n_channels': 2,
+                'features': [{'name': 'Nope', 'params': {}}]}
+        assert_raises(ValueError, features.FeatureExtractor.from_spec, spec)
+
+    def test_unstored_params(self):
+        class Scaled(features.Feature):
+            def __init__(self, factor, offset=0):
+                self.scale = factor
+                self.offset = offset
+                self.dim_per_channel = 1
+
+        f = Scaled(2.0)
+        assert f.get_params() == {'offset': 0}
+        assert 'Scaled(offset=0)' in repr(f)
+        assert 'Scaled' in repr(features.FeatureExtractor([f], 2))
+        assert_raises(ValueError, f.to_spec)
@@ -0,0 +1,237 @@
+import os
+import shutil
+import tempfile
+
+from pygesture import features
+from pygesture import filestruct
+from pygesture import modelstore
+from pygesture import pipeline
+
+
+def _make_session(rootdir, pid, sid, date_str='2015-01-01', labels=(0, 1)):
+    session_dir = os.path.join(
+        rootdir, pid, 'session_' + date_str + '_' + pid + '_' + sid)
+    recording_dir = filestruct.get_recording_dir(session_dir)
+    os.makedirs(recording_dir)
+    for i, label in enumerate(labels):
+        f = filestruct.get_recording_file(
+            recording_dir, pid, sid, date_str, i+1, label)
+        open(f, 'w').close()
+    return session_dir
+
+
+class TestCatalog(object):
+
+    def test_matches_filestruct(self):
+        rootdir = tempfile.mkdtemp()
+        try:
+            _make_session(rootdir, 'p0', 'train1')
+            session_dir = _make_session(rootdir, 'p0', 'train2')
+            _make_session(rootdir, 'p1', 'test1', labels=())
+            feature_file = filestruct.new_feature_file(
+                session_dir, 'p0', 'train2', '2015-01-01')
+            open(feature_file, 'w').close()
+
+            catalog = filestruct.Catalog(rootdir)
+
+            assert (filestruct.get_participant_list(rootdir) ==
+                    catalog.get_participant_list())
+            assert (filestruct.get_session_list(rootdir, 'p0', 'train') ==
+                    catalog.get_session_list('p0', 'train'))
+            assert (filestruct.find_session_dir(rootdir, 'p0', 'train1') ==
+                    catalog.find_session_dir('p0', 'train1'))
+            assert (filestruct.find_feature_file(rootdir, 'p0', 'train2') ==
+                    catalog.find_feature_file('p0', 'train2'))
+
+            recordings = catalog.get_session('p0', 'train1')['recordings']
+            assert [f['label'] for f in recordings['files']] == [0, 1]
+            assert [f['trial'] for f in recordings['files']] == [1, 2]
+
+            try:
+                catalog.find_feature_file('p0', 'train1')
+                assert False
+            except IndexError:
+                pass
+        finally:
+            shutil.rmtree(rootdir)
+
+    def test_lazy(self):
+        rootdir = tempfile.mkdtemp()
+        try:
+            _make_session(rootdir, 'p0', 'train1')
+            _make_session(rootdir, 'p1', 'train1')
+            catalog = filestruct.Catalog(rootdir)
+            assert catalog.get_session_list('p1') == ['train1']
+
+            # a new session is only picked up when its participant is looked
+            # up, other participants aren't checked
+            _make_session(rootdir, 'p0', 'train2')
+            os.utime(os.path.join(rootdir, 'p0'), (0, 0))
+            shutil.rmtree(filestruct.find_session_dir(rootdir, 'p1', 'train1'))
+            os.utime(os.path.join(rootdir, 'p1'), (0, 0))
+
+            catalog = filestruct.Catalog(rootdir)
+            assert catalog.get_participant_list() == ['p0', 'p1']
+            assert catalog.get_session_list('p0') == ['train1', 'train2']
+            assert catalog.participants['p1']['sessions'] != {}
+            assert catalog.get_session_list('p1') == []
+        finally:
+            shutil.rmtree(rootdir)
+
+    def test_refresh(self):
+        rootdir = tempfile.mkdtemp()
+        try:
+            _make_session(rootdir, 'p0', 'train1')
+            catalog = filestruct.Catalog(rootdir)
+            assert catalog.get_session_list('p0') == ['train1']
+
+            session_dir = _make_session(rootdir, 'p0', 'train2')
+            # force a visible mtime change on coarse-grained file systems
+            pid_dir = os.path.join(rootdir, 'p0')
+            os.utime(pid_dir, (0, 0))
+            catalog.refresh()
+            assert catalog.get_session_list('p0') == ['train1', 'train2']
+
+            # a new catalog picks up the saved index
+            catalog = filestruct.Catalog(rootdir, refresh=False)
+            assert catalog.get_session_list('p0') == ['train1', 'train2']
+            assert (catalog.find_session_dir('p0', 'train2') ==
+                    session_dir)
+
+            # refreshing a session picks up a new feature file
+            feature_file = filestruct.new_feature_file(
+                session_dir, 'p0', 'train2', '2015-01-01')
+            open(feature_file, 'w').close()
+            os.utime(session_dir, (0, 0))
+            catalog.refresh('p0', 'train2')
+            assert catalog.find_feature_file('p0', 'train2') == feature_file
+        finally:
+            shutil.rmtree(rootdir)
+
+    def test_refresh_unchanged_mtime(self):
+        rootdir = tempfile.mkdtemp()
+        try:
+            session_dir = _make_session(rootdir, 'p0', 'train1')
+            recording_dir = filestruct.get_recording_dir(session_dir)
+            os.utime(recording_dir, (0, 0))
+            catalog = filestruct.Catalog(rootdir)
+            catalog.refresh('p0')
+
+            # a new recording within the resolution of the modification time
+            # is still picked up
+            open(filestruct.get_recording_file(
+                recording_dir, 'p0', 'train1', '2015-01-01', 3, 2), 'w').close()
+            os.utime(recording_dir, (0, 0))
+            catalog.refresh('p0')
+            recordings = catalog.get_session('p0', 'train1')['recordings']
+            assert [f['label'] for f in recordings['files']] == [0, 1, 2]
+        finally:
+            shutil.rmtree(rootdir)
+
+    def test_refresh_new_participant(self):
+        rootdir = tempfile.mkdtemp()
+        try:
+            _make_session(rootdir, 'p0', 'train1')
+            catalog = filestruct.Catalog(rootdir)
+
+            # not seen by the root directory check
+            _make_session(rootdir, 'p1', 'train1')
+            catalog.state = filestruct._dir_state(rootdir)[0]
+            catalog.refresh('p1')
+            assert catalog.get_session_list('p1') == ['train1']
+
+            # unknown participants without data are ignored
+            catalog.refresh('p2')
+            assert 'p2' not in catalog.participants
+        finally:
+            shutil.rmtree(rootdir)
+
+
+class TestParseNames(object):
+
+    def test_bulk_matches_single(self):
+        names = [
+            'rec_2015-01-01_p0_t1_l2.wav',
+            'rec_2015-01-01_p0_t12.wav',
+            'log_2015-01-01_p0_t3.json',
+            'features_2015-01-01_p0_train1.csv',
+            'session_2015-01-01_p0_train1',
+            'notes.txt'
+        ]
+        infos = filestruct.parse_names(names)
+        assert [i.name for i in infos] == names[:-1]
+        assert filestruct.parse_name('notes.txt') is None
+
+        for info in infos:
+            assert info == filestruct.parse_name(info.name)
+            assert info.date == filestruct.parse_date_string(info.name)
+            if info.trial is not None:
+                assert info.trial == filestruct.parse_trial_number(info.name)
+
+        assert infos[0].label == filestruct.parse_label(names[0])
+        assert infos[1].label is None
+        assert infos[3].sid == 'train1'
+
+        recs = filestruct.filter_recordings(infos, labels=[2])
+        assert [i.name for i in recs] == names[:1]
+
+    def test_no_match(self):
+        try:
+            filestruct.parse_label('rec_2015-01-01_p0_t12.wav')
+            assert False
+        except ValueError:
+            pass
+
+
+class TestModelStore(object):
+
+    def test_save_load(self):
+        rootdir = tempfile.mkdtemp()
+        try:
+            session_dir = _make_session(rootdir, 'p0', 'train1')
+            feature_file = filestruct.new_feature_file(
+                session_dir, 'p0', 'train1', '2015-01-01')
+            open(feature_file, 'w').close()
+
+            store = modelstore.ModelStore(rootdir, 'p0')
+            key = store.key('learner', 'features', ['train1'], [0, 1],
+                            [feature_file])
+            assert store.load(key) is None
+
+            store.save(key, {'w': 1}, {0: 1.0}, ['train1'], [0, 1],
+                       'features')
+            assert store.load(key)['learner'] == {'w': 1}
+            assert store.get_model_list() == [key]
+
+            # the models directory isn't a session
+            assert filestruct.get_session_list(rootdir, 'p0') == ['train1']
+
+            # reprocessing a session changes the key
+            os.utime(feature_file, (0, 0))
+            assert key != store.key('learner', 'features', ['train1'],
+                                    [0, 1], [feature_file])
+
+            # the output format of the learner doesn't change the key
+            lda = pipeline.LDAClassifier()
+            key = store.key(lda, 'features', ['train1'], [0, 1],
+                            [feature_file])
+            lda.return_posteriors = True
+            assert key == store.key(lda, 'features', ['train1'], [0, 1],
+                                    [feature_file])
+            assert lda.return_posteriors
+
+            # feature extractors are stored by their spec
+            fe = features.FeatureExtractor([features.MAV()], 2)
+            key = store.key('learner', fe, ['train1'], [0, 1],
+                            [feature_file])
+            store.save(key, {'w': 1}, {0: 1.0}, ['train1'], [0, 1], fe)
+            assert store.load(key)['feature_extractor'] == fe.to_spec()
+
+            # the header is checked before unpickling
+            assert store.load(key, learner={})['learner'] == {'w': 1}
+            assert store.load(key, learner=[]) is None
+            with open(store.get_file(key), 'wb') as f:
+                f.write(b'not a model')
+            assert store.load(key) is None
+        finally:
+            shutil.rmtree(rootdir)
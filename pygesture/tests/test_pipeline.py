@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 import numpy as np
 from numpy.testing import (assert_equal, assert_array_equal,
                            assert_array_almost_equal)
@@ -148,3 +151,69 @@ class TestWindower(object):
             new_data = windower.process(data[i*10:(i+1)*10, :])
 
         assert_array_equal(new_data, data[-13:, :])
+
+
+class TestIncrementalLDA(object):
+
+    def test_partial_fit(self):
+        rng = np.random.RandomState(0)
+        X = rng.randn(300, 4)
+        y = rng.randint(0, 3, 300)
+        X[:, 0] += 2*y
+
+        lda = pipeline.IncrementalLDA().fit(X, y)
+
+        # classes can be introduced by later batches
+        lda_inc = pipeline.IncrementalLDA()
+        lda_inc.partial_fit(X[y < 2][:100], y[y < 2][:100])
+        lda_inc.partial_fit(X[y < 2][100:], y[y < 2][100:])
+        lda_inc.partial_fit(X[y == 2], y[y == 2])
+
+        assert_array_almost_equal(lda_inc.coef_, lda.coef_)
+        assert_array_almost_equal(lda_inc.intercept_, lda.intercept_)
+        assert_array_equal(lda_inc.predict(X), lda.predict(X))
+
+        proba = lda.predict_proba(X)
+        assert_array_almost_equal(np.sum(proba, axis=1), np.ones(300))
+        assert_array_equal(lda.classes_[np.argmax(proba, axis=1)],
+                           lda.predict(X))
+
+    def test_save_load(self):
+        rng = np.random.RandomState(1)
+        X = rng.randn(100, 3)
+        y = rng.randint(0, 2, 100)
+
+        lda = pipeline.IncrementalLDA().fit(X, y)
+        fd, filename = tempfile.mkstemp(suffix='.npz')
+        os.close(fd)
+        try:
+            lda.save(filename)
+            loaded = pipeline.IncrementalLDA.load(filename)
+        finally:
+            os.remove(filename)
+
+        assert_array_almost_equal(loaded.predict_proba(X),
+                                  lda.predict_proba(X))
+
+
+class TestLDAClassifier(object):
+
+    def test_matches_lda(self):
+        rng = np.random.RandomState(2)
+        X = 10*rng.rand(8)*rng.randn(400, 8) + rng.randn(8)
+        y = rng.randint(0, 4, 400)
+        X[:, 0] += y
+
+        lda = pipeline.IncrementalLDA().fit(X, y)
+        clf = pipeline.LDAClassifier(return_posteriors=True).fit(X, y)
+
+        assert_array_equal(clf.predict(X), lda.predict(X))
+        assert_array_almost_equal(clf.predict_proba(X), lda.predict_proba(X))
+
+        label, posteriors = clf.process(X[0])
+        assert label == lda.predict(X[:1])[0]
+        assert_array_almost_equal(posteriors, lda.predict_proba(X[:1])[0])
+
+        clf.partial_fit(X[:50], y[:50])
+        lda.partial_fit(X[:50], y[:50])
+        assert_array_almost_equal(clf.predict_proba(X), lda.predict_proba(X))
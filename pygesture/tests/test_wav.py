@@ -0,0 +1,179 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from pygesture import wav
+
+np.random.seed(12345)
+
+rand_data = 0.5 * (np.random.rand(1000, 3) - 0.5)
+
+
+def _write_tmp(data, rate=2000):
+    tmpdir = tempfile.mkdtemp()
+    filename = os.path.join(tmpdir, 'rec.wav')
+    wav.write(filename, rate, data.copy())
+    return tmpdir, filename
+
+
+class TestWavReader(object):
+
+    def test_matches_read(self):
+        tmpdir, filename = _write_tmp(rand_data)
+        try:
+            rate, data = wav.read(filename)
+            reader = wav.WavReader(filename)
+
+            assert reader.rate == rate
+            assert reader.shape == data.shape
+            assert_array_equal(reader.read(), data)
+            assert_array_equal(reader[100:200], data[100:200])
+            assert_array_equal(reader.read(990), data[990:])
+            reader.close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_read_bounds(self):
+        tmpdir, filename = _write_tmp(rand_data)
+        try:
+            rate, data = wav.read(filename)
+            reader = wav.WavReader(filename)
+
+            assert_array_equal(reader.read_bounds((10, 20)), data[10:20])
+            assert_array_equal(reader.read_bounds((10, 20), m=2),
+                               data[20:40])
+            reader.close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_blocks(self):
+        tmpdir, filename = _write_tmp(rand_data)
+        try:
+            rate, data = wav.read(filename)
+            reader = wav.WavReader(filename)
+
+            blocks = list(reader.blocks(300))
+            assert [b.shape[0] for b in blocks] == [300, 300, 300, 100]
+            assert_array_equal(np.concatenate(blocks), data)
+            reader.close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_float32(self):
+        tmpdir, filename = _write_tmp(rand_data)
+        try:
+            rate, data = wav.read(filename)
+            reader = wav.WavReader(filename, dtype=np.float32)
+
+            out = reader.read()
+            assert out.dtype == np.float32
+            assert_array_equal(out, data.astype(np.float32))
+            reader.close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_single_channel(self):
+        tmpdir, filename = _write_tmp(rand_data[:, 0])
+        try:
+            reader = wav.WavReader(filename)
+            assert reader.shape == (rand_data.shape[0], 1)
+            reader.close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestWrite(object):
+
+    def test_input_unmodified(self):
+        data = rand_data.copy()
+        tmpdir, filename = _write_tmp(data)
+        try:
+            wav.write(filename, 2000, data)
+            assert_array_equal(data, rand_data)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_clipping(self):
+        data = np.array([[-1.5], [-1.0], [0.0], [1.0], [1.5]])
+        tmpdir, filename = _write_tmp(data)
+        try:
+            rate, out = wav.read(filename)
+            assert_array_equal(out[:, 0] * 32768,
+                               [-32768, -32768, 0, 32767, 32767])
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestContinuousWriter(object):
+
+    def test_matches_write(self):
+        tmpdir, filename = _write_tmp(rand_data)
+        try:
+            stream_file = os.path.join(tmpdir, 'stream.wav')
+            writer = wav.ContinuousWriter(stream_file, 2000)
+            for i in range(0, rand_data.shape[0], 150):
+                writer.write(rand_data[i:i+150])
+            writer.close()
+            assert writer.closed
+
+            rate, data = wav.read(filename)
+            rate_stream, data_stream = wav.read(stream_file)
+
+            assert rate_stream == rate
+            assert_array_equal(data_stream, data)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_valid_after_flush(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, 'stream.wav')
+            writer = wav.ContinuousWriter(filename, 2000, flush_interval=2)
+            for i in range(3):
+                writer.write(rand_data[i*100:(i+1)*100])
+
+            rate, data = wav.read(filename)
+            assert data.shape == (200, rand_data.shape[1])
+            writer.close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_empty(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, 'stream.wav')
+            with wav.ContinuousWriter(filename, 2000):
+                pass
+
+            rate, data = wav.read(filename)
+            assert data.shape == (0, 1)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_atomic(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, 'stream.wav')
+            writer = wav.ContinuousWriter(filename, 2000, atomic=True)
+            writer.write(rand_data)
+            assert os.listdir(tmpdir) == ['stream.wav.part']
+            writer.close()
+            assert os.listdir(tmpdir) == ['stream.wav']
+            rate, data = wav.read(filename)
+            assert data.shape == rand_data.shape
+
+            # discarding a finished recording keeps it
+            writer.discard()
+            assert os.listdir(tmpdir) == ['stream.wav']
+
+            writer = wav.ContinuousWriter(
+                os.path.join(tmpdir, 'aborted.wav'), 2000, atomic=True)
+            writer.write(rand_data)
+            writer.discard()
+            assert writer.closed
+            assert os.listdir(tmpdir) == ['stream.wav']
+        finally:
+            shutil.rmtree(tmpdir)
@@ -61,7 +61,8 @@ class RecordThread(QtCore.QThread):
 
     def run_fixed(self):
         spr = self.daq.samples_per_read
-        data = np.zeros((self.daq.num_channels, spr*self.triggers_per_record))
+        data = np.zeros((self.daq.num_channels, spr*self.triggers_per_record),
+                        dtype=getattr(self.daq, 'dtype', np.float64))
         self.daq.start()
         # discard first read
         try:
@@ -205,23 +205,13 @@ class RecordingViewerWidget(QtWidgets.QWidget):
         if not file_list:
             return
 
-        self.data_list = []
-        for f in file_list:
-            rec = processing.Recording(f, self.cfg.post_processor)
-            data = rec.raw_data
-
-            if self.condition:
-                self.cfg.conditioner.clear()
-                data = self.cfg.conditioner.process(data)
-
-            n_samples, n_channels = rec.raw_data.shape
-            rate = rec.fs_raw
-            t = np.arange(0, n_samples/rate, 1/float(rate))
-            self.data_list.append(
-                (t, data, rec.trial_number, rec.label))
+        # recordings are memory-mapped, data is only read when displayed
+        self.data_list = [
+            processing.Recording(f, self.cfg.post_processor)
+            for f in file_list]
 
         self.trial_index = 0
-        self.update_num_channels(self.data_list[0][1].shape[1])
+        self.update_num_channels(self.data_list[0].reader.n_channels)
         self.set_data(self.data_list[0])
 
     def next_plot_callback(self):
@@ -274,9 +264,21 @@ class RecordingViewerWidget(QtWidgets.QWidget):
             self.plot_items.append(plot_item)
             self.plot_data_items.append(plot_data_item)
 
-    def set_data(self, data):
-        t, signals, trial, label = data
-        self.ui.titleLabel.setText("Trial %d, Label %s" % (trial, label))
+    def set_data(self, rec):
+        # read without caching so only the displayed recording is in memory
+        signals = rec.read_raw()
+        if self.condition:
+            self.cfg.conditioner.clear()
+            signals = self.cfg.conditioner.process(signals)
+
+        n_samples = signals.shape[0]
+        rate = rec.fs_raw
+        if self.condition:
+            rate = self.cfg.conditioner.f_down
+        t = np.arange(n_samples) / float(rate)
+
+        self.ui.titleLabel.setText(
+            "Trial %d, Label %s" % (rec.trial_number, rec.label))
         for i, item in enumerate(self.plot_data_items):
             item.setData(t, signals[:, i])
 
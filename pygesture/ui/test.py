@@ -21,6 +21,8 @@ Testing protocol:
 import os
 import time
 import json
+import collections
+import copy
 import pkg_resources
 
 import numpy as np
@@ -30,6 +32,7 @@ from pygesture import features
 from pygesture import wav
 from pygesture import control
 from pygesture import pipeline
+from pygesture import modelstore
 from pygesture.analysis import processing
 from pygesture.simulation import vrepsim
 
@@ -63,7 +66,10 @@ class TestWidget(QtWidgets.QWidget):
         self.trial_initializing = False
         self.simulation = None
         self.robot = None
+        self.logger = None
         self.prediction = 0
+        self.fit_state = None
+        self.learner = copy.deepcopy(self.cfg.learner)
 
         self.init_base_session()
         self.init_gesture_view()
@@ -94,16 +100,22 @@ class TestWidget(QtWidgets.QWidget):
             self.init_simulation()
 
         self.pid = self.base_session.pid
+        self.catalog = filestruct.Catalog(self.cfg.data_path)
+        self.model_store = modelstore.ModelStore(self.cfg.data_path, self.pid)
+        self.fit_state = None
+        self.learner = copy.deepcopy(self.cfg.learner)
         self.ui.trainingList.clear()
         self.sid_list = filestruct.get_session_list(
-            self.cfg.data_path, self.pid, search="train")
+            self.cfg.data_path, self.pid, search="train",
+            catalog=self.catalog)
         for sid in self.sid_list:
             item = QtWidgets.QListWidgetItem(sid, self.ui.trainingList)
             item.setFlags(item.flags() | QtCore.Qt.ItemIsUserCheckable)
             item.setCheckState(QtCore.Qt.Unchecked)
             try:
                 filestruct.find_feature_file(self.cfg.data_path,
-                                             self.pid, sid)
+                                             self.pid, sid,
+                                             catalog=self.catalog)
             except:
                 item.setFlags(item.flags() & ~QtCore.Qt.ItemIsEnabled)
 
@@ -244,7 +256,10 @@ class TestWidget(QtWidgets.QWidget):
 
         self.logger = Logger(
             self.tac_session, self.trial_number-1,
-            self.training_sessions, self.boosts)
+            self.training_sessions, self.boosts,
+            self.cfg.feature_extractor.to_spec(),
+            self.session.get_recording_writer(
+                self.trial_number, self.cfg.daq.rate))
 
         if self.simulation is not None:
             self.simulation.start()
@@ -283,7 +298,11 @@ class TestWidget(QtWidgets.QWidget):
             self.robot.position_controlled = False
             self.robot.set_visible(True)
 
-    def pause_trial(self):
+    def pause_trial(self, discard=True):
+        """
+        Stops the trial. A paused trial is run again from the start, so its
+        recording is discarded unless the trial is finishing.
+        """
         self.dwell_timer.stop()
         self.intertrial_timer.stop()
         self.trial_start_timer.stop()
@@ -295,16 +314,19 @@ class TestWidget(QtWidgets.QWidget):
         self.record_thread.kill()
         self.trial_running = False
 
+        if self.logger is not None:
+            if discard:
+                self.logger.discard()
+            else:
+                self.logger.close()
+
     def finish_trial(self, success=False):
-        self.pause_trial()
+        self.pause_trial(discard=False)
         self.prediction = 0
         self.update_gesture_view()
 
         self.logger.success = success
-        self.session.write_trial(
-            self.trial_number,
-            self.logger.get_data(),
-            self.cfg.daq.rate)
+        self.session.write_trial(self.trial_number, self.logger.get_data())
 
         if self.trial_number == len(self.tac_session.trials):
             self.finish_session()
@@ -332,6 +354,9 @@ class TestWidget(QtWidgets.QWidget):
     def prediction_callback(self, data):
         """Called by the `RecordThread` when it produces a new output."""
         mav, label = data
+        if isinstance(label, tuple):
+            # (label, posteriors) for controllers using the confidence
+            label = label[0]
 
         if not self.trial_running:
             return
@@ -346,6 +371,12 @@ class TestWidget(QtWidgets.QWidget):
             commands = self.controller.process(data)
             self.robot.command(commands)
 
+            # show and log the decision the controller acted on, which is
+            # rest if the prediction was rejected or voted out
+            decision = getattr(self.controller, 'label', label)
+            if not self.test:
+                self.prediction = 0 if decision is None else decision
+
             acq = self.acquired_signal.read()
             if acq is not None:
                 if acq == 1:
@@ -425,53 +456,142 @@ class TestWidget(QtWidgets.QWidget):
                     labels.append(gesture.label)
                     mapping[gesture.label] = gesture.action
 
-        file_list = filestruct.get_feature_file_list(
-            self.cfg.data_path, self.pid, train_list)
-        training_data = processing.read_feature_file_list(
-            file_list, labels=labels)
-
-        # get average MAV for each gesture label to auto-set boosts
-        # warning: super hacky
-        j = 0
-        start = 0
-        for i, feature in enumerate(self.cfg.feature_extractor.features):
-            if 'MAV' in str(feature):
-                start = j
-                break
-            else:
-                j += feature.dim_per_channel*len(self.cfg.channels)
-        X, y = training_data
-        X = X[:, start:len(self.cfg.channels)]
-        boosts = dict()
-        for label in labels:
-            mav_avg = np.mean(X[y == label, :], axis=1)
-            # -np.partition(-data, N) gets N largest elements of data
-            boosts[label] = 1 / np.mean(-np.partition(-mav_avg, 10)[:10])
-        self.boosts = boosts
+        # sessions may have been (re)processed since the catalog was loaded
+        for sid in train_list:
+            self.catalog.refresh(self.pid, sid)
+        feature_files = filestruct.get_feature_file_list(
+            self.cfg.data_path, self.pid, train_list, catalog=self.catalog)
+        mtimes = dict((sid, os.path.getmtime(f))
+                      for sid, f in zip(train_list, feature_files))
+
+        # load a previously trained model if the inputs haven't changed
+        model_key = self.model_store.key(
+            self.cfg.learner, self.cfg.feature_extractor, train_list, labels,
+            feature_files)
+        model = self.model_store.load(model_key, self.cfg.learner)
+        if model is not None:
+            self.learner = model['learner']
+            self.boosts = model['boosts']
+            self.fit_state = {'key': (self.pid, tuple(sorted(labels))),
+                              'mtimes': mtimes}
+        else:
+            session_data = collections.OrderedDict(
+                (sid, processing.get_session_data(
+                    self.cfg.data_path, self.pid, [sid], labels=labels,
+                    catalog=self.catalog))
+                for sid in train_list)
+            training_data = (
+                np.concatenate([d[0] for d in session_data.values()]),
+                np.concatenate([d[1] for d in session_data.values()]))
+
+            self.boosts = self.compute_boosts(training_data, labels)
+            self.fit_learner(session_data, training_data, labels, mtimes)
+            self.model_store.save(
+                model_key, self.learner, self.boosts, train_list, labels,
+                self.cfg.feature_extractor)
 
         # re-create the controller to make sure it has the correct mapping
-        self.controller = control.DBVRController(
-            mapping=mapping,
-            ramp_length=self.cfg.controller.ramp_length,
-            boosts=1 if self.test else boosts)
-
-        self.cfg.learner.fit(*training_data)
-
+        boosts = 1 if self.test else self.boosts
+        # only learners like pipeline.LDAClassifier output posteriors, so
+        # the plain ramp controller is used with any other learner
+        supports_posteriors = hasattr(self.learner, 'return_posteriors')
+        use_posteriors = isinstance(self.cfg.controller,
+                                    control.PosteriorController)
+        use_posteriors = use_posteriors and supports_posteriors
+        if supports_posteriors:
+            self.learner.return_posteriors = use_posteriors
+        if use_posteriors:
+            self.controller = control.PosteriorController(
+                mapping=mapping,
+                classes=self.learner_classes(labels),
+                threshold=self.cfg.controller.threshold,
+                vote_length=self.cfg.controller.vote_length,
+                weighted=self.cfg.controller.weighted,
+                ramp_length=self.cfg.controller.ramp_length,
+                boosts=boosts)
+        else:
+            self.controller = control.DBVRController(
+                mapping=mapping,
+                ramp_length=self.cfg.controller.ramp_length,
+                boosts=boosts)
+
+        # features are updated from each new hop of data rather than
+        # recomputed over the whole window
+        windower = self.cfg.windower
         self.pipeline = pipeline.Pipeline([
             self.cfg.conditioner,
-            self.cfg.windower,
             (
-                features.FeatureExtractor(
-                    [features.MAV()], len(self.cfg.channels)),
+                features.SlidingFeatureExtractor(
+                    features.FeatureExtractor(
+                        [features.MAV()], len(self.cfg.channels)),
+                    windower.length, windower.overlap),
                 [
-                    self.cfg.feature_extractor,
-                    self.cfg.learner
+                    features.SlidingFeatureExtractor(
+                        self.cfg.feature_extractor,
+                        windower.length, windower.overlap),
+                    self.learner
                 ],
             )
         ])
 
         self.record_thread.set_pipeline(self.pipeline)
 
+    def learner_classes(self, labels):
+        """
+        Gets the class labels in the order of the learner's output, either
+        from the fitted learner (or the classifier wrapped by a
+        `pipeline.Classifier`) or from the training labels.
+        """
+        for clf in (self.learner, getattr(self.learner, 'clf', None)):
+            classes = getattr(clf, 'classes_', None)
+            if classes is not None:
+                return np.asarray(classes)
+        return np.unique(labels)
+
+    def compute_boosts(self, training_data, labels):
+        """
+        Gets the average MAV for each gesture label to auto-set boosts.
+        """
+        try:
+            columns = self.cfg.feature_extractor.get_slice('MAV')
+        except KeyError:
+            # no MAV in the feature set, use the first feature's columns
+            columns = slice(0, len(self.cfg.channels))
+        X, y = training_data
+        X = X[:, columns]
+        boosts = dict()
+        for label in labels:
+            mav_avg = np.mean(X[y == label, :], axis=1)
+            # -np.partition(-data, N) gets N largest elements of data
+            boosts[label] = 1 / np.mean(-np.partition(-mav_avg, 10)[:10])
+        return boosts
+
+    def fit_learner(self, session_data, training_data, labels, mtimes):
+        """
+        Fits the learner to the training data. If the learner supports
+        incremental updates and the training sessions only add to those it was
+        last fit with, just the new sessions are folded in, which makes
+        recalibrating with an additional session nearly instant.
+        """
+        key = (self.pid, tuple(sorted(labels)))
+
+        state = self.fit_state
+        incremental = getattr(self.learner, 'incremental', False)
+        if state is None or state['key'] != key:
+            incremental = False
+        elif any(mtimes.get(sid) != mtime
+                 for sid, mtime in state['mtimes'].items()):
+            incremental = False
+
+        if incremental:
+            for sid, data in session_data.items():
+                if sid not in state['mtimes']:
+                    self.learner.partial_fit(*data)
+        else:
+            self.learner.fit(*training_data)
+
+        self.fit_state = {'key': key, 'mtimes': mtimes}
+
 
 class Session(object):
 
@@ -490,9 +610,7 @@ class Session(object):
             self.base_session.session_dir)
         os.makedirs(self.log_dir)
 
-    def write_trial(self, trial_number, data, fs):
-        rec, log = data
-
+    def get_recording_writer(self, trial_number, fs):
         rec_file = filestruct.get_recording_file(
             self.recording_dir,
             self.base_session.pid,
@@ -500,8 +618,9 @@ class Session(object):
             self.base_session.datestr,
             trial_number)
 
-        wav.write(rec_file, fs, rec.T)
+        return wav.ContinuousWriter(rec_file, fs, atomic=True)
 
+    def write_trial(self, trial_number, log):
         log_file = filestruct.get_log_file(
             self.log_dir,
             self.base_session.pid,
@@ -514,8 +633,31 @@ class Session(object):
 
 
 class Logger(object):
-
-    def __init__(self, tac_session, trial_index, training_sessions, boosts):
+    """
+    Logs the data from a single TAC trial. Recording data is streamed to disk
+    by the given writer as it comes in, and everything else is kept until the
+    end of the trial and output as JSON.
+
+    Parameters
+    ----------
+    tac_session : pygesture.experiment.TACSession
+        The TAC session the trial belongs to.
+    trial_index : int
+        Index of the trial in the TAC session's trials.
+    training_sessions : list
+        Session IDs of the data the classifier was trained with.
+    boosts : dict
+        Boosts given to the controller.
+    feature_spec : dict
+        Spec of the feature extractor used by the classifier (see
+        `pygesture.features.FeatureExtractor.to_spec`).
+    writer : pygesture.wav.ContinuousWriter
+        Writer for the trial's recording data. It is closed by `close()`, or
+        the recording is dropped by `discard()` if the trial is abandoned.
+    """
+
+    def __init__(self, tac_session, trial_index, training_sessions, boosts,
+                 feature_spec, writer):
         self.started = False
         self.success = False
 
@@ -523,6 +665,7 @@ class Logger(object):
         self.trial_index = trial_index
         self.training_sessions = training_sessions
         self.boosts = boosts
+        self.feature_spec = feature_spec
 
         self.active_classes = [g.action for g in tac_session.gestures]
         self.target = {
@@ -537,7 +680,7 @@ class Logger(object):
             'target_entered': [],
             'pose': {}
         }
-        self.rec_data = []
+        self.writer = writer
 
     def log(self, prediction, command, pose, acq):
         if not self.started:
@@ -562,14 +705,21 @@ class Logger(object):
             self.trial_data['pose'][k].append(v)
 
     def record(self, data):
-        self.rec_data.append(data)
+        # data can still come in from the record thread after the trial ends
+        if not self.writer.closed:
+            self.writer.write(data.T)
 
-    def get_data(self):
-        rec = np.concatenate(self.rec_data, axis=1)
+    def close(self):
+        self.writer.close()
 
+    def discard(self):
+        self.writer.discard()
+
+    def get_data(self):
         d = dict(
             training_sessions=self.training_sessions,
             boosts=self.boosts,
+            feature_extractor=self.feature_spec,
             active_classes=self.active_classes,
             trial_data=self.trial_data,
             target=self.target,
@@ -577,7 +727,7 @@ class Logger(object):
         )
         log = json.dumps(d, indent=4)
 
-        return (rec, log)
+        return log
 
 
 class SimulationConnectThread(QtCore.QThread):
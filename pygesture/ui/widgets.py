@@ -188,7 +188,9 @@ class SessionBrowser(QtWidgets.QWidget):
         self.ui.participantComboBox.currentIndexChanged[str].connect(
             self.on_participant_selection)
 
-        pids = filestruct.get_participant_list(self.data_path)
+        self.catalog = filestruct.Catalog(self.data_path)
+        pids = filestruct.get_participant_list(
+            self.data_path, catalog=self.catalog)
         self.ui.participantComboBox.addItems(pids)
 
         self.ui.sessionList.currentTextChanged.connect(
@@ -208,8 +210,11 @@ class SessionBrowser(QtWidgets.QWidget):
 
         self.pid = pid
 
+        # pick up sessions recorded since the catalog was loaded
+        self.catalog.refresh(self.pid)
         self.sid_list = filestruct.get_session_list(
-            self.data_path, self.pid, search=self.session_filter)
+            self.data_path, self.pid, search=self.session_filter,
+            catalog=self.catalog)
 
         self.ui.sessionList.clear()
         for sid in self.sid_list:
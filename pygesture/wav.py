@@ -1,11 +1,18 @@
+import hashlib
+import os
+import struct
+
 import numpy as np
 import scipy.io.wavfile as siowav
 
+from pygesture import filestruct
+
 
 def write(filename, rate, data):
     """
     Writes recording data to file in WAV format. It is basically a convenience
     wrapper around `scipy.io.wavfile.write` for handling normalized float data.
+    The input data is not modified.
 
     Paramters
     ---------
@@ -17,12 +24,10 @@ def write(filename, rate, data):
         Data to write. For multi-channel recordings, the shape should be
         (num_samples, num_channels).
     """
-    data *= 32768
-    data = data.astype(np.int16, copy=False)
-    siowav.write(filename, rate, data)
+    siowav.write(filename, rate, _to_int16(data))
 
 
-def read(filename):
+def read(filename, dtype=np.float64):
     """
     Reads recording data from a WAV file. It is basically a convenience wrapper
     around `scipy.io.wavfile.read` for getting float data.
@@ -31,6 +36,8 @@ def read(filename):
     ----------
     filename : str
         Path + file name to the file to read from.
+    dtype : numpy dtype, default=np.float64
+        Float type of the data returned.
 
     Returns
     -------
@@ -44,26 +51,294 @@ def read(filename):
     # make sure we get a 2D array even if there's only one channel
     if data.ndim == 1:
         data = data[:, np.newaxis]
-    data = data / 32768.0
+    data = _to_float(data, dtype)
     return rate, data
 
 
+class WavReader(object):
+    """
+    Lazy reader for recording data stored in a 16-bit WAV file. The integer
+    sample data is memory-mapped rather than loaded, and only the samples that
+    are requested (by slicing or through `read`) are converted to float data.
+    This keeps memory usage low when only part of a long recording is needed.
+
+    Parameters
+    ----------
+    filename : str
+        Path + file name to the file to read from.
+    dtype : numpy dtype, default=np.float64
+        Float type of the data returned.
+
+    Attributes
+    ----------
+    rate : int
+        Sample rate.
+    shape : tuple
+        Shape of the recording data, (num_samples, num_channels).
+
+    Examples
+    --------
+    >>> from pygesture import wav
+    >>> reader = wav.WavReader('rec_2014-08-12_p0_t01_l2.wav')
+    >>> gesture_data = reader.read(5000, 10000)
+    >>> first_ten = reader[:10]
+    """
+
+    def __init__(self, filename, dtype=np.float64):
+        self.filename = filename
+        self.dtype = np.dtype(dtype)
+
+        self.rate, data = siowav.read(filename, mmap=True)
+        if data.dtype != np.int16:
+            raise ValueError("WavReader only supports 16-bit WAV files.")
+        # make sure we get a 2D array even if there's only one channel
+        if data.ndim == 1:
+            data = data[:, np.newaxis]
+        self._data = data
+
+    @property
+    def shape(self):
+        return self._data.shape
+
+    @property
+    def n_samples(self):
+        return self._data.shape[0]
+
+    @property
+    def n_channels(self):
+        return self._data.shape[1]
+
+    def __len__(self):
+        return self.n_samples
+
+    def __getitem__(self, key):
+        return _to_float(self._data[key], self.dtype)
+
+    def read(self, start=0, stop=None):
+        """
+        Reads the samples from `start` up to (not including) `stop`. The
+        default reads the whole recording.
+
+        Returns
+        -------
+        data : ndarray
+            Float data (-1 to 1), shape (stop-start, num_channels).
+        """
+        return self[start:stop]
+
+    def read_bounds(self, bounds, m=1):
+        """
+        Reads the segment of the recording specified by `bounds`, as given to
+        `pygesture.analysis.processing.Processor` (`rest_bounds` or
+        `gesture_bounds`).
+
+        Parameters
+        ----------
+        bounds : 2-tuple of ints
+            The (start, end) sample indices of the segment.
+        m : int, default=1
+            Downsampling factor the bounds are specified for. Processor bounds
+            refer to conditioned (downsampled) data, so the conditioner's `m`
+            should be given to read the corresponding raw samples.
+        """
+        return self.read(bounds[0]*m, bounds[1]*m)
+
+    def blocks(self, length, start=0, stop=None):
+        """
+        Generates consecutive blocks of float data of the given length. The
+        last block is shorter if the segment doesn't divide evenly.
+        """
+        if stop is None or stop > self.n_samples:
+            stop = self.n_samples
+        for i in range(start, stop, length):
+            yield self.read(i, min(i+length, stop))
+
+    def digest(self):
+        """
+        Returns a hex digest (SHA-1) of the sample rate and sample data, which
+        identifies the recording by its contents.
+        """
+        h = hashlib.sha1(struct.pack('<iii', self.rate, *self.shape))
+        block = 2**20
+        for start in range(0, self.n_samples, block):
+            h.update(np.ascontiguousarray(self._data[start:start+block]))
+        return h.hexdigest()
+
+    def close(self):
+        """
+        Releases the memory map. The reader can't be used afterwards.
+        """
+        self._data = None
+
+
+def _to_float(data, dtype):
+    out = np.array(data, dtype=dtype)
+    out /= 32768.0
+    return out
+
+
+def _to_int16(data, buf=None, out=None):
+    """
+    Converts normalized float data to 16-bit integers. Values outside of the
+    (-1, 1) range are clipped. Pre-allocated float (`buf`) and integer (`out`)
+    arrays of the same shape as `data` can be given to avoid allocating new
+    ones.
+    """
+    if buf is None:
+        buf = np.empty(np.shape(data))
+    if out is None:
+        out = np.empty(np.shape(data), dtype='<i2')
+
+    np.multiply(data, 32768, out=buf)
+    np.clip(buf, -32768, 32767, out=buf)
+    np.copyto(out, buf, casting='unsafe')
+    return out
+
+
 class ContinuousWriter(object):
     """
-    Writes data to a WAV file chunk by chunk.
+    Writes data to a 16-bit WAV file chunk by chunk.
+
+    The header is written along with the first chunk of data, and the sizes it
+    contains are updated every time the file is flushed and when it is closed.
+    The file is therefore valid up to the last flush even if the writer is
+    never closed (e.g. the program crashes). Data is converted to integers
+    using buffers which are re-used from chunk to chunk.
 
     Parameters
     ----------
+    filename : str
+        Path + file name to the file to write to. An existing file is
+        overwritten.
+    fs : int
+        Sample rate in Hz.
+    flush_interval : int, default=10
+        Number of chunks to write between flushes to disk.
+    atomic : bool, default=False
+        If True, the data is written to `filename` + '.part', which is only
+        renamed to `filename` when the writer is closed. An unfinished
+        recording then never shows up under the final name, and it can be
+        dropped with `discard`.
+
+    Examples
+    --------
+    >>> from pygesture import wav
+    >>> writer = wav.ContinuousWriter('rec.wav', 2000)
+    >>> for i in range(10):
+    ...     writer.write(0.1*np.random.randn(200, 4))
+    >>> writer.close()
     """
 
-    def __init__(self, filename, fs):
+    def __init__(self, filename, fs, flush_interval=10, atomic=False):
         self.filename = filename
         self.fs = fs
+        self.flush_interval = flush_interval
+        self.atomic = atomic
+
+        self.n_channels = None
+        self.n_frames = 0
+        self._n_writes = 0
+        self._buf = np.empty((0, 0))
+        self._out = np.empty((0, 0), dtype='<i2')
 
-        self.fid = open(self.filename, 'ab')
+        self.fid = open(self._path, 'wb')
 
     def write(self, data):
-        write(self.fid, self.fs, data)
+        """
+        Appends data to the file. The shape should be (num_samples,
+        num_channels), and the number of channels can't change once data has
+        been written.
+        """
+        if data.ndim == 1:
+            data = data[:, np.newaxis]
+        n, n_channels = data.shape
+
+        if self.n_channels is None:
+            self.n_channels = n_channels
+            self._write_header()
+        elif n_channels != self.n_channels:
+            raise ValueError(
+                "Expected {} channels, got {}.".format(
+                    self.n_channels, n_channels))
+
+        if self._out.shape[0] < n or self._out.shape[1] != n_channels:
+            self._buf = np.empty((n, n_channels))
+            self._out = np.empty((n, n_channels), dtype='<i2')
+
+        out = _to_int16(data, buf=self._buf[:n], out=self._out[:n])
+        self.fid.write(out.data)
+        self.n_frames += n
+
+        self._n_writes += 1
+        if self._n_writes % self.flush_interval == 0:
+            self.flush()
+
+    def flush(self):
+        """
+        Updates the sizes in the header and flushes the file to disk.
+        """
+        if self.n_channels is not None:
+            self._update_sizes()
+        self.fid.flush()
 
     def close(self):
+        """
+        Finalizes the header and closes the file. If no data was written, a
+        valid single-channel file with no samples is produced.
+        """
+        if self.closed:
+            return
+
+        if self.n_channels is None:
+            self.n_channels = 1
+            self._write_header()
+
+        self._update_sizes()
         self.fid.close()
+        if self.atomic:
+            filestruct.replace_file(self._path, self.filename)
+
+    def discard(self):
+        """
+        Closes the file and deletes it. Does nothing if the writer is already
+        closed, so a finished recording is kept.
+        """
+        if self.closed:
+            return
+
+        self.fid.close()
+        os.remove(self._path)
+
+    @property
+    def closed(self):
+        return self.fid.closed
+
+    @property
+    def _path(self):
+        # the file the data is written to
+        if self.atomic:
+            return self.filename + '.part'
+        return self.filename
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write_header(self):
+        block_align = 2 * self.n_channels
+        self.fid.write(struct.pack(
+            '<4sI4s4sIHHIIHH4sI',
+            b'RIFF', 36, b'WAVE',
+            b'fmt ', 16, 1, self.n_channels, self.fs, self.fs*block_align,
+            block_align, 16,
+            b'data', 0))
+
+    def _update_sizes(self):
+        data_size = 2 * self.n_channels * self.n_frames
+        self.fid.seek(4)
+        self.fid.write(struct.pack('<I', 36 + data_size))
+        self.fid.seek(40)
+        self.fid.write(struct.pack('<I', data_size))
+        self.fid.seek(0, os.SEEK_END)
@@ -44,7 +44,9 @@ setup(
         'pyqtgraph'
     ],
 
-    extras_require={},
+    extras_require={
+        'numba': ['numba']
+    },
 
     package_data={
         'pygesture': ['ui/images/*']